@@ -1,5 +1,200 @@
-from rest_framework.authentication import TokenAuthentication
+from copy import deepcopy
+from hashlib import blake2b
+from typing import Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import (
+    TokenAuthentication,
+    get_authorization_header,
+)
+
+from utils.cache import LRUCache, VersionStamp
+
+
+class TokenCache:
+    """Process-local cache of the token key to the authenticated user.
+
+    Entries live at most `TOKEN_CACHE_TTL` seconds and the cache keeps at
+    most `TOKEN_CACHE_MAX_SIZE` of them. Every token has its own version
+    stamp, which is bumped on the token deletion and on a change of its
+    user that may revoke the access (see `order.signals`), the entries of
+    another version are dropped. The stamps are trusted for
+    `VERSION_STAMP_TTL` seconds, so a hit does not query the shared cache.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.entries = LRUCache(max_size=max_size, ttl=ttl)
+        self.versions = VersionStamp('auth-tokens', max_items=max_size)
+
+    @staticmethod
+    def get_item(key: str) -> str:
+        """Get the stamp item of the token, the key itself is secret."""
+        return blake2b(key.encode(), digest_size=16).hexdigest()
+
+    def get(self, key: str) -> tuple[Optional[tuple], int]:
+        """Get the cached `(user, token)` pair and the token version.
+
+        The pair is `None` if it is missing or stale. The version should be
+        passed to `set` along with the pair fetched after this call, so a
+        pair fetched before an invalidating change is not cached as fresh.
+        """
+        return self.lookup(key, self.versions.get(self.get_item(key)))
+
+    async def aget(self, key: str) -> tuple[Optional[tuple], int]:
+        """Async version of `get`."""
+        return self.lookup(
+            key, await self.versions.aget(self.get_item(key)),
+        )
+
+    def lookup(self, key: str, version: int) -> tuple[Optional[tuple], int]:
+        """Get the cached pair if it is of the version."""
+        entry = self.entries.get(key)
+        if entry is None or entry[0] != version:
+            return None, version
+        return entry[1], version
+
+    def set(self, key: str, credentials: tuple, version: int):
+        """Cache the `(user, token)` pair of the token version."""
+        self.entries.set(key, (version, credentials))
+
+    def invalidate(self, key: str):
+        """Drop the cached token in all the processes."""
+        self.versions.bump(self.get_item(key))
+
+    def stats(self):
+        """Get the cache size and the hit rate."""
+        return self.entries.stats()
+
+
+token_cache = TokenCache(
+    max_size=getattr(settings, 'TOKEN_CACHE_MAX_SIZE', 10000),
+    ttl=getattr(settings, 'TOKEN_CACHE_TTL', 60),
+)
+
+
+def resolve_client_role(user):
+    """Set the `is_client` flag of the user.
+
+    The related `order.Client` should be already selected with the user,
+    otherwise the check costs a query.
+    """
+    user.is_client = hasattr(user, 'client')
+    return user
 
 
 class BearerTokenAuthentication(TokenAuthentication):
+    """Token authentication with the `Bearer` keyword.
+
+    The token, the user and the related client are fetched with a single
+    query and the user gets the `is_client` flag. Token lookups are cached
+    by `token_cache`, every request gets its own deep copy of the cached user,
+    so the related client is not shared between the requests either.
+
+    The async views use `aauthenticate`, which queries the database in a
+    worker thread on the cache misses only, the token version is checked
+    with the async cache API.
+    """
+
     keyword = 'Bearer'
+
+    def authenticate(self, request):
+        key = self.get_key(request)
+        if key is None:
+            return None
+        return self.authenticate_credentials(key)
+
+    async def aauthenticate(self, request):
+        """Async version of `authenticate`."""
+        key = self.get_key(request)
+        if key is None:
+            return None
+
+        credentials, version = await token_cache.aget(key)
+        if credentials is None:
+            credentials = await sync_to_async(self.fetch_credentials)(key)
+            token_cache.set(key, credentials, version)
+
+        return deepcopy(credentials)
+
+    def get_key(self, request) -> Optional[str]:
+        """Get the token key from the `Authorization` header.
+
+        Returns `None` if the header has another keyword.
+
+        Raises:
+            AuthenticationFailed: if the header is malformed.
+        """
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+
+        if len(auth) == 1:
+            raise exceptions.AuthenticationFailed(
+                _('Invalid token header. No credentials provided.'),
+            )
+        if len(auth) > 2:
+            raise exceptions.AuthenticationFailed(
+                _('Invalid token header. '
+                  'Token string should not contain spaces.'),
+            )
+
+        try:
+            return auth[1].decode()
+        except UnicodeError as error:
+            raise exceptions.AuthenticationFailed(
+                _('Invalid token header. '
+                  'Token string should not contain invalid characters.'),
+            ) from error
+
+    def authenticate_credentials(self, key):
+        credentials, version = token_cache.get(key)
+        if credentials is None:
+            credentials = self.fetch_credentials(key)
+            token_cache.set(key, credentials, version)
+
+        return deepcopy(credentials)
+
+    def fetch_credentials(self, key):
+        """Get the `(user, token)` pair of the key from the database.
+
+        Raises:
+            AuthenticationFailed: if the token is invalid or the user is
+                inactive.
+        """
+        model = self.get_model()
+        try:
+            token = model.objects.select_related(
+                'user', 'user__client',
+            ).get(key=key)
+        except model.DoesNotExist as error:
+            raise exceptions.AuthenticationFailed(
+                _('Invalid token.'),
+            ) from error
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.'),
+            )
+
+        return resolve_client_role(token.user), token
+
+
+class QueryTokenAuthentication(BearerTokenAuthentication):
+    """Bearer token authentication accepting the `token` query param too.
+
+    For the clients that can not set the request headers, e.g. the browser
+    `EventSource`. The query strings may end up in the access logs, so it
+    should be used by the endpoints that need it only.
+    """
+
+    query_param = 'token'
+
+    def get_key(self, request) -> Optional[str]:
+        """Get the token key from the header or from the query param."""
+        key = super().get_key(request)
+        if key is None:
+            key = request.query_params.get(self.query_param) or None
+        return key
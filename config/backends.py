@@ -0,0 +1,24 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from config.authentication import resolve_client_role
+
+UserModel = get_user_model()
+
+
+class ClientModelBackend(ModelBackend):
+    """Model backend that selects the related `order.Client` with the user.
+
+    Session users get the `is_client` flag without an extra query.
+    """
+
+    def get_user(self, user_id):
+        try:
+            user = UserModel._default_manager.select_related(
+                'client',
+            ).get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        if not self.user_can_authenticate(user):
+            return None
+        return resolve_client_role(user)
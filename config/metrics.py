@@ -0,0 +1,79 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+from utils.metrics import MetricsRegistry
+
+metrics = MetricsRegistry(
+    directory=getattr(settings, 'METRICS_DIR', None),
+    flush_interval=getattr(settings, 'METRICS_FLUSH_INTERVAL', 1.0),
+)
+metrics.describe(
+    'crm_request_duration_seconds',
+    'Request latency by the URL name and method.',
+)
+metrics.describe(
+    'crm_requests_total',
+    'Requests by the URL name, method and status.',
+)
+metrics.describe(
+    'crm_db_queries_total',
+    'Database queries by the URL name and method.',
+)
+metrics.describe(
+    'crm_orders_created_total',
+    'Created orders by the resulting process status.',
+)
+metrics.describe('crm_cache_hits_total', 'Cache hits by the cache name.')
+metrics.describe('crm_cache_misses_total', 'Cache misses by the cache name.')
+metrics.describe('crm_cache_hit_ratio', 'Cache hit ratio by the cache name.')
+
+
+def collect_cache_stats():
+    """Get the hit and miss counters of the process-local caches."""
+    from config.authentication import token_cache
+    from order.properties import order_properties
+    from order.standard import standard_orders
+
+    for name, stats in (
+        ('tokens', token_cache.stats()),
+        ('order_properties', order_properties.stats()),
+        ('standard_orders', standard_orders.stats()),
+    ):
+        yield 'crm_cache_hits_total', {'cache': name}, stats['hits']
+        yield 'crm_cache_misses_total', {'cache': name}, stats['misses']
+
+
+def cache_hit_ratios(counters):
+    """Compute the cache hit ratios from the aggregated counters."""
+    hits: dict[str, float] = {}
+    misses: dict[str, float] = {}
+    for (name, labels), value in counters.items():
+        if name == 'crm_cache_hits_total':
+            hits[dict(labels)['cache']] = value
+        elif name == 'crm_cache_misses_total':
+            misses[dict(labels)['cache']] = value
+
+    for cache in sorted(hits.keys() | misses.keys()):
+        lookups = hits.get(cache, 0) + misses.get(cache, 0)
+        yield (
+            'crm_cache_hit_ratio', {'cache': cache},
+            hits.get(cache, 0) / lookups if lookups else 0,
+        )
+
+
+metrics.collectors.append(collect_cache_stats)
+
+
+def metrics_view(request):
+    """Expose the metrics of all the service processes for Prometheus.
+
+    Allowed for the `METRICS_ALLOWED_IPS` addresses only.
+    """
+    allowed = getattr(settings, 'METRICS_ALLOWED_IPS', ('127.0.0.1', '::1'))
+    if request.META.get('REMOTE_ADDR') not in allowed:
+        return HttpResponseForbidden()
+
+    return HttpResponse(
+        metrics.render(extra=cache_hit_ratios),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
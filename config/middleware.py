@@ -0,0 +1,257 @@
+import json
+import logging
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.functional import SimpleLazyObject, empty
+
+from config.metrics import metrics
+from config.routers import RoutingState, choose_replica, stick_to_primary
+from utils.timing import (
+    RequestTimings,
+    current_timings,
+    install_execute_wrapper,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def is_staff_request(request) -> bool:
+    """Check that the request user is a staff member.
+
+    The lazy session user is not loaded for the check, it may query the
+    database in the async context. The users of the API views are set by
+    their authentication.
+    """
+    user = getattr(request, 'user', None)
+    # pylint: disable=protected-access
+    if isinstance(user, SimpleLazyObject) and user._wrapped is empty:
+        return False
+    return bool(getattr(user, 'is_staff', False))
+
+
+class SyncAsyncMiddleware:
+    """Base of the middlewares that support both sync and async views.
+
+    Subclasses override `start`, which returns the request state, and
+    `finish`, which gets the state and the response.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        state = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            self.stop(state)
+        return self.finish(request, response, state)
+
+    async def __acall__(self, request):
+        state = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.stop(state)
+        return self.finish(request, response, state)
+
+    def start(self, request):
+        """Prepare the request state, nothing by default."""
+        # pylint: disable=unused-argument
+        return None
+
+    def stop(self, state):
+        """Clean up the state once the response is ready or failed."""
+
+    def finish(self, request, response, state):
+        """Process the response, returned as is by default."""
+        # pylint: disable=unused-argument
+        return response
+
+
+class RequestTimingMiddleware(SyncAsyncMiddleware):
+    """Per-request SQL and timing instrumentation.
+
+    Collects the queries count, the database, serializer, view and total
+    time of every request and logs them as a JSON line at the debug level.
+    Requests slower than `REQUEST_TIMING_SLOW_MS` are logged as warnings,
+    with the executed SQL if `REQUEST_TIMING_SLOW_SQL` is true. The timings
+    are added to the `Server-Timing` header in the `DEBUG` mode and for the
+    staff users only.
+
+    Should be the last middleware, so the `view` time covers the view only.
+    The middleware is removed from the chain if `REQUEST_TIMING_ENABLED` is
+    false.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_TIMING_ENABLED', False):
+            raise MiddlewareNotUsed()
+
+        super().__init__(get_response)
+        self.slow_ms = getattr(settings, 'REQUEST_TIMING_SLOW_MS', 500)
+        self.slow_sql = getattr(settings, 'REQUEST_TIMING_SLOW_SQL', False)
+        install_execute_wrapper()
+
+    def start(self, request):
+        timings = current_timings()
+        token = None
+        if timings is None:
+            timings = RequestTimings()
+            token = timings.activate()
+        if self.slow_sql and timings.sql is None:
+            timings.sql = []
+
+        request.timings = timings
+        return timings, token, perf_counter()
+
+    def stop(self, state):
+        timings, token, _ = state
+        if token is not None:
+            timings.deactivate(token)
+
+    def finish(self, request, response, state):
+        timings, _, started = state
+        finished = perf_counter()
+        sections = {
+            name: seconds * 1000
+            for name, seconds in timings.sections.items()
+        }
+        view_started = getattr(request, '_timing_view_started', None)
+        if view_started is not None:
+            sections['view'] = (finished - view_started) * 1000
+        sections['total'] = (finished - started) * 1000
+
+        if settings.DEBUG or is_staff_request(request):
+            response['Server-Timing'] = ', '.join(
+                '%s;dur=%.1f' % (name, duration)
+                for name, duration in sections.items()
+            ) + ', queries;desc="%d"' % timings.queries
+
+        self.log(request, response, timings, sections)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # pylint: disable=unused-argument
+        request._timing_view_started = perf_counter()
+
+    def log(self, request, response, timings, sections):
+        """Log the request timings, with the SQL for the slow requests."""
+        is_slow = sections['total'] >= self.slow_ms
+        if not is_slow and not logger.isEnabledFor(logging.DEBUG):
+            return
+
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': timings.queries,
+            **{
+                '%s_ms' % name: round(duration, 2)
+                for name, duration in sections.items()
+            },
+        }
+
+        if is_slow:
+            if timings.sql is not None:
+                record['sql'] = [
+                    {'sql': sql, 'ms': round(seconds * 1000, 2)}
+                    for sql, seconds in timings.sql
+                ]
+            logger.warning(json.dumps(record))
+        else:
+            logger.debug(json.dumps(record))
+
+
+class MetricsMiddleware(SyncAsyncMiddleware):
+    """Collects the request metrics exposed by `config.metrics`.
+
+    Records the latency histogram, the requests and the database queries
+    counters labeled by the URL name and the method, e.g. the `order-list`
+    name covers both the list and the creation. The queries are counted
+    with the request timings shared with `RequestTimingMiddleware`.
+
+    Should be the first middleware, so the latency covers the whole chain.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        install_execute_wrapper()
+
+    def start(self, request):
+        timings = RequestTimings()
+        return timings, timings.activate(), perf_counter()
+
+    def stop(self, state):
+        timings, token, _ = state
+        timings.deactivate(token)
+
+    def finish(self, request, response, state):
+        timings, _, started = state
+        elapsed = perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.url_name if match and match.url_name else 'unmatched'
+        metrics.observe(
+            'crm_request_duration_seconds', elapsed,
+            view=view, method=request.method,
+        )
+        metrics.inc(
+            'crm_requests_total',
+            view=view,
+            method=request.method,
+            status=str(response.status_code),
+        )
+        if timings.queries:
+            metrics.inc(
+                'crm_db_queries_total', timings.queries,
+                view=view, method=request.method,
+            )
+
+        metrics.maybe_flush()
+        return response
+
+
+class ReplicaRoutingMiddleware(SyncAsyncMiddleware):
+    """Chooses the database replica for the request reads.
+
+    The read-only requests read the orders from a replica, check
+    `config.routers.ReplicaRouter`. Once a request writes to the primary,
+    the same client reads from the primary for the next
+    `DATABASE_REPLICA_STICKY_SECONDS`, so the client sees its own changes
+    while the replicas catch up.
+
+    Should wrap the whole chain, so the session writes are tracked too. The
+    middleware is removed from the chain if there are no `DATABASE_REPLICAS`.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'DATABASE_REPLICAS', ()):
+            raise MiddlewareNotUsed()
+
+        super().__init__(get_response)
+
+    def start(self, request):
+        state = RoutingState(choose_replica(request))
+        return state, state.activate()
+
+    def stop(self, state):
+        routing, token = state
+        routing.deactivate(token)
+
+    def finish(self, request, response, state):
+        routing, _ = state
+        if routing.wrote:
+            stick_to_primary(request)
+        return response
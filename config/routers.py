@@ -0,0 +1,176 @@
+import random
+from contextvars import ContextVar, Token
+from hashlib import blake2b
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.urls import Resolver404, resolve
+
+from config.shards import is_sharded, is_sharded_model
+
+# Apps read from the replicas, the authentication and the session data are
+# always read from the primary database.
+REPLICA_APPS = frozenset({'order'})
+
+# Views that only read the orders, check `is_read_only_view`
+READ_ONLY_VIEWS = frozenset({
+    'order-list',
+    'order-detail',
+    'order-export',
+    'order-properties',
+    'order-stats',
+    'search',
+    'async-order-list',
+    'async-order-detail',
+    'async-order-properties',
+})
+
+READ_ONLY_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class RoutingState:
+    """Database routing state of the current request.
+
+    Attributes:
+        replica: alias of the replica to read from, `None` to read from the
+            primary database.
+        wrote: whether the request has written to the primary database.
+    """
+
+    def __init__(self, replica: Optional[str] = None):
+        self.replica = replica
+        self.wrote = False
+
+    def activate(self) -> Token:
+        """Make the state current for the running context."""
+        return _current_state.set(self)
+
+    @staticmethod
+    def deactivate(token: Token):
+        _current_state.reset(token)
+
+
+_current_state: ContextVar[Optional[RoutingState]] = ContextVar(
+    'routing_state',
+    default=None,
+)
+
+
+def current_routing_state() -> Optional[RoutingState]:
+    """Get the routing state of the current request if any."""
+    return _current_state.get()
+
+
+def is_read_only_view(request) -> bool:
+    """Check that the request only reads the orders.
+
+    The request is read-only if it uses a safe method and resolves to one of
+    the `READ_ONLY_VIEWS` or to an admin changelist.
+    """
+    if request.method not in READ_ONLY_METHODS:
+        return False
+
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        return False
+
+    return match.view_name in READ_ONLY_VIEWS or (
+        match.view_name.startswith('admin:')
+        and match.view_name.endswith('_changelist')
+    )
+
+
+def sticky_key(request) -> Optional[str]:
+    """Get the cache key of the request client stickiness to the primary.
+
+    The client is identified by its credentials: the `Authorization` header
+    or the session cookie, so the key is known before the authentication.
+    The stickiness is kept in the default cache shared by all the processes,
+    so the next request of the client reads from the primary whichever
+    process serves it.
+    """
+    credentials = request.headers.get('Authorization') or request.COOKIES.get(
+        settings.SESSION_COOKIE_NAME,
+    )
+    if not credentials:
+        return None
+    return 'replica-sticky:%s' % blake2b(
+        credentials.encode(),
+        digest_size=16,
+    ).hexdigest()
+
+
+def choose_replica(request) -> Optional[str]:
+    """Choose the replica to read from for the request.
+
+    Returns:
+        A random replica alias for a read-only request of a client that has
+        not written for the last `DATABASE_REPLICA_STICKY_SECONDS`,
+        otherwise `None`.
+    """
+    replicas = getattr(settings, 'DATABASE_REPLICAS', ())
+    if not replicas or not is_read_only_view(request):
+        return None
+
+    key = sticky_key(request)
+    if key is not None and cache.get(key):
+        return None
+    return random.choice(replicas)
+
+
+def stick_to_primary(request):
+    """Read the client data from the primary for a while after a write."""
+    key = sticky_key(request)
+    if key is not None:
+        cache.set(
+            key, True,
+            timeout=getattr(settings, 'DATABASE_REPLICA_STICKY_SECONDS', 5),
+        )
+
+
+class ReplicaRouter:
+    """Read/write database router.
+
+    Writes always go to the `default` primary database. The reads of the
+    `REPLICA_APPS` models go to the replica chosen for the current request
+    by `config.middleware.ReplicaRoutingMiddleware`, unless the request has
+    written already or the primary is in a transaction. Without a request
+    (commands, shell, background jobs) everything goes to the primary.
+
+    The replicas are listed in `DATABASE_REPLICAS` and are never migrated,
+    they get the schema from the primary. The sharded models are not read
+    from the replicas, check `config.shards`.
+    """
+
+    def db_for_read(self, model, **hints) -> Optional[str]:
+        state = _current_state.get()
+        if (
+            state is None
+            or state.replica is None
+            or state.wrote
+            or model._meta.app_label not in REPLICA_APPS
+            or (is_sharded() and is_sharded_model(model))
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return None
+        return state.replica
+
+    def db_for_write(self, model, **hints) -> str:
+        # pylint: disable=unused-argument
+        state = _current_state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints) -> bool:
+        # pylint: disable=unused-argument
+        return True
+
+    def allow_migrate(self, db, app_label, **hints) -> Optional[bool]:
+        # pylint: disable=unused-argument
+        if db in getattr(settings, 'DATABASE_REPLICAS', ()):
+            return False
+        return None
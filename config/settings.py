@@ -48,6 +48,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Should be the first one, check the middleware docstring
+    'config.middleware.MetricsMiddleware',
+    'config.middleware.ReplicaRoutingMiddleware',
+
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -58,6 +62,9 @@ MIDDLEWARE = [
 
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
+
+    # Should be the last one, check the middleware docstring
+    'config.middleware.RequestTimingMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -91,6 +98,88 @@ DATABASES = {
     }
 }
 
+# Read replicas, check `config.routers.ReplicaRouter`
+# `DATABASE_REPLICAS` is a comma separated list of the replica SQLite files,
+# e.g. copies of the database made with
+# `sqlite3 db.sqlite3 ".backup db-replica.sqlite3"`. The files are opened
+# read-only. Replicas of other backends may be added to `DATABASES` and
+# `DATABASE_REPLICAS` the same way. The tests read the replicas from the
+# test database.
+
+DATABASE_REPLICAS = []
+for index, replica in enumerate(
+    filter(None, os.getenv('DATABASE_REPLICAS', '').split(',')),
+):
+    alias = 'replica_%d' % index
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME': 'file:%s?mode=ro' % (BASE_DIR / replica.strip()),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+# Client-hash sharding of the orders, check `config.shards.ShardRouter`
+# `DATABASE_SHARDS` is a comma separated list of the SQLite files the orders
+# are partitioned across with the `default` database, which stays the first
+# shard. Every shard should be migrated with `migrate --database shard_<N>`,
+# the `rebalance_shards` command moves the orders once the list is changed.
+
+DATABASE_SHARDS = []
+for index, shard in enumerate(
+    filter(None, os.getenv('DATABASE_SHARDS', '').split(',')),
+    start=1,
+):
+    alias = 'shard_%d' % index
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME': BASE_DIR / shard.strip(),
+    }
+    DATABASE_SHARDS.append(alias)
+
+DATABASE_SHARD_PARALLEL = os.getenv('DATABASE_SHARD_PARALLEL', '1') == '1'
+
+DATABASE_ROUTERS = [
+    'config.shards.ShardRouter',
+    'config.routers.ReplicaRouter',
+]
+DATABASE_REPLICA_STICKY_SECONDS = int(
+    os.getenv('DATABASE_REPLICA_STICKY_SECONDS', '5'),
+)
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# The cache must be shared by all the processes: it keeps the version stamps
+# of the process-local caches (check `utils.cache.VersionStamp`) and the
+# replica stickiness of the clients. The database cache table is created by
+# `migrate`, `CACHE_REDIS_URL` switches the cache to Redis, which requires the
+# `redis` package.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'django_cache',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+if os.getenv('CACHE_REDIS_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('CACHE_REDIS_URL'),
+    }
+
+# Seconds a process trusts the version stamps read from the cache, the other
+# processes see the invalidated caches within this time
+
+VERSION_STAMP_TTL = float(os.getenv('VERSION_STAMP_TTL', '1'))
+
+
+# Authentication backends
+# https://docs.djangoproject.com/en/4.2/topics/auth/customizing/
+
+AUTHENTICATION_BACKENDS = [
+    'config.backends.ClientModelBackend',
+]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -152,7 +241,72 @@ REST_FRAMEWORK = {
     ),
 }
 
+# Bearer token lookup cache, check `config.authentication.TokenCache`
+
+TOKEN_CACHE_MAX_SIZE = int(os.getenv('TOKEN_CACHE_MAX_SIZE', '10000'))
+TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', '60'))
+
+# Order delta sync, check `order.pagination.OrderSyncPagination`
+
+ORDER_SYNC_SETTLE_SECONDS = float(
+    os.getenv('ORDER_SYNC_SETTLE_SECONDS', '2'),
+)
+
+# Order archive, check `order.archive`
+
+ORDER_ARCHIVE_AFTER_DAYS = float(os.getenv('ORDER_ARCHIVE_AFTER_DAYS', '90'))
+
+# Order work queue, check `order.claims`
+
+ORDER_CLAIM_LEASE_SECONDS = int(os.getenv('ORDER_CLAIM_LEASE_SECONDS', '300'))
+ORDER_CLAIM_MAX_LEASE_SECONDS = 3600
+
+# Order status change events, check `order.async_views.AsyncOrderEventsView`
+
+ORDER_EVENTS_BUFFER_SIZE = 100
+ORDER_EVENTS_MAX_CLIENTS = 10000
+ORDER_EVENTS_HEARTBEAT = 15
+ORDER_EVENTS_MAX_AGE = int(os.getenv('ORDER_EVENTS_MAX_AGE', '300'))
+
 # Django CORS headers
 # https://pypi.org/project/django-cors-headers/
 
 CORS_ALLOW_ALL_ORIGINS = True
+
+# Per-request SQL and timing instrumentation, check
+# `config.middleware.RequestTimingMiddleware`
+
+REQUEST_TIMING_ENABLED = os.getenv('REQUEST_TIMING_ENABLED', '0') == '1'
+REQUEST_TIMING_SLOW_MS = int(os.getenv('REQUEST_TIMING_SLOW_MS', '500'))
+REQUEST_TIMING_SLOW_SQL = os.getenv('REQUEST_TIMING_SLOW_SQL', '0') == '1'
+
+# Prometheus metrics, check `config.metrics`
+# Every process writes its metrics to the directory, which should be shared
+# by the processes of the host and used by this service only.
+
+METRICS_DIR = os.getenv('METRICS_DIR', str(BASE_DIR / 'metrics'))
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '1'))
+METRICS_ALLOWED_IPS = ('127.0.0.1', '::1')
+
+# Admin large-table mode, check `utils.admin.LargeTableAdminMixin`
+
+ADMIN_LARGE_TABLE_MODE = os.getenv('ADMIN_LARGE_TABLE_MODE', '0') == '1'
+
+# Logging
+# https://docs.djangoproject.com/en/4.2/topics/logging/
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'config': {
+            'handlers': ['console'],
+            'level': os.getenv('LOG_LEVEL', 'INFO'),
+        },
+    },
+}
@@ -0,0 +1,155 @@
+from hashlib import blake2b
+from typing import Callable, Optional, TypeVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import QuerySet
+
+from utils.db import scatter
+
+T = TypeVar('T')
+
+# Models partitioned by the client, an order lives in the shard of its client
+# with its returns, archive copy and statistics.
+SHARDED_MODELS = frozenset({
+    'order.order',
+    'order.orderreturn',
+    'order.orderstats',
+    'order.archivedorder',
+    'order.archivedorderreturn',
+})
+
+CLIENT_MODEL = 'order.client'
+
+
+def get_shards() -> list[str]:
+    """Get the shard aliases, the `default` database is the first shard."""
+    return [DEFAULT_DB_ALIAS, *getattr(settings, 'DATABASE_SHARDS', ())]
+
+
+def is_sharded() -> bool:
+    """Check the orders are partitioned across several databases."""
+    return len(get_shards()) > 1
+
+
+def is_sharded_model(model) -> bool:
+    """Check the model rows are partitioned, check `SHARDED_MODELS`."""
+    # The database cache passes a stub model with `app_label` and
+    # `model_name` only
+    return '%s.%s' % (
+        model._meta.app_label, model._meta.model_name,
+    ) in SHARDED_MODELS
+
+
+def jump_hash(key: int, buckets: int) -> int:
+    """Jump consistent hash of the 64-bit key.
+
+    Adding a bucket moves only `1 / buckets` of the keys, all of them to the
+    new bucket.
+    """
+    bucket, jump = -1, 0
+    while jump < buckets:
+        bucket = jump
+        key = (key * 2862933555777941757 + 1) % 2 ** 64
+        jump = int((bucket + 1) * (2 ** 31 / ((key >> 33) + 1)))
+    return bucket
+
+
+def shard_for_client(client_id: Optional[int]) -> str:
+    """Get the alias of the shard the client orders are stored in.
+
+    The orders of the deleted clients stay where they are, the missing
+    client is mapped to the first shard.
+    """
+    shards = get_shards()
+    if client_id is None or len(shards) == 1:
+        return shards[0]
+
+    key = int.from_bytes(
+        blake2b(str(client_id).encode(), digest_size=8).digest(),
+        'big',
+    )
+    return shards[jump_hash(key, len(shards))]
+
+
+def client_queryset(queryset: QuerySet, client_id: Optional[int]):
+    """Pin the queryset to the shard of the client if there are shards."""
+    if not is_sharded():
+        return queryset
+    return queryset.using(shard_for_client(client_id))
+
+
+def scatter_shards(func: Callable[[str], T]) -> list[T]:
+    """Call the function with every shard alias, check `utils.db.scatter`.
+
+    The calls run in parallel unless `DATABASE_SHARD_PARALLEL` is off.
+    """
+    return scatter(
+        func,
+        get_shards(),
+        parallel=getattr(settings, 'DATABASE_SHARD_PARALLEL', True),
+    )
+
+
+def shard_querysets(queryset: QuerySet) -> list[QuerySet]:
+    """Get the queryset pinned to every shard, as is without the shards."""
+    if not is_sharded():
+        return [queryset]
+    return [queryset.using(alias) for alias in get_shards()]
+
+
+def scatter_queryset(
+    queryset: QuerySet,
+    func: Callable[[QuerySet], T],
+) -> list[T]:
+    """Call the function with the queryset pinned to every shard.
+
+    Without the shards the queryset is left to the routers, e.g. to be read
+    from a replica.
+    """
+    if not is_sharded():
+        return [func(queryset)]
+    return scatter_shards(lambda alias: func(queryset.using(alias)))
+
+
+def instance_shard(instance) -> Optional[str]:
+    """Get the shard of the client or of the sharded model instance."""
+    if instance is None:
+        return None
+    if instance._meta.label_lower == CLIENT_MODEL:
+        return shard_for_client(instance.pk)
+
+    # The stored rows stay in their shard until they are rebalanced
+    if not instance._state.adding and instance._state.db:
+        return instance._state.db
+
+    client_id = getattr(instance, 'client_id', None)
+    if client_id is not None:
+        return shard_for_client(client_id)
+    return instance._state.db
+
+
+class ShardRouter:
+    """Client-hash sharding router.
+
+    The `SHARDED_MODELS` rows are partitioned across the `default` database
+    and the `DATABASE_SHARDS` by the hash of the client, check
+    `shard_for_client`. The instance hints are routed to their shard, e.g.
+    the saves and the related managers. The querysets have no hints, they
+    should be pinned to the shard with `using()` or be run on every shard
+    with `scatter_shards`, otherwise they go to the `default` database.
+
+    The other models are stored in the `default` database, the tables the
+    sharded ones refer to are copied to every shard, check
+    `order.sharding`. Every database gets the whole schema.
+    """
+
+    def db_for_read(self, model, **hints) -> Optional[str]:
+        if not is_sharded_model(model) or not is_sharded():
+            return None
+        return instance_shard(hints.get('instance'))
+
+    def db_for_write(self, model, **hints) -> Optional[str]:
+        if not is_sharded_model(model) or not is_sharded():
+            return None
+        return instance_shard(hints.get('instance'))
@@ -19,8 +19,11 @@ from django.urls import include, path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from config.metrics import metrics_view
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path('', include('order.urls')),
 ] + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
@@ -6,16 +6,36 @@ from django.db.models.query import QuerySet
 from django.http.request import HttpRequest
 from django.utils.translation import gettext_lazy as _
 
+from config.shards import scatter_queryset, shard_querysets
 from order import models
+from order.export import export_response
+from order.search import (
+    CLIENT_SEARCH_FIELDS,
+    CLIENT_SEARCH_INDEX,
+    COLOR_SEARCH_INDEX,
+    FORM_SEARCH_INDEX,
+    ORDER_SEARCH_FIELDS,
+    ORDER_SEARCH_INDEX,
+    SIZE_SEARCH_INDEX,
+    STANDARD_ORDER_SEARCH_INDEX,
+)
+from order.transitions import TRANSITIONS, apply_transition
+from utils.admin import (
+    LargeTableAdminMixin,
+    SearchIndexAdminMixin,
+    ShardedAdminMixin,
+)
+from utils.code import is_legacy_code
 
 
 @admin.register(models.Client)
-class ClientAdmin(UserAdmin):
+class ClientAdmin(SearchIndexAdminMixin, UserAdmin):
     """`Client` model admin.
 
     The `Client` model related to the `settings.AUTH_USER_MODEL` with
     one-to-one relation, so the admin model inherited from
-    `django.contrib.auth.admin.UserAdmin`.
+    `django.contrib.auth.admin.UserAdmin`. The search is backed by the
+    `order.search.CLIENT_SEARCH_INDEX`.
     """
 
     fieldsets = (
@@ -40,11 +60,12 @@ class ClientAdmin(UserAdmin):
         'first_name',
         'last_name',
     )
-    search_fields = ('username', 'email')
+    search_fields = CLIENT_SEARCH_FIELDS
+    search_index = CLIENT_SEARCH_INDEX
     list_filter = ()
 
 
-class OrderPropertyAdmin(admin.ModelAdmin):
+class OrderPropertyAdmin(SearchIndexAdminMixin, admin.ModelAdmin):
     """The `Order` property model admin."""
 
     list_display = ('name', 'description')
@@ -55,19 +76,25 @@ class OrderPropertyAdmin(admin.ModelAdmin):
 class ColorAdmin(OrderPropertyAdmin):
     """`Order` color property model admin."""
 
+    search_index = COLOR_SEARCH_INDEX
+
 
 @admin.register(models.Size)
 class SizeAdmin(OrderPropertyAdmin):
     """`Order` size property model admin."""
 
+    search_index = SIZE_SEARCH_INDEX
+
 
 @admin.register(models.Form)
 class FormAdmin(OrderPropertyAdmin):
     """`Order` form property model admin."""
 
+    search_index = FORM_SEARCH_INDEX
+
 
 @admin.register(models.StandardOrder)
-class StandardOrderAdmin(admin.ModelAdmin):
+class StandardOrderAdmin(SearchIndexAdminMixin, admin.ModelAdmin):
     """`StandardOrder` model admin."""
 
     list_display = (
@@ -77,11 +104,23 @@ class StandardOrderAdmin(admin.ModelAdmin):
         'form',
     )
     search_fields = ('name',)
+    search_index = STANDARD_ORDER_SEARCH_INDEX
 
 
 @admin.register(models.Order)
-class OrderAdmin(admin.ModelAdmin):
-    """`Order` model admin."""
+class OrderAdmin(
+    ShardedAdminMixin,
+    LargeTableAdminMixin,
+    SearchIndexAdminMixin,
+    admin.ModelAdmin,
+):
+    """`Order` model admin.
+
+    Supports the large-table mode, check `utils.admin.LargeTableAdminMixin`,
+    and the shards, check `utils.admin.ShardedAdminMixin`. The orders are
+    searched by the code, the comment and the client address with the
+    `order.search.ORDER_SEARCH_INDEX`.
+    """
 
     list_display = (
         'code',
@@ -92,10 +131,17 @@ class OrderAdmin(admin.ModelAdmin):
         'modified',
     )
     list_filter = ('created', 'status', 'process')
+    list_select_related = ('client',)
+    readonly_fields = ('claimed_by', 'claim_token', 'claim_expires')
+    search_fields = ORDER_SEARCH_FIELDS
+    search_index = ORDER_SEARCH_INDEX
+    large_table_ordering = ('-created', '-code')
     actions = (
         'update_order_to_in_assembly_status',
         'update_order_to_in_delivery_status',
         'complete_order',
+        'export_orders_csv',
+        'export_orders_ndjson',
     )
 
     def has_in_assembly_only_permission(self, request):
@@ -131,40 +177,81 @@ class OrderAdmin(admin.ModelAdmin):
 
         return self.model._default_manager.none()
 
+    def get_object(self, request, object_id, from_field=None):
+        """Get the order by its code or by the legacy random hex code."""
+        if from_field is None and is_legacy_code(object_id):
+            from_field = 'legacy_code'
+        return super().get_object(request, object_id, from_field)
+
+    def run_transition(self, request, queryset, name: str):
+        """Apply the transition and report the updated orders number.
+
+        The orders are updated in chunks in every shard, the ones in the
+        states the transition is not allowed from are skipped.
+        """
+        transition = TRANSITIONS[name]
+        updated = sum(scatter_queryset(
+            queryset,
+            lambda orders: apply_transition(orders, transition),
+        ))
+        self.message_user(request, _(
+            '%(action)s: %(count)d orders updated, the orders in other '
+            'states are skipped.',
+        ) % {'action': transition.description, 'count': updated})
+
     @admin.action(
         permissions=('change',),
         description='Set selected orders process status to `in assembly`',
     )
     def update_order_to_in_assembly_status(self, request, queryset):
-        # pylint: disable=unused-argument
-        return queryset.update(
-            process=models.Order.ProcessStatusChoice.IN_ASSEMBLY,
-        )
+        self.run_transition(request, queryset, 'to_assembly')
 
     @admin.action(
         permissions=('in_assembly_only',),
         description='Set selected orders process status to `in delivery`',
     )
     def update_order_to_in_delivery_status(self, request, queryset):
-        # pylint: disable=unused-argument
-        return queryset.update(
-            process=models.Order.ProcessStatusChoice.IN_DELIVERY,
-        )
+        self.run_transition(request, queryset, 'to_delivery')
 
     @admin.action(
         permissions=('in_delivery_only',),
         description='Set selected orders process status to `delivered`',
     )
     def complete_order(self, request, queryset):
+        self.run_transition(request, queryset, 'complete')
+
+    @admin.action(
+        permissions=('view',),
+        description='Export selected orders as CSV',
+    )
+    def export_orders_csv(self, request, queryset):
+        # pylint: disable=unused-argument
+        return export_response(*shard_querysets(queryset), output='csv')
+
+    @admin.action(
+        permissions=('view',),
+        description='Export selected orders as NDJSON',
+    )
+    def export_orders_ndjson(self, request, queryset):
         # pylint: disable=unused-argument
-        return queryset.update(
-            status=models.Order.StatusChoice.COMPLETED,
-            process=models.Order.ProcessStatusChoice.DELIVERED,
+        return export_response(
+            *shard_querysets(queryset),
+            output='ndjson',
         )
 
 
 @admin.register(models.OrderReturn)
-class OrderReturnAdmin(admin.ModelAdmin):
+class OrderReturnAdmin(
+    ShardedAdminMixin,
+    LargeTableAdminMixin,
+    admin.ModelAdmin,
+):
+    """`OrderReturn` model admin.
+
+    Supports the large-table mode, check `utils.admin.LargeTableAdminMixin`,
+    and the shards, check `utils.admin.ShardedAdminMixin`.
+    """
+
     list_display = (
         'order',
         'solution',
@@ -172,3 +259,38 @@ class OrderReturnAdmin(admin.ModelAdmin):
         'modified',
     )
     list_filter = ('created', 'modified', 'solution')
+    list_select_related = ('order', 'new_order')
+    large_table_ordering = ('-created', '-id')
+    large_table_list_filter = ('created', 'solution')
+
+
+@admin.register(models.ArchivedOrder)
+class ArchivedOrderAdmin(
+    ShardedAdminMixin,
+    LargeTableAdminMixin,
+    admin.ModelAdmin,
+):
+    """`ArchivedOrder` model admin.
+
+    The archived orders are read-only, check `order.archive`.
+    """
+
+    list_display = (
+        'code',
+        'client',
+        'status',
+        'process',
+        'created',
+        'archived',
+    )
+    list_filter = ('created', 'status', 'process')
+    list_select_related = ('client',)
+    search_fields = ('=code', '=legacy_code')
+    large_table_ordering = ('-created', '-code')
+    large_table_list_filter = ('created',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
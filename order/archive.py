@@ -0,0 +1,239 @@
+from datetime import timedelta
+from typing import Any, Callable, NamedTuple, Optional
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Case, Exists, OuterRef, Q, QuerySet, Value, When
+from django.utils import timezone
+
+from order.models import ArchivedOrder, ArchivedOrderReturn, Order, OrderReturn
+
+ARCHIVE_QUERY_PARAM = 'include_archived'
+DEFAULT_BATCH_SIZE = 1000
+
+# Finished orders: completed, cancelled or returned with a decided solution.
+# The orders that replace a returned one stay active with its return.
+FINISHED = (
+    Q(status__in=(Order.StatusChoice.COMPLETED, Order.StatusChoice.CANCELLED))
+    | Q(
+        Exists(OrderReturn.objects.filter(
+            order=OuterRef('pk'),
+            solution__in=(
+                OrderReturn.SolutionChoice.MONEY,
+                OrderReturn.SolutionChoice.NEW_ORDER,
+            ),
+        )),
+        status=Order.StatusChoice.RETURNED,
+    )
+) & ~Exists(OrderReturn.objects.filter(new_order=OuterRef('pk')))
+
+
+class ArchiveProgress(NamedTuple):
+    """Progress of `archive_orders` reported after every batch."""
+
+    batch: int
+    archived: int
+    total: int
+
+
+def include_archived(request) -> bool:
+    """Check that the request asks for the archived orders too."""
+    return request.query_params.get(ARCHIVE_QUERY_PARAM, '').lower() in (
+        '1', 'true', 'yes',
+    )
+
+
+def archive_before(days: Optional[float] = None):
+    """Get the `modified` time the finished orders are archived before."""
+    if days is None:
+        days = getattr(settings, 'ORDER_ARCHIVE_AFTER_DAYS', 90)
+    return timezone.now() - timedelta(days=days)
+
+
+def copy_fields(instance, model, **values) -> Any:
+    """Build the `model` instance with the same field values."""
+    source = {field.attname for field in instance._meta.concrete_fields}
+    for field in model._meta.concrete_fields:
+        if field.attname in source:
+            values.setdefault(field.attname, getattr(instance, field.attname))
+    return model(**values)
+
+
+def restore_timestamps(queryset: QuerySet, sources: list):
+    """Set the `created` and `modified` times of the sources with one query.
+
+    `bulk_create` overrides the auto timestamps of the active models, the
+    rows are updated to the copied ones.
+    """
+    queryset.filter(pk__in=[source.pk for source in sources]).update(**{
+        field: Case(*[
+            When(pk=source.pk, then=Value(getattr(source, field)))
+            for source in sources
+        ])
+        for field in ('created', 'modified')
+    })
+
+
+def archive_batch(candidates: QuerySet, batch_size: int) -> list[str]:
+    """Move a batch of the candidate orders to the archive.
+
+    The orders are locked, copied with their returns and deleted in one
+    short transaction. The locked orders are skipped where supported, so
+    the orders in use are archived by the next run. The rows are deleted
+    without the `post_delete` signal: the archived orders stay counted in
+    `OrderStats`.
+
+    Returns:
+        The codes of the archived orders, empty if there are no candidates.
+    """
+    using = candidates.db
+    features = connections[using].features
+    while True:
+        with transaction.atomic(using=using):
+            orders = list(candidates.select_for_update(
+                skip_locked=features.has_select_for_update_skip_locked,
+            ).order_by('pk')[:batch_size])
+            if not orders:
+                return []
+
+            codes = [order.pk for order in orders]
+            order_returns = list(OrderReturn.objects.using(using).filter(
+                order__in=codes,
+            ))
+
+            archived = timezone.now()
+            ArchivedOrder.objects.using(using).bulk_create([
+                copy_fields(order, ArchivedOrder, archived=archived)
+                for order in orders
+            ])
+            ArchivedOrderReturn.objects.using(using).bulk_create([
+                copy_fields(
+                    order_return, ArchivedOrderReturn,
+                    new_order_code=order_return.new_order_id,
+                )
+                for order_return in order_returns
+            ])
+
+            # SQLite does not lock the selected rows, but the inserts above
+            # lock the database, so the orders changed before are seen here
+            if candidates.filter(pk__in=codes).count() != len(codes):
+                transaction.set_rollback(True, using=using)
+                continue
+
+            OrderReturn.objects.using(using).filter(
+                pk__in=[order_return.pk for order_return in order_returns],
+            )._raw_delete(using)
+            Order.objects.using(using).filter(pk__in=codes)._raw_delete(using)
+        return codes
+
+
+def archive_orders(
+    before=None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    progress: Optional[Callable[[ArchiveProgress], Any]] = None,
+    using: Optional[str] = None,
+) -> int:
+    """Move the finished orders not modified since `before` to the archive.
+
+    The orders are walked in the primary key order in batches of
+    `batch_size`, every batch is moved in its own transaction (check
+    `archive_batch`), so the archiving never holds the locks for long.
+
+    Args:
+        before: the `modified` time limit, check `archive_before`.
+        batch_size: number of the orders per transaction.
+        progress: function called after every batch.
+        using: the database alias.
+
+    Returns:
+        The number of the archived orders.
+    """
+    if before is None:
+        before = archive_before()
+    using = using or router.db_for_write(Order)
+    candidates = Order.objects.using(using).filter(
+        FINISHED,
+        modified__lt=before,
+    )
+
+    total = 0
+    batch = 0
+    last_pk = None
+    while True:
+        batch_queryset = candidates
+        if last_pk is not None:
+            batch_queryset = batch_queryset.filter(pk__gt=last_pk)
+        codes = archive_batch(batch_queryset, batch_size)
+        if not codes:
+            break
+
+        last_pk = codes[-1]
+        batch += 1
+        total += len(codes)
+        if progress is not None:
+            progress(ArchiveProgress(batch, len(codes), total))
+
+    return total
+
+
+def restore_orders(queryset: QuerySet) -> list[str]:
+    """Move the archived orders of the queryset back to the `Order` table.
+
+    Used to change an archived order, e.g. to return it. The archived
+    replacement orders of the restored returns are restored too. The orders
+    stay counted in `OrderStats`. The orders are restored in the database
+    the queryset is pinned to, e.g. the shard of the client.
+
+    Returns:
+        The codes of the restored orders.
+    """
+    using = queryset._db or router.db_for_write(ArchivedOrder)
+    archived = []
+    archived_returns = []
+    with transaction.atomic(using=using):
+        queryset = queryset.using(using)
+        codes = set()
+        while True:
+            batch = [
+                order for order in queryset.select_for_update()
+                if order.pk not in codes
+            ]
+            if not batch:
+                break
+
+            archived += batch
+            codes.update(order.pk for order in batch)
+            batch_returns = list(ArchivedOrderReturn.objects.using(
+                using,
+            ).filter(order__in=[order.pk for order in batch]))
+            archived_returns += batch_returns
+            queryset = ArchivedOrder.objects.using(using).filter(pk__in=[
+                order_return.new_order_code
+                for order_return in batch_returns
+                if order_return.new_order_code
+            ])
+
+        if not archived:
+            return []
+
+        Order.objects.using(using).bulk_create([
+            copy_fields(order, Order) for order in archived
+        ])
+        restore_timestamps(Order.objects.using(using), archived)
+        OrderReturn.objects.using(using).bulk_create([
+            copy_fields(
+                order_return, OrderReturn,
+                new_order_id=order_return.new_order_code,
+            )
+            for order_return in archived_returns
+        ])
+        restore_timestamps(OrderReturn.objects.using(using), archived_returns)
+
+        ArchivedOrderReturn.objects.using(using).filter(
+            pk__in=[order_return.pk for order_return in archived_returns],
+        )._raw_delete(using)
+        ArchivedOrder.objects.using(using).filter(
+            pk__in=list(codes),
+        )._raw_delete(using)
+
+    return [order.pk for order in archived]
@@ -0,0 +1,335 @@
+import json
+from time import monotonic
+from typing import Any, AsyncIterator, Optional, Union
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views import View
+from rest_framework import exceptions, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from config.authentication import (
+    BearerTokenAuthentication,
+    QueryTokenAuthentication,
+)
+from config.metrics import metrics
+from config.shards import client_queryset
+from order import models, serializers
+from order.archive import include_archived
+from order.events import order_events
+from order.pagination import OrderCursorPagination, OrderSyncPagination
+from order.permissions import ClientOnlyPermission, UpdateDeliveredOrderOnly
+from order.properties import order_properties
+from order.returns import create_return
+from order.standard import standard_orders
+from order.views import properties_response, render_properties
+from utils.code import is_legacy_code
+
+
+def json_response(data: Any, status_code: int = status.HTTP_200_OK):
+    """Render the data the same way as the DRF views do."""
+    return HttpResponse(
+        JSONRenderer().render(data),
+        content_type='application/json',
+        status=status_code,
+    )
+
+
+def error_response(error: exceptions.APIException) -> HttpResponse:
+    """Render the API exception like the default DRF exception handler."""
+    if isinstance(error.detail, (list, dict)):
+        data = error.detail
+    else:
+        data = {'detail': error.detail}
+
+    response = json_response(data, error.status_code)
+    if isinstance(error, (
+        exceptions.NotAuthenticated,
+        exceptions.AuthenticationFailed,
+    )):
+        response.status_code = status.HTTP_401_UNAUTHORIZED
+        response['WWW-Authenticate'] = BearerTokenAuthentication.keyword
+    return response
+
+
+class AsyncOrderView(View):
+    """Base of the native async client order views.
+
+    The views serve the same API as `order.views.OrderViewSet` with the same
+    serializers and permissions, but run on the event loop under ASGI and
+    reach the database with the async ORM, so a slow query does not hold a
+    worker thread for the whole request.
+
+    Only the `Bearer` token authentication is supported. The request is
+    wrapped into the DRF `Request`, so the body is parsed by the default
+    parsers.
+    """
+
+    authentication = BearerTokenAuthentication()
+    permissions = (ClientOnlyPermission(),)
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # The token authentication does not rely on cookies
+        view.csrf_exempt = True
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        request = Request(request, parsers=[
+            parser() for parser in api_settings.DEFAULT_PARSER_CLASSES
+        ])
+        try:
+            await self.authenticate(request)
+            self.check_permissions(request)
+            return await super().dispatch(request, *args, **kwargs)
+        except exceptions.APIException as error:
+            return error_response(error)
+
+    async def authenticate(self, request: Request):
+        """Set the request user.
+
+        Raises:
+            NotAuthenticated: if the request has no token.
+            AuthenticationFailed: if the token is invalid.
+        """
+        credentials = await self.authentication.aauthenticate(request)
+        if credentials is None:
+            raise exceptions.NotAuthenticated()
+        request.user, request.auth = credentials
+
+    def check_permissions(self, request: Request):
+        """Check the view permissions.
+
+        Raises:
+            PermissionDenied: if a permission is not granted.
+        """
+        for permission in self.permissions:
+            if not permission.has_permission(request, self):
+                raise exceptions.PermissionDenied(permission.message)
+
+    async def get_order(
+        self,
+        request: Request,
+        code: str,
+    ) -> Union[models.Order, models.ArchivedOrder]:
+        """Get the user order by its code or by the legacy code.
+
+        Looks for the archived order too if it is asked for.
+
+        Raises:
+            NotFound: if the user has no such order.
+        """
+        lookup_field = 'legacy_code' if is_legacy_code(code) else 'code'
+        order_models = [models.Order]
+        if include_archived(request):
+            order_models.append(models.ArchivedOrder)
+
+        for model in order_models:
+            try:
+                return await client_queryset(
+                    model.objects.all(),
+                    request.user.pk,
+                ).filter(
+                    client_id=request.user.pk,
+                ).aget(**{lookup_field: code})
+            except model.DoesNotExist:
+                pass
+        raise exceptions.NotFound()
+
+
+class AsyncOrderListView(AsyncOrderView):
+    """Async `list` and `create` actions of `OrderViewSet`."""
+
+    pagination_class = OrderCursorPagination
+    sync_pagination_class = OrderSyncPagination
+
+    async def get(self, request, **kwargs):
+        order_models = [models.Order]
+        if include_archived(request):
+            order_models.append(models.ArchivedOrder)
+        querysets = [
+            client_queryset(
+                model.objects.all(),
+                request.user.pk,
+            ).filter(client_id=request.user.pk)
+            for model in order_models
+        ]
+
+        if self.sync_pagination_class.cursor_query_param in request.GET:
+            paginator = self.sync_pagination_class()
+        else:
+            paginator = self.pagination_class()
+
+        if not paginator.prepare(request):
+            orders = [
+                order
+                for queryset in querysets
+                async for order in queryset
+            ]
+            return json_response(
+                serializers.OrderSerializer(orders, many=True).data,
+            )
+
+        page = paginator.set_page(paginator.merge_pages([
+            [order async for order in paginator.filter_page(queryset)]
+            for queryset in querysets
+        ]))
+        return json_response(paginator.get_paginated_data(
+            serializers.OrderSerializer(page, many=True).data,
+        ))
+
+    async def post(self, request, **kwargs):
+        data = dict(request.data.items())
+
+        # Set process to pending if the order is not standard
+        is_standard = await sync_to_async(standard_orders.is_standard)(
+            *(data.get(prop) for prop in ['color', 'size', 'form']),
+        )
+        if not is_standard:
+            data['process'] = models.Order.ProcessStatusChoice.PENDING
+
+        data['client'] = request.user.pk
+
+        serializer = serializers.OrderSerializer(data=data)
+        if not await sync_to_async(serializer.is_valid)():
+            return json_response(
+                serializer.errors,
+                status.HTTP_400_BAD_REQUEST,
+            )
+
+        # Saved without the manager, so the routers pick the client shard
+        serializer.instance = models.Order(**serializer.validated_data)
+        await serializer.instance.asave(force_insert=True)
+        metrics.inc(
+            'crm_orders_created_total',
+            process=serializer.instance.process,
+        )
+        return json_response(serializer.data, status.HTTP_201_CREATED)
+
+
+class AsyncOrderDetailView(AsyncOrderView):
+    """Async `retrieve` action of `OrderViewSet`."""
+
+    async def get(self, request, pk: str, **kwargs):
+        order = await self.get_order(request, pk)
+        return json_response(serializers.OrderSerializer(order).data)
+
+
+class AsyncOrderReturnView(AsyncOrderView):
+    """Async `return_order` action of `OrderViewSet`."""
+
+    object_permissions = (UpdateDeliveredOrderOnly(),)
+
+    async def post(self, request, pk: str, **kwargs):
+        order = await self.get_order(request, pk)
+        for permission in self.object_permissions:
+            if not permission.has_object_permission(request, self, order):
+                raise exceptions.PermissionDenied(permission.message)
+
+        order_return = await sync_to_async(create_return)(order)
+        return json_response(
+            serializers.OrderReturnSerializer(order_return).data,
+            status.HTTP_201_CREATED,
+        )
+
+
+class AsyncOrderPropertiesView(View):
+    """Async version of `order.views.OrderPropertiesView`.
+
+    The cached payload is served with the async cache API, only its
+    rendering queries the database in a worker thread.
+    """
+
+    async def get(self, request, **kwargs):
+        etag, content = await order_properties.acached()
+        if content is None:
+            etag, content = await sync_to_async(order_properties.get)(
+                render_properties,
+            )
+        return properties_response(request, etag, content)
+
+
+class AsyncOrderEventsView(AsyncOrderView):
+    """Server-sent events stream of the client order status changes.
+
+    Every event is an `order` event with the order `code`, `status`,
+    `process` and `modified` time. The stream resumes after the event id of
+    the `Last-Event-ID` header (or the `last_event_id` query param), the
+    `resync` event means some of the changes are lost and the client
+    should catch up with the delta sync (check `OrderSyncPagination`).
+
+    An idle stream costs a coroutine waiting for the `order.events` bus.
+    The stream is closed after `ORDER_EVENTS_MAX_AGE` seconds, so the
+    streams of the disconnected clients do not live forever, the clients
+    reconnect and resume from their last event. Should be served by the
+    ASGI server, a WSGI worker would hold a thread per stream.
+
+    The browser `EventSource` can not set the `Authorization` header, so the
+    token may be passed in the `token` query param instead.
+    """
+
+    authentication = QueryTokenAuthentication()
+
+    async def get(self, request, **kwargs):
+        response = StreamingHttpResponse(
+            self.stream(request.user.pk, self.get_last_event_id(request)),
+            content_type='text/event-stream',
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    @staticmethod
+    def get_last_event_id(request) -> Optional[int]:
+        """Get the id of the last event the client has received."""
+        value = request.headers.get('Last-Event-ID') or request.GET.get(
+            'last_event_id',
+        )
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+
+    async def stream(
+        self,
+        client_id: int,
+        last_id: Optional[int],
+    ) -> AsyncIterator[str]:
+        """Yield the client events and the heartbeat comments.
+
+        A new stream gets the events published after the subscription.
+        """
+        heartbeat = getattr(settings, 'ORDER_EVENTS_HEARTBEAT', 15)
+        deadline = monotonic() + getattr(settings, 'ORDER_EVENTS_MAX_AGE', 300)
+        subscription = order_events.subscribe(client_id)
+        if last_id is None:
+            last_id = subscription.start_id
+        try:
+            yield 'retry: 3000\n\n'
+            while monotonic() < deadline:
+                subscription.clear()
+                events, missed = order_events.events_after(client_id, last_id)
+                if missed:
+                    yield 'event: resync\ndata: {}\n\n'
+                for event_id, data in events:
+                    yield 'id: %d\nevent: order\ndata: %s\n\n' % (
+                        event_id, json.dumps(data),
+                    )
+                    last_id = event_id
+                if missed:
+                    # The delta sync catches up with the events published so
+                    # far, they are not lost for the stream anymore
+                    last_id = max(last_id, order_events.last_event_id())
+
+                if events or missed:
+                    continue
+                if not await subscription.wait(
+                    min(heartbeat, max(deadline - monotonic(), 0)),
+                ):
+                    yield ': ping\n\n'
+        finally:
+            order_events.unsubscribe(subscription)
@@ -0,0 +1,70 @@
+from django.contrib.auth import get_user_model
+from django.db import connections, router
+
+from order.models import Client
+from order.sharding import replicate_reference_rows
+
+
+def bulk_create_clients(clients: list[Client]) -> list[Client]:
+    """Insert the unsaved clients with a constant number of queries.
+
+    Django does not bulk create multi-table inherited models, so the parent
+    user rows are inserted with `bulk_create` and the `Client` rows with a
+    single multi-row insert. The given instances get their primary keys.
+    The clients are copied to the other shards, check `order.sharding`.
+    """
+    if not clients:
+        return clients
+
+    user_model = get_user_model()
+    db_alias = router.db_for_write(Client)
+    parent_fields = [
+        field for field in user_model._meta.concrete_fields
+        if not field.primary_key
+    ]
+    users = user_model.objects.using(db_alias).bulk_create([
+        user_model(**{
+            field.attname: getattr(client, field.attname)
+            for field in parent_fields
+        })
+        for client in clients
+    ])
+    if any(user.pk is None for user in users):
+        user_ids = dict(
+            user_model.objects.using(db_alias).filter(
+                username__in=[client.username for client in clients],
+            ).values_list('username', 'pk'),
+        )
+    else:
+        user_ids = {user.username: user.pk for user in users}
+
+    for client in clients:
+        client.user_ptr_id = client.pk = user_ids[client.username]
+
+    connection = connections[db_alias]
+    quote = connection.ops.quote_name
+    local_fields = Client._meta.local_concrete_fields
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            'INSERT INTO %s (%s) VALUES (%s)' % (
+                quote(Client._meta.db_table),
+                ', '.join(quote(field.column) for field in local_fields),
+                ', '.join(['%s'] * len(local_fields)),
+            ),
+            [
+                [
+                    field.get_db_prep_save(
+                        getattr(client, field.attname), connection,
+                    )
+                    for field in local_fields
+                ]
+                for client in clients
+            ],
+        )
+
+    for client in clients:
+        client._state.adding = False
+        client._state.db = db_alias
+
+    replicate_reference_rows(Client, clients, db_alias)
+    return clients
@@ -0,0 +1,213 @@
+import random
+from datetime import datetime, timedelta
+from itertools import chain
+from typing import Iterable, NamedTuple, Optional
+from uuid import UUID, uuid4
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+
+from config.shards import scatter_queryset, shard_querysets
+from order.models import Order
+from order.transitions import RELEASED_CLAIM, TRANSITIONS, apply_transition
+
+# The claimable stages and the transitions finishing their work
+CLAIM_STAGES = {
+    Order.ProcessStatusChoice.IN_ASSEMBLY: TRANSITIONS['to_delivery'],
+    Order.ProcessStatusChoice.IN_DELIVERY: TRANSITIONS['complete'],
+}
+
+MAX_CLAIM_SIZE = 100
+
+
+class Claim(NamedTuple):
+    """Orders claimed by a worker at once.
+
+    Attributes:
+        token: claim token the worker extends, releases and finishes the
+            claim with.
+        expires: lease expiry time, the orders may be claimed by another
+            worker after it.
+        orders: the claimed orders in the creation order.
+    """
+
+    token: UUID
+    expires: datetime
+    orders: list[Order]
+
+
+def get_lease(seconds: Optional[int] = None) -> timedelta:
+    """Get the lease duration, `ORDER_CLAIM_LEASE_SECONDS` by default."""
+    return timedelta(seconds=seconds or settings.ORDER_CLAIM_LEASE_SECONDS)
+
+
+def is_claimable(now: datetime) -> Q:
+    """Get the condition of the orders without a live claim."""
+    return Q(claim_expires__isnull=True) | Q(claim_expires__lte=now)
+
+
+def claim_batch(queryset: QuerySet, limit: int, now: datetime, **values):
+    """Claim up to `limit` of the oldest unclaimed orders of the queryset.
+
+    The orders are selected with `SKIP LOCKED` where the database supports
+    it, so the concurrent claims skip the rows locked by each other instead
+    of waiting for them. Otherwise the orders are claimed with one `UPDATE`
+    of the selected rows repeating the lease condition, the database
+    serializes the writes and a row claimed concurrently is skipped.
+
+    Returns:
+        The number of the claimed orders.
+    """
+    using = queryset._db or router.db_for_write(Order)
+    candidates = queryset.using(using).filter(
+        is_claimable(now),
+    ).order_by('created', 'code')
+
+    if not connections[using].features.has_select_for_update_skip_locked:
+        return queryset.using(using).filter(
+            is_claimable(now),
+            pk__in=candidates.values('pk')[:limit],
+        ).update(**values)
+
+    with transaction.atomic(using=using):
+        codes = list(candidates.select_for_update(
+            skip_locked=True,
+        ).values_list('pk', flat=True)[:limit])
+        return Order.objects.using(using).filter(
+            pk__in=codes,
+        ).update(**values)
+
+
+def claimed_orders(queryset: QuerySet, token: UUID) -> list[Order]:
+    """Get the orders of the claim from every shard."""
+    orders = chain.from_iterable(scatter_queryset(
+        queryset.filter(claim_token=token),
+        list,
+    ))
+    return sorted(orders, key=lambda order: (order.created, order.pk))
+
+
+def claim_orders(
+    queryset: QuerySet,
+    worker,
+    process: str,
+    limit: int,
+    lease: Optional[int] = None,
+) -> Claim:
+    """Claim the oldest orders of the `process` stage for the worker.
+
+    The orders are leased to the worker until the claim expires, the worker
+    extends the lease with `extend_claim` while working on them. The shards
+    are claimed from in a random order, the oldest orders of a shard first.
+
+    Args:
+        queryset: orders to claim from.
+        worker: the claiming user.
+        process: one of the `CLAIM_STAGES`.
+        limit: maximum number of the claimed orders.
+        lease: lease duration in seconds, check `get_lease`.
+
+    Returns:
+        The claim, with no orders if there are none to claim.
+    """
+    now = timezone.now()
+    token = uuid4()
+    expires = now + get_lease(lease)
+
+    shards = shard_querysets(queryset.filter(CLAIM_STAGES[process].source))
+    random.shuffle(shards)
+    claimed = 0
+    for shard_queryset in shards:
+        if claimed >= limit:
+            break
+        claimed += claim_batch(
+            shard_queryset, limit - claimed, now,
+            claimed_by=worker, claim_token=token, claim_expires=expires,
+        )
+
+    orders = claimed_orders(queryset, token) if claimed else []
+    return Claim(token, expires, orders)
+
+
+def live_claim(
+    queryset: QuerySet,
+    worker,
+    token: UUID,
+    codes: Optional[Iterable[str]] = None,
+) -> QuerySet:
+    """Filter the unexpired orders of the worker claim, optionally by code."""
+    queryset = queryset.filter(
+        claimed_by=worker,
+        claim_token=token,
+        claim_expires__gt=timezone.now(),
+    )
+    if codes is not None:
+        queryset = queryset.filter(pk__in=list(codes))
+    return queryset
+
+
+def extend_claim(
+    queryset: QuerySet,
+    worker,
+    token: UUID,
+    lease: Optional[int] = None,
+) -> tuple[int, datetime]:
+    """Extend the lease of the claim orders, the worker heartbeat.
+
+    An expired claim is not extended, its orders may be claimed by another
+    worker already.
+
+    Returns:
+        The number of the extended orders and the new expiry time.
+    """
+    expires = timezone.now() + get_lease(lease)
+    extended = sum(scatter_queryset(
+        live_claim(queryset, worker, token),
+        lambda orders: orders.update(claim_expires=expires),
+    ))
+    return extended, expires
+
+
+def release_claim(
+    queryset: QuerySet,
+    worker,
+    token: UUID,
+    codes: Optional[Iterable[str]] = None,
+) -> int:
+    """Give the claim orders back to the queue unchanged.
+
+    Returns:
+        The number of the released orders.
+    """
+    return sum(scatter_queryset(
+        live_claim(queryset, worker, token, codes),
+        lambda orders: orders.update(**RELEASED_CLAIM),
+    ))
+
+
+def finish_claim(
+    queryset: QuerySet,
+    worker,
+    token: UUID,
+    codes: Optional[Iterable[str]] = None,
+) -> int:
+    """Move the claim orders to the next stage, check `CLAIM_STAGES`.
+
+    The transitions release the claim, check `order.transitions`.
+
+    Returns:
+        The number of the finished orders.
+    """
+    queryset = live_claim(queryset, worker, token, codes)
+    return sum(
+        updated
+        for transition in CLAIM_STAGES.values()
+        for updated in scatter_queryset(
+            queryset,
+            lambda orders, transition=transition: apply_transition(
+                orders, transition,
+            ),
+        )
+    )
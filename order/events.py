@@ -0,0 +1,190 @@
+import asyncio
+from collections import OrderedDict, deque
+from threading import Lock
+from time import time_ns
+from typing import Any, Optional
+
+from django.conf import settings
+from django.db import transaction
+
+Event = tuple[int, dict[str, Any]]
+
+
+class Subscription:
+    """Subscription of a stream to the events of a client.
+
+    The bus may publish from any thread, the subscriber is woken on its own
+    event loop.
+    """
+
+    def __init__(self, client_id: int):
+        self.client_id = client_id
+        self.loop = asyncio.get_running_loop()
+        self.event = asyncio.Event()
+        self.start_id = 0
+
+    def notify(self):
+        """Wake the subscriber, thread-safe."""
+        self.loop.call_soon_threadsafe(self.event.set)
+
+    def clear(self):
+        """Reset the wake flag before reading the events."""
+        self.event.clear()
+
+    async def wait(self, timeout: float) -> bool:
+        """Wait for the next event, returns `False` on the timeout."""
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+
+class ClientEvents:
+    """Ring buffer of the recent events of a client.
+
+    Attributes:
+        events: `(id, data)` pairs in the publishing order.
+        dropped_id: id of the last event dropped from the buffer.
+    """
+
+    def __init__(self, size: int):
+        self.events: deque[Event] = deque(maxlen=size)
+        self.dropped_id = 0
+
+    def append(self, event: Event):
+        if len(self.events) == self.events.maxlen:
+            self.dropped_id = self.events[0][0]
+        self.events.append(event)
+
+
+class OrderEventBus:
+    """In-process bus of the order status changes.
+
+    Keeps the last `buffer_size` events of at most `max_clients` recently
+    active clients, so a reconnected stream resumes from its last event id.
+    Event ids grow with the time in microseconds, so the ids stay ordered
+    after a restart. The bus sees the changes made by its own process only,
+    the clients should catch up with the delta sync on the `resync` event
+    and on a reconnect.
+    """
+
+    def __init__(self, buffer_size: int = 100, max_clients: int = 10000):
+        self.buffer_size = buffer_size
+        self.max_clients = max_clients
+        self._lock = Lock()
+        self._clients: OrderedDict[int, ClientEvents] = OrderedDict()
+        self._subscriptions: dict[int, set[Subscription]] = {}
+        self._evicted_id = 0
+        self._last_id = 0
+
+    def publish(self, client_id: Optional[int], data: dict[str, Any]):
+        """Add the client event and wake the client streams."""
+        if client_id is None:
+            return
+
+        with self._lock:
+            self._last_id = max(self._last_id + 1, time_ns() // 1000)
+            client = self._clients.get(client_id)
+            if client is None:
+                client = self._clients[client_id] = ClientEvents(
+                    self.buffer_size,
+                )
+            self._clients.move_to_end(client_id)
+            client.append((self._last_id, data))
+
+            while len(self._clients) > self.max_clients:
+                _, evicted = self._clients.popitem(last=False)
+                if evicted.events:
+                    self._evicted_id = max(
+                        self._evicted_id, evicted.events[-1][0],
+                    )
+
+            subscriptions = list(self._subscriptions.get(client_id, ()))
+
+        for subscription in subscriptions:
+            subscription.notify()
+
+    def subscribe(self, client_id: int) -> Subscription:
+        """Subscribe the running event loop to the client events.
+
+        The subscription `start_id` is the id of the last published event.
+        """
+        subscription = Subscription(client_id)
+        with self._lock:
+            subscription.start_id = self._last_id
+            self._subscriptions.setdefault(client_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.client_id)
+            if subscriptions is None:
+                return
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.client_id]
+
+    def last_event_id(self) -> int:
+        """Get the id of the last published event."""
+        with self._lock:
+            return self._last_id
+
+    def events_after(
+        self,
+        client_id: int,
+        last_id: int,
+    ) -> tuple[list[Event], bool]:
+        """Get the client events newer than the last event id.
+
+        Returns:
+            The events and the flag that some of the newer events are lost
+            (dropped from the buffer or evicted with it).
+        """
+        with self._lock:
+            client = self._clients.get(client_id)
+            if client is None:
+                return [], last_id < self._evicted_id
+
+            return (
+                [event for event in client.events if event[0] > last_id],
+                last_id < client.dropped_id,
+            )
+
+
+order_events = OrderEventBus(
+    buffer_size=getattr(settings, 'ORDER_EVENTS_BUFFER_SIZE', 100),
+    max_clients=getattr(settings, 'ORDER_EVENTS_MAX_CLIENTS', 10000),
+)
+
+
+def order_event_data(code: str, status: str, process: str, modified) -> dict:
+    """Get the order change event payload."""
+    return {
+        'code': code,
+        'status': str(status),
+        'process': str(process),
+        'modified': modified.isoformat() if modified else None,
+    }
+
+
+def publish_order_change(order, using: Optional[str] = None):
+    """Publish the order state once the current transaction is committed."""
+    client_id = order.client_id
+    data = order_event_data(
+        order.code, order.status, order.process, order.modified,
+    )
+    transaction.on_commit(
+        lambda: order_events.publish(client_id, data),
+        using=using,
+    )
+
+
+def publish_order_changes(changes: list[tuple], using: Optional[str] = None):
+    """Publish the `(client_id, data)` changes once committed."""
+    def publish():
+        for client_id, data in changes:
+            order_events.publish(client_id, data)
+
+    if changes:
+        transaction.on_commit(publish, using=using)
@@ -0,0 +1,147 @@
+import csv
+import json
+from typing import Any, Iterator
+
+from django.core.exceptions import ValidationError
+from django.db.models.query import QuerySet
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_datetime
+from django.utils.translation import gettext_lazy as _
+
+from order import models
+
+EXPORT_FIELDS = (
+    'code', 'client',
+    'color', 'size', 'form',
+    'status', 'process', 'comment',
+    'created', 'modified',
+)
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+CHUNK_SIZE = 2000
+
+
+class Echo:
+    """File-like object that returns the written value instead of storing.
+
+    Allows `csv.writer` to produce the response lines one by one.
+    """
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def filter_orders(queryset: QuerySet, params: Any) -> QuerySet:
+    """Apply the export filters from the query params.
+
+    Supports `status` and `process` (may be passed several times) and the
+    `created_after` and `created_before` ISO datetimes.
+
+    Raises:
+        ValidationError: if a filter value is invalid.
+    """
+    for field, choices in (
+        ('status', models.Order.StatusChoice.values),
+        ('process', models.Order.ProcessStatusChoice.values),
+    ):
+        values = params.getlist(field)
+        if not values:
+            continue
+        invalid = set(values) - set(choices)
+        if invalid:
+            raise ValidationError({
+                field: _('Unknown values: %(values)s.') % {
+                    'values': ', '.join(sorted(invalid)),
+                },
+            })
+        queryset = queryset.filter(**{'%s__in' % field: values})
+
+    for param, lookup in (
+        ('created_after', 'created__gte'),
+        ('created_before', 'created__lt'),
+    ):
+        if not params.get(param):
+            continue
+        value = parse_datetime(params[param])
+        if value is None:
+            raise ValidationError({
+                param: _('Expected an ISO 8601 datetime.'),
+            })
+        queryset = queryset.filter(**{lookup: value})
+
+    return queryset
+
+
+def iter_order_rows(*querysets: QuerySet) -> Iterator[dict[str, Any]]:
+    """Iterate the exported orders rows of the querysets one by one.
+
+    The rows are fetched in chunks without model instances. Property names
+    are resolved with the maps loaded once per export and the client is
+    resolved with a join, so there are no per-row queries.
+    """
+    names = {
+        model._meta.model_name: dict(model.objects.values_list('pk', 'name'))
+        for model in [models.Color, models.Size, models.Form]
+    }
+
+    for queryset in querysets:
+        rows = queryset.order_by().values_list(
+            'code', 'client__username',
+            'color_id', 'size_id', 'form_id',
+            'status', 'process', 'comment',
+            'created', 'modified',
+        )
+
+        for row in rows.iterator(chunk_size=CHUNK_SIZE):
+            data = dict(zip(EXPORT_FIELDS, row))
+            for field in ('color', 'size', 'form'):
+                data[field] = names[field].get(data[field])
+            data['created'] = data['created'].isoformat()
+            data['modified'] = data['modified'].isoformat()
+            yield data
+
+
+def stream_ndjson(*querysets: QuerySet) -> Iterator[str]:
+    """Stream the orders as newline-delimited JSON."""
+    for data in iter_order_rows(*querysets):
+        yield json.dumps(data, ensure_ascii=False) + '\n'
+
+
+def stream_csv(*querysets: QuerySet) -> Iterator[str]:
+    """Stream the orders as CSV with the header row."""
+    writer = csv.DictWriter(Echo(), fieldnames=EXPORT_FIELDS)
+    yield writer.writeheader()
+    for data in iter_order_rows(*querysets):
+        yield writer.writerow(data)
+
+
+def export_response(
+    *querysets: QuerySet,
+    output: str = 'ndjson',
+) -> StreamingHttpResponse:
+    """Build the streaming response with the exported orders.
+
+    The orders of several querysets, e.g. the archived ones, are exported
+    one after another.
+
+    Raises:
+        ValidationError: if the output format is unknown.
+    """
+    if output not in EXPORT_FORMATS:
+        raise ValidationError({
+            'output': _('Expected one of: %(formats)s.') % {
+                'formats': ', '.join(EXPORT_FORMATS),
+            },
+        })
+
+    stream = stream_csv if output == 'csv' else stream_ndjson
+    response = StreamingHttpResponse(
+        stream(*querysets),
+        content_type=EXPORT_FORMATS[output],
+    )
+    response['Content-Disposition'] = (
+        'attachment; filename="orders.%s"' % output
+    )
+    return response
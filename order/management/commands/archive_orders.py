@@ -0,0 +1,70 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+
+from config.shards import get_shards
+from order import models
+from order.archive import (
+    DEFAULT_BATCH_SIZE,
+    FINISHED,
+    archive_before,
+    archive_orders,
+)
+
+
+class Command(BaseCommand):
+    """Move the finished orders to the archive."""
+
+    help = (
+        'Move the finished orders not modified for the given number of days '
+        'to the archive tables of their shard. The orders are moved in '
+        'batches with a transaction per batch, so the command may run while '
+        'the service is in use.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=float, default=None,
+            help='Age of the archived orders, `ORDER_ARCHIVE_AFTER_DAYS` by '
+                 'default.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only count the orders that would be archived.',
+        )
+
+    def handle(self, *args, **options):
+        before = archive_before(options['days'])
+
+        if options['dry_run']:
+            self.stdout.write('%d orders would be archived.' % sum(
+                models.Order.objects.using(alias).filter(
+                    FINISHED,
+                    modified__lt=before,
+                ).count()
+                for alias in get_shards()
+            ))
+            return
+
+        started = perf_counter()
+
+        def progress(state):
+            self.stdout.write('Batch %d: %d archived, %d in total.' % state)
+
+        archived = sum(
+            archive_orders(
+                before,
+                batch_size=options['batch_size'],
+                progress=progress,
+                using=alias,
+            )
+            for alias in get_shards()
+        )
+        self.stdout.write(self.style.SUCCESS(
+            'Archived %d orders modified before %s in %.1fs.' % (
+                archived, before.isoformat(), perf_counter() - started,
+            ),
+        ))
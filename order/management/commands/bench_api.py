@@ -0,0 +1,269 @@
+import json
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection, HTTPException, HTTPSConnection
+from itertools import cycle
+from time import perf_counter
+from typing import Any, Callable, Optional
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+SCENARIOS = ('login', 'properties', 'list', 'create', 'retrieve', 'return')
+
+
+def percentile(values: list[float], rank: float) -> float:
+    """Get the nearest-rank percentile of the sorted values."""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, round(rank / 100 * len(values)) - 1))
+    return values[index]
+
+
+class HttpDriver:
+    """Thread-safe HTTP client keeping a connection per thread."""
+
+    def __init__(self, base_url: str, prefix: str = ''):
+        url = urlsplit(base_url)
+        self.connection_class = (
+            HTTPSConnection if url.scheme == 'https' else HTTPConnection
+        )
+        self.netloc = url.netloc
+        self.prefix = url.path.rstrip('/') + prefix.rstrip('/')
+        self.local = threading.local()
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        body: Any = None,
+        token: Optional[str] = None,
+    ) -> tuple[int, Any]:
+        """Send the request and get the status code and the JSON body."""
+        headers = {'Accept': 'application/json'}
+        if token:
+            headers['Authorization'] = 'Bearer %s' % token
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+
+        for attempt in range(2):
+            connection = getattr(self.local, 'connection', None)
+            if connection is None:
+                connection = self.connection_class(self.netloc, timeout=30)
+                self.local.connection = connection
+            try:
+                connection.request(
+                    method, self.prefix + path, payload, headers,
+                )
+                response = connection.getresponse()
+                content = response.read()
+                break
+            except (HTTPException, OSError):
+                connection.close()
+                self.local.connection = None
+                if attempt:
+                    raise
+
+        try:
+            return response.status, json.loads(content) if content else None
+        except ValueError:
+            return response.status, None
+
+
+class Command(BaseCommand):
+    """Benchmark the order API of a running server."""
+
+    help = (
+        'Benchmark the order API of a running server with the clients seeded '
+        'by `seed_orders`. Every scenario sends `--requests` requests with '
+        '`--concurrency` threads and reports the latency percentiles and '
+        'the throughput as JSON. To compare ASGI with WSGI, run the server '
+        'with the same number of worker processes, e.g. `gunicorn '
+        'config.wsgi -w 4` and `uvicorn config.asgi:application --workers '
+        '4`, and benchmark the sync API and the async one (`--path-prefix '
+        '/async`) with the same `--concurrency`, labeling every report with '
+        '`--label`.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument(
+            '--path-prefix', default='',
+            help='Prefix of the order API paths, e.g. `/async`.',
+        )
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--clients', type=int, default=20)
+        parser.add_argument('--prefix', default='loadtest-client-')
+        parser.add_argument('--password', default='loadtest-password')
+        parser.add_argument(
+            '--scenario', action='append', choices=SCENARIOS,
+            help='Run only the given scenarios, may be repeated.',
+        )
+        parser.add_argument(
+            '--label', default='',
+            help='Report label, e.g. the server and its worker count.',
+        )
+        parser.add_argument('--output', help='Write the report to the file.')
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        # pylint: disable=attribute-defined-outside-init
+        self.rng = random.Random(options['seed'])
+        self.auth = HttpDriver(options['base_url'])
+        self.api = HttpDriver(options['base_url'], options['path_prefix'])
+        self.options = options
+
+        self.credentials = [
+            {
+                'username': '%s%d' % (options['prefix'], index),
+                'password': options['password'],
+            }
+            for index in range(options['clients'])
+        ]
+        self.tokens = self.login_clients()
+        self.properties = self.api.request('GET', '/orders/properties/')[1]
+
+        report = {
+            'label': options['label'],
+            'base_url': options['base_url'],
+            'path_prefix': options['path_prefix'],
+            'concurrency': options['concurrency'],
+            'scenarios': {},
+        }
+        for name in options['scenario'] or SCENARIOS:
+            operation = getattr(self, 'prepare_%s' % name)()
+            report['scenarios'][name] = self.run(operation)
+            self.stderr.write('%s: %s' % (
+                name, json.dumps(report['scenarios'][name]),
+            ))
+
+        content = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                output.write(content)
+        self.stdout.write(content)
+
+    def login_clients(self) -> list[str]:
+        """Get the tokens of the seeded clients.
+
+        Raises:
+            CommandError: if a client is unable to log in.
+        """
+        tokens = []
+        for credentials in self.credentials:
+            status, body = self.auth.request(
+                'POST', '/auth/login/', credentials,
+            )
+            if status != 200:
+                raise CommandError(
+                    'Unable to log in as %s, run `seed_orders` first.'
+                    % credentials['username'],
+                )
+            tokens.append(body['token'])
+        return tokens
+
+    def run(self, operation: Callable[[], int]) -> dict[str, Any]:
+        """Run the operation concurrently and collect the statistics."""
+        total = self.options['requests']
+
+        def measure(_):
+            started = perf_counter()
+            try:
+                status = operation()
+            except (HTTPException, OSError, StopIteration):
+                status = None
+            return perf_counter() - started, status
+
+        started = perf_counter()
+        with ThreadPoolExecutor(self.options['concurrency']) as executor:
+            results = list(executor.map(measure, range(total)))
+        elapsed = perf_counter() - started
+
+        latencies = sorted(latency * 1000 for latency, _ in results)
+        errors = sum(
+            1 for _, status in results
+            if status is None or status >= 400
+        )
+        return {
+            'requests': total,
+            'errors': errors,
+            'seconds': round(elapsed, 3),
+            'throughput_rps': round(total / elapsed, 1),
+            'latency_ms': {
+                'mean': round(sum(latencies) / len(latencies), 2),
+                'p50': round(percentile(latencies, 50), 2),
+                'p95': round(percentile(latencies, 95), 2),
+                'p99': round(percentile(latencies, 99), 2),
+                'max': round(latencies[-1], 2),
+            },
+        }
+
+    def prepare_login(self):
+        credentials = cycle(self.credentials)
+        return lambda: self.auth.request(
+            'POST', '/auth/login/', next(credentials),
+        )[0]
+
+    def prepare_properties(self):
+        return lambda: self.api.request('GET', '/orders/properties/')[0]
+
+    def prepare_list(self):
+        tokens = cycle(self.tokens)
+        return lambda: self.api.request(
+            'GET', '/orders/?page_size=50', token=next(tokens),
+        )[0]
+
+    def prepare_create(self):
+        tokens = cycle(self.tokens)
+
+        def create():
+            return self.api.request('POST', '/orders/', {
+                name: self.rng.choice(values)['id']
+                for name, values in self.properties.items()
+            }, token=next(tokens))[0]
+        return create
+
+    def client_orders(self, page_size: int = 200):
+        """Get the `(token, order)` pairs of the first orders pages."""
+        pairs = []
+        for token in self.tokens:
+            status, body = self.api.request(
+                'GET', '/orders/?page_size=%d' % page_size, token=token,
+            )
+            if status == 200:
+                pairs.extend((token, order) for order in body['results'])
+        if not pairs:
+            raise CommandError('The clients have no orders.')
+        return pairs
+
+    def prepare_retrieve(self):
+        pairs = cycle(self.client_orders())
+
+        def retrieve():
+            token, order = next(pairs)
+            return self.api.request(
+                'GET', '/orders/%s/' % order['code'], token=token,
+            )[0]
+        return retrieve
+
+    def prepare_return(self):
+        pairs = iter([
+            (token, order)
+            for token, order in self.client_orders(page_size=1000)
+            if order['process'] == 'delivered'
+            and order['status'] in ('in_process', 'completed')
+        ])
+        lock = threading.Lock()
+
+        def return_order():
+            with lock:
+                token, order = next(pairs)
+            return self.api.request(
+                'POST', '/orders/%s/return/' % order['code'], {},
+                token=token,
+            )[0]
+        return return_order
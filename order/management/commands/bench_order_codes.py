@@ -0,0 +1,97 @@
+import json
+import sqlite3
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter, time_ns
+
+from django.core.management.base import BaseCommand
+
+from utils.code import generate_code, generate_legacy_code
+
+SCHEMA = (
+    'CREATE TABLE "order" ('
+    '"code" varchar(%(length)d) NOT NULL PRIMARY KEY, '
+    '"created" datetime NOT NULL, '
+    '"client_id" integer NULL)',
+    'CREATE INDEX "order_client_created" ON "order" ("client_id", "created")',
+    'CREATE TABLE "order_return" ('
+    '"id" integer NOT NULL PRIMARY KEY AUTOINCREMENT, '
+    '"order_id" varchar(%(length)d) NOT NULL UNIQUE '
+    'REFERENCES "order" ("code"))',
+)
+
+
+class Command(BaseCommand):
+    """Benchmark the random and the time-ordered order codes."""
+
+    help = (
+        'Compare inserts and index sizes of the random hex order codes and '
+        'the time-ordered ULID codes on a scratch SQLite database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200_000)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--clients', type=int, default=1000)
+        parser.add_argument(
+            '--return-every', type=int, default=20,
+            help='Create an order return for every N-th order.',
+        )
+
+    def handle(self, *args, **options):
+        schemes = {
+            'legacy_hex': (generate_legacy_code, 40),
+            'ulid': (generate_code, 26),
+        }
+        with TemporaryDirectory() as directory:
+            report = {
+                name: self.run_scheme(
+                    Path(directory) / ('%s.sqlite3' % name),
+                    generator, length, **options,
+                )
+                for name, (generator, length) in schemes.items()
+            }
+
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def run_scheme(self, path, generator, length, **options):
+        """Insert the orders with the given code generator and measure."""
+        # pylint: disable=too-many-locals
+        connection = sqlite3.connect(path)
+        for statement in SCHEMA:
+            connection.execute(statement % {'length': length})
+
+        rows, batch_size = options['rows'], options['batch_size']
+        clients, return_every = options['clients'], options['return_every']
+        started = perf_counter()
+        for offset in range(0, rows, batch_size):
+            orders = []
+            for index in range(offset, min(offset + batch_size, rows)):
+                orders.append((generator(), time_ns(), index % clients))
+            with connection:
+                connection.executemany(
+                    'INSERT INTO "order" VALUES (?, ?, ?)', orders,
+                )
+                connection.executemany(
+                    'INSERT INTO "order_return" ("order_id") VALUES (?)',
+                    [(order[0],) for order in orders[::return_every]],
+                )
+        elapsed = perf_counter() - started
+
+        sizes = dict(connection.execute(
+            'SELECT "name", SUM("pgsize") FROM "dbstat" GROUP BY "name"',
+        ))
+        connection.close()
+
+        return {
+            'rows': rows,
+            'seconds': round(elapsed, 3),
+            'rows_per_second': round(rows / elapsed),
+            'code_length': length,
+            'order_pk_index_bytes': sizes.get('sqlite_autoindex_order_1'),
+            'order_return_fk_index_bytes': sizes.get(
+                'sqlite_autoindex_order_return_1',
+            ),
+            'order_table_bytes': sizes.get('order'),
+            'file_bytes': path.stat().st_size,
+        }
@@ -0,0 +1,95 @@
+import json
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import (
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+
+from order.queryplans import (
+    BASELINE_PATH,
+    compare_with_baseline,
+    load_baseline,
+    run_hot_paths,
+    save_baseline,
+)
+
+
+class Command(BaseCommand):
+    """Compare the hot path query plans with the baseline."""
+
+    help = (
+        'Run the ORM hot paths against a seeded test database, explain their '
+        'queries and compare the query counts, the full table scans and the '
+        'sorts with the committed baseline. Fails if a path runs more '
+        'queries, starts scanning a table or sorting the rows.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--baseline', type=Path, default=BASELINE_PATH,
+            help='Baseline JSON file, `order/queryplans.json` by default.',
+        )
+        parser.add_argument(
+            '--update', action='store_true',
+            help='Store the results as the new baseline.',
+        )
+        parser.add_argument('--clients', type=int, default=20)
+        parser.add_argument('--orders', type=int, default=2000)
+        parser.add_argument(
+            '--show-plans', action='store_true',
+            help='Print the query plans of every path.',
+        )
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            call_command(
+                'seed_orders',
+                clients=options['clients'],
+                orders=options['orders'],
+                seed=1,
+                stdout=StringIO(),
+            )
+            if connections['default'].vendor in ('sqlite', 'postgresql'):
+                with connections['default'].cursor() as cursor:
+                    cursor.execute('ANALYZE')
+
+            results = run_hot_paths()
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        for name, result in results.items():
+            self.stdout.write('%s: %d queries, %d sorts, scans: %s.' % (
+                name, result['queries'], result['sorts'],
+                ', '.join(result['scans']) or '-',
+            ))
+            if options['show_plans']:
+                for plan in result['plans']:
+                    self.stdout.write('  %s' % plan['sql'])
+                    self.stdout.write(json.dumps(plan['plan'], indent=4))
+
+        if options['update']:
+            save_baseline(results, options['baseline'])
+            self.stdout.write(self.style.SUCCESS(
+                'The baseline is stored to %s.' % options['baseline'],
+            ))
+            return
+
+        problems = compare_with_baseline(
+            results,
+            load_baseline(options['baseline']),
+        )
+        for problem in problems:
+            self.stderr.write(problem)
+        if problems:
+            raise CommandError('%d query plan regressions.' % len(problems))
+        self.stdout.write(self.style.SUCCESS('The query plans match.'))
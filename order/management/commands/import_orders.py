@@ -0,0 +1,271 @@
+import csv
+import json
+import sys
+from contextlib import nullcontext
+from itertools import islice
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Iterator, Optional
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from order import models
+from order.bulk import bulk_create_clients
+from order.sharding import bulk_create_orders
+from order.standard import standard_orders
+
+USER_FIELDS = ('email', 'first_name', 'last_name')
+
+
+class Command(BaseCommand):
+    """Import the clients and the orders from a file."""
+
+    help = (
+        'Import clients and orders from a CSV or NDJSON file. Every record '
+        'has the client `username` (and optionally `email`, `first_name`, '
+        '`last_name`, `address`, `additional`) and, to create an order, the '
+        '`color`, `size` and `form` names with optional `status`, `process` '
+        'and `comment`. Unknown clients are created on the first record.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Input file path, `-` for stdin.')
+        parser.add_argument(
+            '--format', choices=('csv', 'ndjson'), default=None,
+            help='Input format, detected by the file extension by default.',
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--checkpoint', default=None,
+            help=(
+                'Checkpoint file, the import continues after the last '
+                'committed batch if the file exists.'
+            ),
+        )
+
+    def handle(self, *args, **options):
+        # pylint: disable=attribute-defined-outside-init
+        self.batch_size = options['batch_size']
+        self.checkpoint = (
+            Path(options['checkpoint']) if options['checkpoint'] else None
+        )
+        self.property_ids = {
+            model._meta.model_name: dict(
+                model.objects.values_list('name', 'pk'),
+            )
+            for model in [models.Color, models.Size, models.Form]
+        }
+        self.standard = standard_orders.get_triples()
+
+        skip = self.read_checkpoint(options['path'])
+        if skip:
+            self.stdout.write('Resuming after %d records.' % skip)
+
+        records = islice(self.read_records(options), skip, None)
+        position = skip
+        totals = {'clients': 0, 'orders': 0, 'skipped': 0}
+        started = perf_counter()
+
+        while batch := list(islice(records, self.batch_size)):
+            batch_started = perf_counter()
+            counts = self.import_batch(batch, position)
+            position += len(batch)
+            self.write_checkpoint(options['path'], position)
+
+            for key, value in counts.items():
+                totals[key] += value
+            self.stdout.write(
+                'Imported records %d: %d clients, %d orders, %d skipped, '
+                '%.0f records/sec.' % (
+                    position, counts['clients'], counts['orders'],
+                    counts['skipped'],
+                    len(batch) / (perf_counter() - batch_started),
+                ),
+            )
+
+        elapsed = perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            'Done: %d clients, %d orders, %d skipped in %.1fs '
+            '(%.0f records/sec).' % (
+                totals['clients'], totals['orders'], totals['skipped'],
+                elapsed, (position - skip) / elapsed if elapsed else 0,
+            ),
+        ))
+
+    def read_records(self, options) -> Iterator[Optional[dict[str, Any]]]:
+        """Stream the input records as dictionaries.
+
+        The malformed NDJSON lines and the values other than objects are
+        streamed as `None`, so they keep their record numbers.
+
+        Raises:
+            CommandError: if the input format is unknown.
+        """
+        path = options['path']
+        input_format = options['format']
+        if input_format is None:
+            input_format = Path(path).suffix.lstrip('.').lower()
+        if input_format not in ('csv', 'ndjson', 'jsonl'):
+            raise CommandError(
+                'Unable to detect the input format, use `--format`.',
+            )
+
+        # The stdin is read as is and left open
+        with (
+            open(path, encoding='utf-8', newline='')
+            if path != '-' else nullcontext(sys.stdin)
+        ) as stream:
+            if input_format == 'csv':
+                yield from csv.DictReader(stream)
+                return
+
+            for line in stream:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                yield record if isinstance(record, dict) else None
+
+    def import_batch(self, batch, position: int) -> dict[str, int]:
+        """Create the batch clients and orders in a single transaction."""
+        counts = {'clients': 0, 'orders': 0, 'skipped': 0}
+
+        with transaction.atomic():
+            clients = self.resolve_clients(batch, counts)
+
+            orders = []
+            for index, record in enumerate(batch, start=position + 1):
+                if record is None:
+                    self.stderr.write(
+                        'Record %d: not a JSON object, skipped.' % index,
+                    )
+                    counts['skipped'] += 1
+                    continue
+
+                client_id = clients.get(record.get('username'))
+                if client_id is None:
+                    self.stderr.write(
+                        'Record %d: not a client username, skipped.' % index,
+                    )
+                    counts['skipped'] += 1
+                    continue
+
+                if not record.get('color'):
+                    continue
+
+                order = self.build_order(record, client_id)
+                if order is None:
+                    self.stderr.write(
+                        'Record %d: invalid order fields, skipped.' % index,
+                    )
+                    counts['skipped'] += 1
+                    continue
+                orders.append(order)
+
+            bulk_create_orders(orders)
+            counts['orders'] = len(orders)
+
+        return counts
+
+    def resolve_clients(self, batch, counts) -> dict[str, int]:
+        """Map the batch usernames to the client ids.
+
+        Missing clients are created with `bulk_create_clients`. Usernames of
+        the non-client users are left unresolved.
+        """
+        user_model = get_user_model()
+        # The clients are created with the fields of their first record
+        records = {}
+        for record in batch:
+            if record and record.get('username'):
+                records.setdefault(record['username'], record)
+
+        clients = {}
+        existing = set()
+        for username, pk, client_pk in user_model.objects.filter(
+            username__in=records,
+        ).values_list('username', 'pk', 'client'):
+            existing.add(username)
+            if client_pk is not None:
+                clients[username] = pk
+
+        new_clients = [
+            models.Client(
+                username=username,
+                password=make_password(None),
+                address=record.get('address') or '',
+                additional=record.get('additional') or '',
+                **{field: record.get(field) or '' for field in USER_FIELDS},
+            )
+            for username, record in records.items()
+            if username not in existing
+        ]
+        bulk_create_clients(new_clients)
+
+        clients.update((client.username, client.pk) for client in new_clients)
+        counts['clients'] = len(new_clients)
+        return clients
+
+    def build_order(self, record, client_id) -> Optional[models.Order]:
+        """Build the order with the property ids resolved by names.
+
+        Returns `None` if a property is unknown or a status is invalid.
+        """
+        try:
+            triple = tuple(
+                self.property_ids[name][record[name]]
+                for name in ('color', 'size', 'form')
+            )
+        except KeyError:
+            return None
+
+        order_status = (
+            record.get('status') or models.Order.StatusChoice.IN_PROCESS
+        )
+        process = record.get('process') or (
+            models.Order.ProcessStatusChoice.IN_ASSEMBLY
+            if triple in self.standard
+            else models.Order.ProcessStatusChoice.PENDING
+        )
+        if (
+            order_status not in models.Order.StatusChoice.values
+            or process not in models.Order.ProcessStatusChoice.values
+        ):
+            return None
+
+        return models.Order(
+            client_id=client_id,
+            color_id=triple[0],
+            size_id=triple[1],
+            form_id=triple[2],
+            status=order_status,
+            process=process,
+            comment=record.get('comment') or '',
+        )
+
+    def read_checkpoint(self, path: str) -> int:
+        """Get the number of already imported records of the input."""
+        if not self.checkpoint or not self.checkpoint.exists():
+            return 0
+
+        data = json.loads(self.checkpoint.read_text())
+        if data.get('path') != str(path):
+            raise CommandError(
+                'The checkpoint belongs to another input: %s.' % data['path'],
+            )
+        return data['position']
+
+    def write_checkpoint(self, path: str, position: int):
+        """Store the number of the committed records."""
+        if not self.checkpoint:
+            return
+
+        temporary = self.checkpoint.with_suffix('.tmp')
+        temporary.write_text(json.dumps({
+            'path': str(path),
+            'position': position,
+        }))
+        temporary.replace(self.checkpoint)
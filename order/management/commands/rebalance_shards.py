@@ -0,0 +1,58 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+
+from config.shards import get_shards, shard_for_client
+from order.sharding import (
+    misplaced_clients,
+    move_client_orders,
+    sync_reference_data,
+)
+
+
+class Command(BaseCommand):
+    """Move the orders stored outside the shard of their client."""
+
+    help = (
+        'Copy the clients and the order properties to the shards and move '
+        'the orders stored outside the shard of their client, e.g. once the '
+        '`DATABASE_SHARDS` list is changed. The orders of every client are '
+        'moved in one transaction per shard, so the command may run while '
+        'the service is in use.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only list the clients whose orders would be moved.',
+        )
+
+    def handle(self, *args, **options):
+        started = perf_counter()
+        if not options['dry_run']:
+            copied = sync_reference_data()
+            self.stdout.write('Copied %d reference rows.' % copied)
+
+        clients = 0
+        moved = 0
+        for source in get_shards():
+            for client_id in misplaced_clients(source):
+                target = shard_for_client(client_id)
+                clients += 1
+                if options['dry_run']:
+                    self.stdout.write('Client %d: %s -> %s.' % (
+                        client_id, source, target,
+                    ))
+                    continue
+
+                moved += move_client_orders(client_id, source, target)
+
+        if options['dry_run']:
+            self.stdout.write('%d clients would be moved.' % clients)
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            'Moved %d orders of %d clients in %.1fs.' % (
+                moved, clients, perf_counter() - started,
+            ),
+        ))
@@ -0,0 +1,87 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from config.shards import get_shards
+from order import models
+from order.stats import count_orders
+
+
+class Command(BaseCommand):
+    """Rebuild the order statistics from the orders."""
+
+    help = (
+        'Rebuild the `OrderStats` buckets from the `Order` and the '
+        '`ArchivedOrder` tables of every shard. The orders are counted and '
+        'the buckets are replaced in one transaction per shard, so better '
+        'run it when the orders are not changed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only report the mismatched buckets, fail if there are any.',
+        )
+
+    def handle(self, *args, **options):
+        rebuilt = 0
+        mismatched = 0
+        for alias in get_shards():
+            buckets, shard_mismatched = self.reconcile(
+                alias, check=options['check'],
+            )
+            rebuilt += buckets
+            mismatched += shard_mismatched
+
+        if options['check']:
+            if mismatched:
+                raise CommandError('%d buckets are mismatched.' % mismatched)
+            self.stdout.write(self.style.SUCCESS('The buckets match.'))
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            'Rebuilt %d buckets, %d were mismatched.' % (rebuilt, mismatched),
+        ))
+
+    def reconcile(self, alias: str, check: bool) -> tuple[int, int]:
+        """Rebuild the buckets of the shard.
+
+        Returns:
+            The number of the counted and of the mismatched buckets.
+        """
+        with transaction.atomic(using=alias):
+            expected = count_orders(
+                models.Order.objects.using(alias),
+            ) + count_orders(
+                models.ArchivedOrder.objects.using(alias),
+            )
+            stored = Counter({
+                (day, status, process): count
+                for day, status, process, count in (
+                    models.OrderStats.objects.using(alias).values_list(
+                        'day', 'status', 'process', 'count',
+                    )
+                )
+            })
+
+            mismatched = sorted(
+                key for key in expected.keys() | stored.keys()
+                if expected[key] != stored[key]
+            )
+            for day, status, process in mismatched:
+                self.stdout.write('%s %s %s/%s: stored %d, counted %d.' % (
+                    alias, day, status, process,
+                    stored[day, status, process],
+                    expected[day, status, process],
+                ))
+
+            if not check:
+                models.OrderStats.objects.using(alias).all().delete()
+                models.OrderStats.objects.using(alias).bulk_create([
+                    models.OrderStats(
+                        day=day, status=status, process=process, count=count,
+                    )
+                    for (day, status, process), count in expected.items()
+                ])
+        return len(expected), len(mismatched)
@@ -0,0 +1,173 @@
+import random
+from itertools import product
+from time import perf_counter
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from order import models
+from order.bulk import bulk_create_clients
+from order.properties import order_properties
+from order.sharding import bulk_create_orders, sync_reference_data
+from order.standard import standard_orders
+
+
+class Command(BaseCommand):
+    """Seed the database with the load test data."""
+
+    help = (
+        'Seed the database with the load test data: property values, '
+        'standard orders, clients `<prefix><number>` sharing one password '
+        'and orders in random states.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=100)
+        parser.add_argument('--orders', type=int, default=10_000)
+        parser.add_argument(
+            '--properties', type=int, default=5,
+            help='Number of the colors, sizes and forms each.',
+        )
+        parser.add_argument('--standard', type=int, default=10)
+        parser.add_argument('--prefix', default='loadtest-client-')
+        parser.add_argument('--password', default='loadtest-password')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        started = perf_counter()
+
+        with transaction.atomic():
+            properties = self.seed_properties(options['properties'])
+            self.seed_standard_orders(rng, properties, options['standard'])
+            client_ids = self.seed_clients(options)
+
+        # `bulk_create` does not send the invalidating and replicating
+        # `post_save` signals
+        order_properties.invalidate()
+        standard_orders.invalidate()
+        sync_reference_data()
+        standard = standard_orders.get_triples()
+
+        self.seed_orders(rng, properties, standard, client_ids, options)
+
+        self.stdout.write(self.style.SUCCESS(
+            'Seeded %d clients, %d standard orders and %d orders in %.1fs.'
+            % (
+                len(client_ids), len(standard), options['orders'],
+                perf_counter() - started,
+            ),
+        ))
+
+    def seed_properties(self, count: int) -> dict[str, list[int]]:
+        """Create the missing `<property>-<number>` values."""
+        properties = {}
+        for model in [models.Color, models.Size, models.Form]:
+            name = model._meta.model_name
+            model.objects.bulk_create(
+                [
+                    model(name='%s-%d' % (name, index))
+                    for index in range(count)
+                ],
+                ignore_conflicts=True,
+            )
+            properties[name] = list(
+                model.objects.values_list('pk', flat=True),
+            )
+        return properties
+
+    def seed_standard_orders(self, rng, properties, count):
+        """Create the missing standard orders with random properties."""
+        standard = set(models.StandardOrder.objects.values_list(
+            'color_id', 'size_id', 'form_id',
+        ))
+        triples = list(
+            set(product(
+                properties['color'], properties['size'], properties['form'],
+            )) - standard,
+        )
+        rng.shuffle(triples)
+
+        offset = models.StandardOrder.objects.count()
+        models.StandardOrder.objects.bulk_create([
+            models.StandardOrder(
+                name='standard-%d' % (offset + index),
+                color_id=color, size_id=size, form_id=form,
+            )
+            for index, (color, size, form) in enumerate(
+                triples[:max(count - len(standard), 0)],
+            )
+        ])
+
+    def seed_clients(self, options) -> list[int]:
+        """Create the missing load test clients."""
+        prefix = options['prefix']
+        usernames = [
+            '%s%d' % (prefix, index) for index in range(options['clients'])
+        ]
+        existing = dict(models.Client.objects.filter(
+            username__in=usernames,
+        ).values_list('username', 'pk'))
+
+        password = make_password(options['password'])
+        new_clients = bulk_create_clients([
+            models.Client(
+                username=username,
+                password=password,
+                email='%s@example.com' % username,
+                address='Load test street, %s' % username,
+            )
+            for username in usernames if username not in existing
+        ])
+        existing.update((client.username, client.pk) for client in new_clients)
+        return [existing[username] for username in usernames]
+
+    def seed_orders(self, rng, properties, standard, client_ids, options):
+        """Create the orders in random states for the given clients."""
+        states = [
+            (models.Order.StatusChoice.IN_PROCESS, None),
+            (
+                models.Order.StatusChoice.IN_PROCESS,
+                models.Order.ProcessStatusChoice.IN_DELIVERY,
+            ),
+            (
+                models.Order.StatusChoice.IN_PROCESS,
+                models.Order.ProcessStatusChoice.DELIVERED,
+            ),
+            (
+                models.Order.StatusChoice.COMPLETED,
+                models.Order.ProcessStatusChoice.DELIVERED,
+            ),
+            (
+                models.Order.StatusChoice.CANCELLED,
+                models.Order.ProcessStatusChoice.PENDING,
+            ),
+        ]
+        total, batch_size = options['orders'], options['batch_size']
+
+        for offset in range(0, total, batch_size):
+            orders = []
+            for _ in range(min(batch_size, total - offset)):
+                triple = (
+                    rng.choice(properties['color']),
+                    rng.choice(properties['size']),
+                    rng.choice(properties['form']),
+                )
+                order_status, process = rng.choice(states)
+                orders.append(models.Order(
+                    client_id=rng.choice(client_ids),
+                    color_id=triple[0],
+                    size_id=triple[1],
+                    form_id=triple[2],
+                    status=order_status,
+                    process=process or (
+                        models.Order.ProcessStatusChoice.IN_ASSEMBLY
+                        if triple in standard
+                        else models.Order.ProcessStatusChoice.PENDING
+                    ),
+                ))
+
+            bulk_create_orders(orders)
+            self.stdout.write('Created %d orders.' % (offset + len(orders)))
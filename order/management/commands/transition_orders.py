@@ -0,0 +1,83 @@
+from time import perf_counter
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.datastructures import MultiValueDict
+
+from config.shards import get_shards
+from order import models
+from order.export import filter_orders
+from order.transitions import DEFAULT_CHUNK_SIZE, TRANSITIONS, apply_transition
+
+
+class Command(BaseCommand):
+    """Apply a state transition to the orders."""
+
+    help = (
+        'Apply a state transition to the orders matching the filters. The '
+        'orders are updated in chunks with a transaction per chunk, the '
+        'orders in the states the transition is not allowed from are '
+        'skipped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('transition', choices=sorted(TRANSITIONS))
+        parser.add_argument(
+            '--status', action='append', default=[],
+            help='Filter by the status, may be repeated.',
+        )
+        parser.add_argument(
+            '--process', action='append', default=[],
+            help='Filter by the process status, may be repeated.',
+        )
+        parser.add_argument('--created-after', help='ISO 8601 datetime.')
+        parser.add_argument('--created-before', help='ISO 8601 datetime.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only count the orders the transition is allowed for.',
+        )
+
+    def handle(self, *args, **options):
+        transition = TRANSITIONS[options['transition']]
+        try:
+            queryset = filter_orders(
+                models.Order.objects.all(),
+                MultiValueDict({
+                    'status': options['status'],
+                    'process': options['process'],
+                    'created_after': [options['created_after']],
+                    'created_before': [options['created_before']],
+                }),
+            )
+        except ValidationError as error:
+            raise CommandError(error.message_dict) from error
+
+        if options['dry_run']:
+            self.stdout.write('%d orders would be updated.' % sum(
+                queryset.using(alias).filter(transition.source).count()
+                for alias in get_shards()
+            ))
+            return
+
+        started = perf_counter()
+
+        def progress(state):
+            self.stdout.write('Chunk %d: %d updated, %d in total.' % state)
+
+        updated = sum(
+            apply_transition(
+                queryset.using(alias),
+                transition,
+                chunk_size=options['chunk_size'],
+                progress=progress,
+            )
+            for alias in get_shards()
+        )
+        self.stdout.write(self.style.SUCCESS(
+            '%s: %d orders updated in %.1fs.' % (
+                transition.description, updated, perf_counter() - started,
+            ),
+        ))
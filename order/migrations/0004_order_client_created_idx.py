@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-16 22:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0003_alter_orderreturn_solution'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['client', 'created'], name='order_client_created_idx'),
+        ),
+    ]
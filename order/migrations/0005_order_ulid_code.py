@@ -0,0 +1,102 @@
+# Generated by Django 4.2.7 on 2026-10-16 22:52
+
+from django.db import migrations, models
+from django.db.models.functions import Length
+import utils.code
+
+BATCH_SIZE = 2000
+
+
+def convert_legacy_codes(apps, schema_editor):
+    """Replace random hex codes with ULID codes built from `created`.
+
+    The old code is kept in `legacy_code`, the `OrderReturn` references are
+    moved to the new code in the same transaction.
+    """
+    Order = apps.get_model('order', 'Order')
+    OrderReturn = apps.get_model('order', 'OrderReturn')
+    db_alias = schema_editor.connection.alias
+
+    legacy_orders = (
+        Order.objects.using(db_alias)
+        .annotate(code_length=Length('code'))
+        .filter(
+            legacy_code__isnull=True,
+            code_length=utils.code.LEGACY_CODE_LENGTH,
+        )
+        .values_list('code', 'created')
+    )
+    # Rows are fetched in batches instead of a single cursor, since SQLite
+    # does not isolate the cursor from updates of the iterated table.
+    while batch := list(legacy_orders[:BATCH_SIZE]):
+        for code, created in batch:
+            convert_code(
+                Order, OrderReturn, db_alias, code,
+                new_code=utils.code.generate_code(
+                    timestamp_ms=int(created.timestamp() * 1000),
+                ),
+                legacy_code=code,
+            )
+
+
+def convert_code(Order, OrderReturn, db_alias, code, new_code, legacy_code):
+    """Change the order primary key and move its references."""
+    # pylint: disable=invalid-name
+    Order.objects.using(db_alias).filter(code=code).update(
+        code=new_code,
+        legacy_code=legacy_code,
+    )
+    OrderReturn.objects.using(db_alias).filter(order_id=code).update(
+        order_id=new_code,
+    )
+    OrderReturn.objects.using(db_alias).filter(new_order_id=code).update(
+        new_order_id=new_code,
+    )
+
+
+def restore_legacy_codes(apps, schema_editor):
+    """Restore the random hex codes of the converted orders."""
+    Order = apps.get_model('order', 'Order')
+    OrderReturn = apps.get_model('order', 'OrderReturn')
+    db_alias = schema_editor.connection.alias
+
+    converted_orders = (
+        Order.objects.using(db_alias)
+        .filter(legacy_code__isnull=False)
+        .values_list('code', 'legacy_code')
+    )
+    while batch := list(converted_orders[:BATCH_SIZE]):
+        for code, legacy_code in batch:
+            convert_code(
+                Order, OrderReturn, db_alias, code,
+                new_code=legacy_code,
+                legacy_code=None,
+            )
+
+
+class Migration(migrations.Migration):
+
+    # The codes are rewritten in their own transaction: PostgreSQL refuses
+    # to alter the table with the pending deferred constraint checks of the
+    # rewritten rows
+    atomic = False
+
+    dependencies = [
+        ('order', '0004_order_client_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='legacy_code',
+            field=models.CharField(blank=True, editable=False, help_text='Random hex code of the order created before ULID codes.', max_length=40, null=True, unique=True, verbose_name='legacy code'),
+        ),
+        migrations.RunPython(
+            convert_legacy_codes, restore_legacy_codes, atomic=True,
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='code',
+            field=models.CharField(default=utils.code.generate_code, editable=False, max_length=26, primary_key=True, serialize=False, verbose_name='code'),
+        ),
+    ]
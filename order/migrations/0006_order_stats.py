@@ -0,0 +1,47 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:06
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def fill_order_stats(apps, schema_editor):
+    Order = apps.get_model('order', 'Order')
+    OrderStats = apps.get_model('order', 'OrderStats')
+    db_alias = schema_editor.connection.alias
+
+    OrderStats.objects.using(db_alias).bulk_create([
+        OrderStats(**row)
+        for row in Order.objects.using(db_alias).order_by().values(
+            'status', 'process', day=TruncDate('created'),
+        ).annotate(count=Count('pk'))
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0005_order_ulid_code'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='day')),
+                ('status', models.CharField(choices=[('returned', 'Returned'), ('cancelled', 'Cancelled'), ('in_process', 'In Process'), ('completed', 'Completed')], max_length=15, verbose_name='status')),
+                ('process', models.CharField(choices=[('pending', 'Expects the manager to accept it'), ('in_assembly', 'In Assembly'), ('in_delivery', 'In Delivery'), ('delivered', 'Delivered')], max_length=15, verbose_name='process status')),
+                ('count', models.IntegerField(default=0, verbose_name='count')),
+            ],
+            options={
+                'verbose_name': 'order statistics',
+                'verbose_name_plural': 'order statistics',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='orderstats',
+            constraint=models.UniqueConstraint(fields=('day', 'status', 'process'), name='order_stats_bucket_unique'),
+        ),
+        migrations.RunPython(fill_order_stats, migrations.RunPython.noop),
+    ]
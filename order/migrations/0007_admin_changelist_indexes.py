@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0006_order_stats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['created', 'code'], name='order_created_code_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'created'], name='order_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['process', 'created'], name='order_process_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderreturn',
+            index=models.Index(fields=['created', 'id'], name='order_return_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderreturn',
+            index=models.Index(fields=['solution', 'created'], name='order_return_solution_idx'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import utils.code
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0008_order_client_modified_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('code', models.CharField(default=utils.code.generate_code, editable=False, max_length=26, primary_key=True, serialize=False, verbose_name='code')),
+                ('legacy_code', models.CharField(blank=True, editable=False, help_text='Random hex code of the order created before ULID codes.', max_length=40, null=True, unique=True, verbose_name='legacy code')),
+                ('status', models.CharField(choices=[('returned', 'Returned'), ('cancelled', 'Cancelled'), ('in_process', 'In Process'), ('completed', 'Completed')], default='in_process', max_length=15, verbose_name='status')),
+                ('process', models.CharField(choices=[('pending', 'Expects the manager to accept it'), ('in_assembly', 'In Assembly'), ('in_delivery', 'In Delivery'), ('delivered', 'Delivered')], default='in_assembly', max_length=15, verbose_name='process status')),
+                ('comment', models.TextField(blank=True, max_length=250, verbose_name='comment')),
+                ('created', models.DateTimeField(verbose_name='created')),
+                ('modified', models.DateTimeField(verbose_name='modified')),
+                ('archived', models.DateTimeField(default=django.utils.timezone.now, verbose_name='archived')),
+                ('client', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='order.client', verbose_name='client')),
+                ('color', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='order.color', verbose_name='color')),
+                ('form', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='order.form', verbose_name='form')),
+                ('size', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='order.size', verbose_name='size')),
+            ],
+            options={
+                'verbose_name': 'archived order',
+                'verbose_name_plural': 'archived orders',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderReturn',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(verbose_name='created')),
+                ('modified', models.DateTimeField(verbose_name='modified')),
+                ('solution', models.CharField(choices=[('pending', 'pending'), ('money', 'return money to the client'), ('new_order', 'create a new order to replace the returned one')], default='pending', max_length=15, verbose_name='solution')),
+                ('new_order_code', models.CharField(blank=True, max_length=26, null=True, verbose_name='new order code')),
+                ('order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='order.archivedorder', verbose_name='order')),
+            ],
+            options={
+                'verbose_name': 'archived return order solution',
+                'verbose_name_plural': 'archived return order solutions',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['client', 'created', 'code'], name='archived_client_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['created', 'code'], name='archived_created_code_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['client', 'modified', 'code'], name='archived_client_modified_idx'),
+        ),
+    ]
@@ -0,0 +1,560 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:40
+
+from django.db import migrations
+
+CREATE_SEARCH_INDEXES = [
+    (
+        'CREATE VIRTUAL TABLE order_client_search '
+        'USING fts5(username, email, first_name, last_name, address, '
+        "tokenize='trigram')"
+    ),
+    (
+        'INSERT INTO order_client_search '
+        '(rowid, username, email, first_name, last_name, address) '
+        'SELECT c.user_ptr_id, u.username, u.email, u.first_name, '
+        'u.last_name, c.address '
+        'FROM order_client c '
+        'JOIN auth_user u ON u.id = c.user_ptr_id'
+    ),
+    (
+        'CREATE TRIGGER order_client_search_auth_user_insert '
+        'AFTER INSERT ON auth_user '
+        'BEGIN '
+        'DELETE FROM order_client_search '
+        'WHERE rowid IN (SELECT NEW.id); '
+        'INSERT INTO order_client_search '
+        '(rowid, username, email, first_name, last_name, address) '
+        'SELECT c.user_ptr_id, u.username, u.email, u.first_name, '
+        'u.last_name, c.address '
+        'FROM order_client c '
+        'JOIN auth_user u ON u.id = c.user_ptr_id '
+        'WHERE c.user_ptr_id IN (SELECT NEW.id); '
+        'END'
+    ),
+    (
+        'CREATE TRIGGER order_client_search_auth_user_update '
+        'AFTER UPDATE OF username, email, first_name, last_name ON '
+        'auth_user '
+        'BEGIN '
+        'DELETE FROM order_client_search '
+        'WHERE rowid IN (SELECT OLD.id); '
+        'INSERT INTO order_client_search '
+        '(rowid, username, email, first_name, last_name, address) '
+        'SELECT c.user_ptr_id, u.username, u.email, u.first_name, '
+        'u.last_name, c.address '
+        'FROM order_client c '
+        'JOIN auth_user u ON u.id = c.user_ptr_id '
+        'WHERE c.user_ptr_id IN (SELECT OLD.id); '
+        'DELETE FROM order_client_search '
+        'WHERE rowid IN (SELECT NEW.id); '
+        'INSERT INTO order_client_search '
+        '(rowid, username, email, first_name, last_name, address) '
+        'SELECT c.user_ptr_id, u.username, u.email, u.first_name, '
+        'u.last_name, c.address '
+        'FROM order_client c '
+        'JOIN auth_user u ON u.id = c.user_ptr_id '
+        'WHERE c.user_ptr_id IN (SELECT NEW.id); '
+        'END'
+    ),
+    (
+        'CREATE TRIGGER order_client_search_auth_user_delete '
+        'AFTER DELETE ON auth_user '
+        'BEGIN '
+        'DELETE FROM order_client_search '
+        'WHERE rowid IN (SELECT OLD.id); '
+        'INSERT INTO order_client_search '
+        '(rowid, username, email, first_name, last_name, address) '
+        'SELECT c.user_ptr_id, u.username, u.email, u.first_name, '
+        'u.last_name, c.address '
+        'FROM order_client c '
+        'JOIN auth_user u ON u.id = c.user_ptr_id '
+        'WHERE c.user_ptr_id IN (SELECT OLD.id); '
+        'END'
+    ),
+    (
+        'CREATE TRIGGER order_client_search_order_client_insert '
+        'AFTER INSERT ON order_client '
+        'BEGIN '
+        'DELETE FROM order_client_search '
+        'WHERE rowid IN (SELECT NEW.user_ptr_id); '
+        'INSERT INTO order_client_search '
+        '(rowid, username, email, first_name, last_name, address) '
+        'SELECT c.user_ptr_id, u.username, u.email, u.first_name, '
+        'u.last_name, c.address '
+        'FROM order_client c '
+        'JOIN auth_user u ON u.id = c.user_ptr_id '
+        'WHERE c.user_ptr_id IN (SELECT NEW.user_ptr_id); '
+        'END'
+    ),
+    (
+        'CREATE TRIGGER order_client_search_order_client_update '
+        'AFTER UPDATE OF address ON order_client '
+        'BEGIN '
+        'DELETE FROM order_client_search '
+        'WHERE rowid IN (SELECT OLD.user_ptr_id); '
+        'INSERT INTO order_client_search '
+        '(rowid, username, email, first_name, last_name, address) '
+        'SELECT c.user_ptr_id, u.username, u.email, u.first_name, '
+        'u.last_name, c.address '
+        'FROM order_client c '
+        'JOIN auth_user u ON u.id = c.user_ptr_id '
+        'WHERE c.user_ptr_id IN (SELECT OLD.user_ptr_id); '
+        'DELETE FROM order_client_search '
+        'WHERE rowid IN (SELECT NEW.user_ptr_id); '
+        'INSERT INTO order_client_search '
+        '(rowid, username, email, first_name, last_name, address) '
+        'SELECT c.user_ptr_id, u.username, u.email, u.first_name, '
+        'u.last_name, c.address '
+        'FROM order_client c '
+        'JOIN auth_user u ON u.id = c.user_ptr_id '
+        'WHERE c.user_ptr_id IN (SELECT NEW.user_ptr_id); '
+        'END'
+    ),
+    (
+        'CREATE TRIGGER order_client_search_order_client_delete '
+        'AFTER DELETE ON order_client '
+        'BEGIN '
+        'DELETE FROM order_client_search '
+        'WHERE rowid IN (SELECT OLD.user_ptr_id); '
+        'INSERT INTO order_client_search '
+        '(rowid, username, email, first_name, last_name, address) '
+        'SELECT c.user_ptr_id, u.username, u.email, u.first_name, '
+        'u.last_name, c.address '
+        'FROM order_client c '
+        'JOIN auth_user u ON u.id = c.user_ptr_id '
+        'WHERE c.user_ptr_id IN (SELECT OLD.user_ptr_id); '
+        'END'
+    ),
+    (
+        'CREATE VIRTUAL TABLE order_order_search '
+        'USING fts5(code, legacy_code, comment, address, '
+        "tokenize='trigram')"
+    ),
+    (
+        'INSERT INTO order_order_search '
+        '(rowid, code, legacy_code, comment, address) '
+        'SELECT o.rowid, o.code, o.legacy_code, o.comment, c.address '
+        'FROM order_order o '
+        'LEFT JOIN order_client c ON c.user_ptr_id = o.client_id'
+    ),
+    (
+        'CREATE TRIGGER order_order_search_order_order_insert '
+        'AFTER INSERT ON order_order '
+        'BEGIN '
+        'DELETE FROM order_order_search '
+        'WHERE rowid IN (SELECT NEW.rowid); '
+        'INSERT INTO order_order_search '
+        '(rowid, code, legacy_code, comment, address) '
+        'SELECT o.rowid, o.code, o.legacy_code, o.comment, c.address '
+        'FROM order_order o '
+        'LEFT JOIN order_client c ON c.user_ptr_id = o.client_id '
+        'WHERE o.rowid IN (SELECT NEW.rowid); '
+        'END'
+    ),
+    (
+        'CREATE TRIGGER order_order_search_order_order_update '
+        'AFTER UPDATE OF code, legacy_code, comment, client_id ON '
+        'order_order '
+        'BEGIN '
+        'DELETE FROM order_order_search '
+        'WHERE rowid IN (SELECT OLD.rowid); '
+        'INSERT INTO order_order_search '
+        '(rowid, code, legacy_code, comment, address) '
+        'SELECT o.rowid, o.code, o.legacy_code, o.comment, c.address '
+        'FROM order_order o '
+        'LEFT JOIN order_client c ON c.user_ptr_id = o.client_id '
+        'WHERE o.rowid IN (SELECT OLD.rowid); '
+        'DELETE FROM order_order_search '
+        'WHERE rowid IN (SELECT NEW.rowid); '
+        'INSERT INTO order_order_search '
+        '(rowid, code, legacy_code, comment, address) '
+        'SELECT o.rowid, o.code, o.legacy_code, o.comment, c.address '
+        'FROM order_order o '
+        'LEFT JOIN order_client c ON c.user_ptr_id = o.client_id '
+        'WHERE o.rowid IN (SELECT NEW.rowid); '
+        'END'
+    ),
+    (
+        'CREATE TRIGGER order_order_search_order_order_delete '
+        'AFTER DELETE ON order_order '
+        'BEGIN '
+        'DELETE FROM order_order_search '
+        'WHERE rowid IN (SELECT OLD.rowid); '
+        'INSERT INTO order_order_search '
+        '(rowid, code, legacy_code, comment, address) '
+        'SELECT o.rowid, o.code, o.legacy_code, o.comment, c.address '
+        'FROM order_order o '
+        'LEFT JOIN order_client c ON c.user_ptr_id = o.client_id '
+        'WHERE o.rowid IN (SELECT OLD.rowid); '
+        'END'
+    ),
+    (
+        'CREATE TRIGGER order_order_search_order_client_insert '
+        'AFTER INSERT ON order_client '
+        'BEGIN '
+        'DELETE FROM order_order_search '
+        'WHERE rowid IN (SELECT rowid FROM order_order WHERE client_id = '
+        'NEW.user_ptr_id); '
+        'INSERT INTO order_order_search '
+        '(rowid, code, legacy_code, comment, address) '
+        'SELECT o.rowid, o.code, o.legacy_code, o.comment, c.address '
+        'FROM order_order o '
+        'LEFT JOIN order_client c ON c.user_ptr_id = o.client_id '
+        'WHERE o.rowid IN (SELECT rowid FROM order_order WHERE client_id = '
+        'NEW.user_ptr_id); '
+        'END'
+    ),
+    (
+        'CREATE TRIGGER order_order_search_order_client_update '
+        'AFTER UPDATE OF address ON order_client '
+        'BEGIN '
+        'DELETE FROM order_order_search '
+        'WHERE rowid IN (SELECT rowid FROM order_order WHERE client_id = '
+        'OLD.user_ptr_id); '
+        'INSERT INTO order_order_search '
+        '(rowid, code, legacy_code, comment, address) '
+        'SELECT o.rowid, o.code, o.legacy_code, o.comment, c.address '
+        'FROM order_order o '
+        'LEFT JOIN order_client c ON c.user_ptr_id = o.client_id '
+        'WHERE o.rowid IN (SELECT rowid FROM order_order WHERE client_id = '
+        'OLD.user_ptr_id); '
+        'DELETE FROM order_order_search '
+        'WHERE rowid IN (SELECT rowid FROM order_order WHERE client_id = '
+        'NEW.user_ptr_id); '
+        'INSERT INTO order_order_search '
+        '(rowid, code, legacy_code, comment, address) '
+        'SELECT o.rowid, o.code, o.legacy_code, o.comment, c.address '
+        'FROM order_order o '
+        'LEFT JOIN order_client c ON c.user_ptr_id = o.client_id '
+        'WHERE o.rowid IN (SELECT rowid FROM order_order WHERE client_id = '
+        'NEW.user_ptr_id); '
+        'END'
+    ),
+    (
+        'CREATE TRIGGER order_order_search_order_client_delete '
+        'AFTER DELETE ON order_client '
+        'BEGIN '
+        'DELETE FROM order_order_search '
+        'WHERE rowid IN (SELECT rowid FROM order_order WHERE client_id = '
+        'OLD.user_ptr_id); '
+        'INSERT INTO order_order_search '
+        '(rowid, code, legacy_code, comment, address) '
+        'SELECT o.rowid, o.code, o.legacy_code, o.comment, c.address '
+        'FROM order_order o '
+        'LEFT JOIN order_client c ON c.user_ptr_id = o.client_id '
+        'WHERE o.rowid IN (SELECT rowid FROM order_order WHERE client_id = '
+        'OLD.user_ptr_id); '
+        'END'
+    ),
+    (
+        'CREATE VIRTUAL TABLE order_color_search '
+        "USING fts5(name, tokenize='trigram')"
+    ),
+    (
+        'INSERT INTO order_color_search '
+        '(rowid, name) '
+        'SELECT t.id, t.name '
+        'FROM order_color t'
+    ),
+    (
+        'CREATE TRIGGER order_color_search_order_color_insert '
+        'AFTER INSERT ON order_color '
+        'BEGIN '
+        'DELETE FROM order_color_search '
+        'WHERE rowid IN (SELECT NEW.id); '
+        'INSERT INTO order_color_search '
+        '(rowid, name) '
+        'SELECT t.id, t.name '
+        'FROM order_color t '
+        'WHERE t.id IN (SELECT NEW.id); '
+        'END'
+    ),
+    (
+        'CREATE TRIGGER order_color_search_order_color_update '
+        'AFTER UPDATE OF name ON order_color '
+        'BEGIN '
+        'DELETE FROM order_color_search '
+        'WHERE rowid IN (SELECT OLD.id); '
+        'INSERT INTO order_color_search '
+        '(rowid, name) '
+        'SELECT t.id, t.name '
+        'FROM order_color t '
+        'WHERE t.id IN (SELECT OLD.id); '
+        'DELETE FROM order_color_search '
+        'WHERE rowid IN (SELECT NEW.id); '
+        'INSERT INTO order_color_search '
+        '(rowid, name) '
+        'SELECT t.id, t.name '
+        'FROM order_color t '
+        'WHERE t.id IN (SELECT NEW.id); '
+        'END'
+    ),
+    (
+        'CREATE TRIGGER order_color_search_order_color_delete '
+        'AFTER DELETE ON order_color '
+        'BEGIN '
+        'DELETE FROM order_color_search '
+        'WHERE rowid IN (SELECT OLD.id); '
+        'INSERT INTO order_color_search '
+        '(rowid, name) '
+        'SELECT t.id, t.name '
+        'FROM order_color t '
+        'WHERE t.id IN (SELECT OLD.id); '
+        'END'
+    ),
+    (
+        'CREATE VIRTUAL TABLE order_size_search '
+        "USING fts5(name, tokenize='trigram')"
+    ),
+    (
+        'INSERT INTO order_size_search '
+        '(rowid, name) '
+        'SELECT t.id, t.name '
+        'FROM order_size t'
+    ),
+    (
+        'CREATE TRIGGER order_size_search_order_size_insert '
+        'AFTER INSERT ON order_size '
+        'BEGIN '
+        'DELETE FROM order_size_search '
+        'WHERE rowid IN (SELECT NEW.id); '
+        'INSERT INTO order_size_search '
+        '(rowid, name) '
+        'SELECT t.id, t.name '
+        'FROM order_size t '
+        'WHERE t.id IN (SELECT NEW.id); '
+        'END'
+    ),
+    (
+        'CREATE TRIGGER order_size_search_order_size_update '
+        'AFTER UPDATE OF name ON order_size '
+        'BEGIN '
+        'DELETE FROM order_size_search '
+        'WHERE rowid IN (SELECT OLD.id); '
+        'INSERT INTO order_size_search '
+        '(rowid, name) '
+        'SELECT t.id, t.name '
+        'FROM order_size t '
+        'WHERE t.id IN (SELECT OLD.id); '
+        'DELETE FROM order_size_search '
+        'WHERE rowid IN (SELECT NEW.id); '
+        'INSERT INTO order_size_search '
+        '(rowid, name) '
+        'SELECT t.id, t.name '
+        'FROM order_size t '
+        'WHERE t.id IN (SELECT NEW.id); '
+        'END'
+    ),
+    (
+        'CREATE TRIGGER order_size_search_order_size_delete '
+        'AFTER DELETE ON order_size '
+        'BEGIN '
+        'DELETE FROM order_size_search '
+        'WHERE rowid IN (SELECT OLD.id); '
+        'INSERT INTO order_size_search '
+        '(rowid, name) '
+        'SELECT t.id, t.name '
+        'FROM order_size t '
+        'WHERE t.id IN (SELECT OLD.id); '
+        'END'
+    ),
+    (
+        'CREATE VIRTUAL TABLE order_form_search '
+        "USING fts5(name, tokenize='trigram')"
+    ),
+    (
+        'INSERT INTO order_form_search '
+        '(rowid, name) '
+        'SELECT t.id, t.name '
+        'FROM order_form t'
+    ),
+    (
+        'CREATE TRIGGER order_form_search_order_form_insert '
+        'AFTER INSERT ON order_form '
+        'BEGIN '
+        'DELETE FROM order_form_search '
+        'WHERE rowid IN (SELECT NEW.id); '
+        'INSERT INTO order_form_search '
+        '(rowid, name) '
+        'SELECT t.id, t.name '
+        'FROM order_form t '
+        'WHERE t.id IN (SELECT NEW.id); '
+        'END'
+    ),
+    (
+        'CREATE TRIGGER order_form_search_order_form_update '
+        'AFTER UPDATE OF name ON order_form '
+        'BEGIN '
+        'DELETE FROM order_form_search '
+        'WHERE rowid IN (SELECT OLD.id); '
+        'INSERT INTO order_form_search '
+        '(rowid, name) '
+        'SELECT t.id, t.name '
+        'FROM order_form t '
+        'WHERE t.id IN (SELECT OLD.id); '
+        'DELETE FROM order_form_search '
+        'WHERE rowid IN (SELECT NEW.id); '
+        'INSERT INTO order_form_search '
+        '(rowid, name) '
+        'SELECT t.id, t.name '
+        'FROM order_form t '
+        'WHERE t.id IN (SELECT NEW.id); '
+        'END'
+    ),
+    (
+        'CREATE TRIGGER order_form_search_order_form_delete '
+        'AFTER DELETE ON order_form '
+        'BEGIN '
+        'DELETE FROM order_form_search '
+        'WHERE rowid IN (SELECT OLD.id); '
+        'INSERT INTO order_form_search '
+        '(rowid, name) '
+        'SELECT t.id, t.name '
+        'FROM order_form t '
+        'WHERE t.id IN (SELECT OLD.id); '
+        'END'
+    ),
+    (
+        'CREATE VIRTUAL TABLE order_standardorder_search '
+        "USING fts5(name, tokenize='trigram')"
+    ),
+    (
+        'INSERT INTO order_standardorder_search '
+        '(rowid, name) '
+        'SELECT t.id, t.name '
+        'FROM order_standardorder t'
+    ),
+    (
+        'CREATE TRIGGER '
+        'order_standardorder_search_order_standardorder_insert '
+        'AFTER INSERT ON order_standardorder '
+        'BEGIN '
+        'DELETE FROM order_standardorder_search '
+        'WHERE rowid IN (SELECT NEW.id); '
+        'INSERT INTO order_standardorder_search '
+        '(rowid, name) '
+        'SELECT t.id, t.name '
+        'FROM order_standardorder t '
+        'WHERE t.id IN (SELECT NEW.id); '
+        'END'
+    ),
+    (
+        'CREATE TRIGGER '
+        'order_standardorder_search_order_standardorder_update '
+        'AFTER UPDATE OF name ON order_standardorder '
+        'BEGIN '
+        'DELETE FROM order_standardorder_search '
+        'WHERE rowid IN (SELECT OLD.id); '
+        'INSERT INTO order_standardorder_search '
+        '(rowid, name) '
+        'SELECT t.id, t.name '
+        'FROM order_standardorder t '
+        'WHERE t.id IN (SELECT OLD.id); '
+        'DELETE FROM order_standardorder_search '
+        'WHERE rowid IN (SELECT NEW.id); '
+        'INSERT INTO order_standardorder_search '
+        '(rowid, name) '
+        'SELECT t.id, t.name '
+        'FROM order_standardorder t '
+        'WHERE t.id IN (SELECT NEW.id); '
+        'END'
+    ),
+    (
+        'CREATE TRIGGER '
+        'order_standardorder_search_order_standardorder_delete '
+        'AFTER DELETE ON order_standardorder '
+        'BEGIN '
+        'DELETE FROM order_standardorder_search '
+        'WHERE rowid IN (SELECT OLD.id); '
+        'INSERT INTO order_standardorder_search '
+        '(rowid, name) '
+        'SELECT t.id, t.name '
+        'FROM order_standardorder t '
+        'WHERE t.id IN (SELECT OLD.id); '
+        'END'
+    ),
+]
+
+DROP_SEARCH_INDEXES = [
+    'DROP TRIGGER IF EXISTS order_client_search_auth_user_insert',
+    'DROP TRIGGER IF EXISTS order_client_search_auth_user_update',
+    'DROP TRIGGER IF EXISTS order_client_search_auth_user_delete',
+    'DROP TRIGGER IF EXISTS order_client_search_order_client_insert',
+    'DROP TRIGGER IF EXISTS order_client_search_order_client_update',
+    'DROP TRIGGER IF EXISTS order_client_search_order_client_delete',
+    'DROP TABLE IF EXISTS order_client_search',
+    'DROP TRIGGER IF EXISTS order_order_search_order_order_insert',
+    'DROP TRIGGER IF EXISTS order_order_search_order_order_update',
+    'DROP TRIGGER IF EXISTS order_order_search_order_order_delete',
+    'DROP TRIGGER IF EXISTS order_order_search_order_client_insert',
+    'DROP TRIGGER IF EXISTS order_order_search_order_client_update',
+    'DROP TRIGGER IF EXISTS order_order_search_order_client_delete',
+    'DROP TABLE IF EXISTS order_order_search',
+    'DROP TRIGGER IF EXISTS order_color_search_order_color_insert',
+    'DROP TRIGGER IF EXISTS order_color_search_order_color_update',
+    'DROP TRIGGER IF EXISTS order_color_search_order_color_delete',
+    'DROP TABLE IF EXISTS order_color_search',
+    'DROP TRIGGER IF EXISTS order_size_search_order_size_insert',
+    'DROP TRIGGER IF EXISTS order_size_search_order_size_update',
+    'DROP TRIGGER IF EXISTS order_size_search_order_size_delete',
+    'DROP TABLE IF EXISTS order_size_search',
+    'DROP TRIGGER IF EXISTS order_form_search_order_form_insert',
+    'DROP TRIGGER IF EXISTS order_form_search_order_form_update',
+    'DROP TRIGGER IF EXISTS order_form_search_order_form_delete',
+    'DROP TABLE IF EXISTS order_form_search',
+    (
+        'DROP TRIGGER IF EXISTS '
+        'order_standardorder_search_order_standardorder_insert'
+    ),
+    (
+        'DROP TRIGGER IF EXISTS '
+        'order_standardorder_search_order_standardorder_update'
+    ),
+    (
+        'DROP TRIGGER IF EXISTS '
+        'order_standardorder_search_order_standardorder_delete'
+    ),
+    'DROP TABLE IF EXISTS order_standardorder_search',
+]
+
+
+class SearchIndexSQL(migrations.RunSQL):
+    """`RunSQL` skipped by the databases without the FTS5 trigram tokenizer.
+
+    The statements are frozen here, the later changes of
+    `order.search.SEARCH_INDEXES` need their own migration.
+    """
+
+    def database_forwards(self, app_label, schema_editor, *args):
+        if supports_search(schema_editor.connection):
+            super().database_forwards(app_label, schema_editor, *args)
+            # Reset the index cache of `utils.search.has_search_index`
+            schema_editor.connection.search_tables = None
+
+    def database_backwards(self, app_label, schema_editor, *args):
+        if supports_search(schema_editor.connection):
+            super().database_backwards(app_label, schema_editor, *args)
+            schema_editor.connection.search_tables = None
+
+
+def supports_search(connection) -> bool:
+    """Check that SQLite supports `fts5` with the `trigram` tokenizer."""
+    if connection.vendor != 'sqlite':
+        return False
+    if connection.Database.sqlite_version_info < (3, 34, 0):
+        return False
+
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return ('ENABLE_FTS5',) in cursor.fetchall()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0010_order_client_created_code_idx'),
+    ]
+
+    operations = [
+        SearchIndexSQL(CREATE_SEARCH_INDEXES, DROP_SEARCH_INDEXES),
+    ]
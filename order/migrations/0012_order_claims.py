@@ -0,0 +1,213 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:42
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# The triggers of `order_client` refer to `order_order` and fail its
+# rebuild, the index is dropped and created again with the rows reindexed
+CREATE_ORDER_SEARCH_INDEX = [
+    (
+        'CREATE VIRTUAL TABLE order_order_search '
+        'USING fts5(code, legacy_code, comment, address, '
+        "tokenize='trigram')"
+    ),
+    (
+        'INSERT INTO order_order_search '
+        '(rowid, code, legacy_code, comment, address) '
+        'SELECT o.rowid, o.code, o.legacy_code, o.comment, c.address '
+        'FROM order_order o '
+        'LEFT JOIN order_client c ON c.user_ptr_id = o.client_id'
+    ),
+    (
+        'CREATE TRIGGER order_order_search_order_order_insert '
+        'AFTER INSERT ON order_order '
+        'BEGIN '
+        'DELETE FROM order_order_search '
+        'WHERE rowid IN (SELECT NEW.rowid); '
+        'INSERT INTO order_order_search '
+        '(rowid, code, legacy_code, comment, address) '
+        'SELECT o.rowid, o.code, o.legacy_code, o.comment, c.address '
+        'FROM order_order o '
+        'LEFT JOIN order_client c ON c.user_ptr_id = o.client_id '
+        'WHERE o.rowid IN (SELECT NEW.rowid); '
+        'END'
+    ),
+    (
+        'CREATE TRIGGER order_order_search_order_order_update '
+        'AFTER UPDATE OF code, legacy_code, comment, client_id ON '
+        'order_order '
+        'BEGIN '
+        'DELETE FROM order_order_search '
+        'WHERE rowid IN (SELECT OLD.rowid); '
+        'INSERT INTO order_order_search '
+        '(rowid, code, legacy_code, comment, address) '
+        'SELECT o.rowid, o.code, o.legacy_code, o.comment, c.address '
+        'FROM order_order o '
+        'LEFT JOIN order_client c ON c.user_ptr_id = o.client_id '
+        'WHERE o.rowid IN (SELECT OLD.rowid); '
+        'DELETE FROM order_order_search '
+        'WHERE rowid IN (SELECT NEW.rowid); '
+        'INSERT INTO order_order_search '
+        '(rowid, code, legacy_code, comment, address) '
+        'SELECT o.rowid, o.code, o.legacy_code, o.comment, c.address '
+        'FROM order_order o '
+        'LEFT JOIN order_client c ON c.user_ptr_id = o.client_id '
+        'WHERE o.rowid IN (SELECT NEW.rowid); '
+        'END'
+    ),
+    (
+        'CREATE TRIGGER order_order_search_order_order_delete '
+        'AFTER DELETE ON order_order '
+        'BEGIN '
+        'DELETE FROM order_order_search '
+        'WHERE rowid IN (SELECT OLD.rowid); '
+        'INSERT INTO order_order_search '
+        '(rowid, code, legacy_code, comment, address) '
+        'SELECT o.rowid, o.code, o.legacy_code, o.comment, c.address '
+        'FROM order_order o '
+        'LEFT JOIN order_client c ON c.user_ptr_id = o.client_id '
+        'WHERE o.rowid IN (SELECT OLD.rowid); '
+        'END'
+    ),
+    (
+        'CREATE TRIGGER order_order_search_order_client_insert '
+        'AFTER INSERT ON order_client '
+        'BEGIN '
+        'DELETE FROM order_order_search '
+        'WHERE rowid IN (SELECT rowid FROM order_order WHERE client_id = '
+        'NEW.user_ptr_id); '
+        'INSERT INTO order_order_search '
+        '(rowid, code, legacy_code, comment, address) '
+        'SELECT o.rowid, o.code, o.legacy_code, o.comment, c.address '
+        'FROM order_order o '
+        'LEFT JOIN order_client c ON c.user_ptr_id = o.client_id '
+        'WHERE o.rowid IN (SELECT rowid FROM order_order WHERE client_id = '
+        'NEW.user_ptr_id); '
+        'END'
+    ),
+    (
+        'CREATE TRIGGER order_order_search_order_client_update '
+        'AFTER UPDATE OF address ON order_client '
+        'BEGIN '
+        'DELETE FROM order_order_search '
+        'WHERE rowid IN (SELECT rowid FROM order_order WHERE client_id = '
+        'OLD.user_ptr_id); '
+        'INSERT INTO order_order_search '
+        '(rowid, code, legacy_code, comment, address) '
+        'SELECT o.rowid, o.code, o.legacy_code, o.comment, c.address '
+        'FROM order_order o '
+        'LEFT JOIN order_client c ON c.user_ptr_id = o.client_id '
+        'WHERE o.rowid IN (SELECT rowid FROM order_order WHERE client_id = '
+        'OLD.user_ptr_id); '
+        'DELETE FROM order_order_search '
+        'WHERE rowid IN (SELECT rowid FROM order_order WHERE client_id = '
+        'NEW.user_ptr_id); '
+        'INSERT INTO order_order_search '
+        '(rowid, code, legacy_code, comment, address) '
+        'SELECT o.rowid, o.code, o.legacy_code, o.comment, c.address '
+        'FROM order_order o '
+        'LEFT JOIN order_client c ON c.user_ptr_id = o.client_id '
+        'WHERE o.rowid IN (SELECT rowid FROM order_order WHERE client_id = '
+        'NEW.user_ptr_id); '
+        'END'
+    ),
+    (
+        'CREATE TRIGGER order_order_search_order_client_delete '
+        'AFTER DELETE ON order_client '
+        'BEGIN '
+        'DELETE FROM order_order_search '
+        'WHERE rowid IN (SELECT rowid FROM order_order WHERE client_id = '
+        'OLD.user_ptr_id); '
+        'INSERT INTO order_order_search '
+        '(rowid, code, legacy_code, comment, address) '
+        'SELECT o.rowid, o.code, o.legacy_code, o.comment, c.address '
+        'FROM order_order o '
+        'LEFT JOIN order_client c ON c.user_ptr_id = o.client_id '
+        'WHERE o.rowid IN (SELECT rowid FROM order_order WHERE client_id = '
+        'OLD.user_ptr_id); '
+        'END'
+    ),
+]
+
+DROP_ORDER_SEARCH_INDEX = [
+    'DROP TRIGGER IF EXISTS order_order_search_order_order_insert',
+    'DROP TRIGGER IF EXISTS order_order_search_order_order_update',
+    'DROP TRIGGER IF EXISTS order_order_search_order_order_delete',
+    'DROP TRIGGER IF EXISTS order_order_search_order_client_insert',
+    'DROP TRIGGER IF EXISTS order_order_search_order_client_update',
+    'DROP TRIGGER IF EXISTS order_order_search_order_client_delete',
+    'DROP TABLE IF EXISTS order_order_search',
+]
+
+
+class SearchIndexSQL(migrations.RunSQL):
+    """`RunSQL` skipped by the databases without the FTS5 trigram tokenizer.
+
+    The statements are frozen here, the later changes of
+    `order.search.SEARCH_INDEXES` need their own migration.
+    """
+
+    def database_forwards(self, app_label, schema_editor, *args):
+        if supports_search(schema_editor.connection):
+            super().database_forwards(app_label, schema_editor, *args)
+            # Reset the index cache of `utils.search.has_search_index`
+            schema_editor.connection.search_tables = None
+
+    def database_backwards(self, app_label, schema_editor, *args):
+        if supports_search(schema_editor.connection):
+            super().database_backwards(app_label, schema_editor, *args)
+            schema_editor.connection.search_tables = None
+
+
+def supports_search(connection) -> bool:
+    """Check that SQLite supports `fts5` with the `trigram` tokenizer."""
+    if connection.vendor != 'sqlite':
+        return False
+    if connection.Database.sqlite_version_info < (3, 34, 0):
+        return False
+
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return ('ENABLE_FTS5',) in cursor.fetchall()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('order', '0011_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='order',
+            name='order_process_created_idx',
+        ),
+        # SQLite rebuilds the table to add the fields
+        SearchIndexSQL(DROP_ORDER_SEARCH_INDEX, CREATE_ORDER_SEARCH_INDEX),
+        migrations.AddField(
+            model_name='order',
+            name='claim_expires',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='claim expires'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='claim_token',
+            field=models.UUIDField(blank=True, editable=False, null=True, verbose_name='claim token'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='claimed_by',
+            field=models.ForeignKey(blank=True, db_constraint=False, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='claimed by'),
+        ),
+        SearchIndexSQL(CREATE_ORDER_SEARCH_INDEX, DROP_ORDER_SEARCH_INDEX),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['process', 'created', 'code'], name='order_process_created_code_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('claim_token__isnull', False)), fields=['claim_token'], name='order_claim_token_idx'),
+        ),
+    ]
@@ -1,10 +1,12 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, router, transaction
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django_extensions.db.models import TimeStampedModel
 
-from utils.code import generate_code
+from utils.code import CODE_LENGTH, LEGACY_CODE_LENGTH, generate_code
 
 
 class Client(get_user_model()):
@@ -121,8 +123,11 @@ class StandardOrder(OrderProperties):
         return self.name
 
 
-class Order(OrderProperties):
-    """Client order is represented by this model."""
+class AbstractOrder(OrderProperties):
+    """Abstract client order.
+
+    Shared by the active `Order` and the `ArchivedOrder` models.
+    """
 
     class StatusChoice(models.TextChoices):
         """Order status choice.
@@ -160,11 +165,22 @@ class Order(OrderProperties):
 
     code = models.CharField(
         _('code'),
-        max_length=40,
+        max_length=CODE_LENGTH,
         default=generate_code,
         primary_key=True,
         editable=False,
     )
+    legacy_code = models.CharField(
+        _('legacy code'),
+        max_length=LEGACY_CODE_LENGTH,
+        unique=True,
+        null=True,
+        blank=True,
+        editable=False,
+        help_text=_(
+            'Random hex code of the order created before ULID codes.',
+        ),
+    )
 
     client = models.ForeignKey(
         Client,
@@ -188,9 +204,85 @@ class Order(OrderProperties):
 
     comment = models.TextField(_('comment'), max_length=250, blank=True)
 
+    class Meta:
+        abstract = True
+
+    @staticmethod
+    def stats_key(created, status, process) -> tuple:
+        """Get the `(day, status, process)` bucket of the order state."""
+        return timezone.localdate(created), str(status), str(process)
+
+    def get_stats_key(self) -> tuple:
+        """Get the `OrderStats` bucket of the order."""
+        return self.stats_key(self.created, self.status, self.process)
+
+
+class Order(AbstractOrder):
+    """Client order is represented by this model.
+
+    The `claimed_by`, `claim_token` and `claim_expires` fields hold the
+    worker lease of the order, check `order.claims`.
+    """
+
+    # The workers are not copied to the shards, check `order.sharding`
+    claimed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        verbose_name=_('claimed by'),
+        related_name='+',
+        null=True,
+        blank=True,
+        editable=False,
+        db_constraint=False,
+    )
+    claim_token = models.UUIDField(
+        _('claim token'),
+        null=True,
+        blank=True,
+        editable=False,
+    )
+    claim_expires = models.DateTimeField(
+        _('claim expires'),
+        null=True,
+        blank=True,
+        editable=False,
+    )
+
     class Meta:
         verbose_name = _('order')
         verbose_name_plural = _('orders')
+        indexes = [
+            # The client order list, check `order.pagination`
+            models.Index(
+                fields=('client', 'created', 'code'),
+                name='order_client_created_code_idx',
+            ),
+            # The delta sync, check `order.pagination.OrderSyncPagination`
+            models.Index(
+                fields=('client', 'modified', 'code'),
+                name='order_client_modified_idx',
+            ),
+            # The admin changelist ordering and filters
+            models.Index(
+                fields=('created', 'code'),
+                name='order_created_code_idx',
+            ),
+            models.Index(
+                fields=('status', 'created'),
+                name='order_status_created_idx',
+            ),
+            # Also the work queue, check `order.claims`
+            models.Index(
+                fields=('process', 'created', 'code'),
+                name='order_process_created_code_idx',
+            ),
+            # Only the claimed orders, the index stays small and selective
+            models.Index(
+                fields=('claim_token',),
+                name='order_claim_token_idx',
+                condition=models.Q(claim_token__isnull=False),
+            ),
+        ]
         permissions = [
             (
                 'manage_in_assembly_only',
@@ -202,6 +294,90 @@ class Order(OrderProperties):
             ),
         ]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if {'created', 'status', 'process'} <= set(field_names):
+            # The stored bucket, check `order.stats.record_saved_order`
+            instance._stats_key = instance.get_stats_key()
+        return instance
+
+    def save(self, *args, **kwargs):
+        """Save the order with its `OrderStats` change in one transaction."""
+        using = kwargs.get('using') or router.db_for_write(
+            type(self),
+            instance=self,
+        )
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+
+
+class ArchivedOrder(AbstractOrder):
+    """Finished client order moved out of the `Order` table.
+
+    Check `order.archive`. The archived orders stay counted in `OrderStats`.
+    The timestamps are copied from the active order as is.
+    """
+
+    created = models.DateTimeField(_('created'))
+    modified = models.DateTimeField(_('modified'))
+    archived = models.DateTimeField(_('archived'), default=timezone.now)
+
+    class Meta:
+        verbose_name = _('archived order')
+        verbose_name_plural = _('archived orders')
+        indexes = [
+            models.Index(
+                fields=('client', 'created', 'code'),
+                name='archived_client_created_idx',
+            ),
+            # The admin changelist ordering
+            models.Index(
+                fields=('created', 'code'),
+                name='archived_created_code_idx',
+            ),
+            models.Index(
+                fields=('client', 'modified', 'code'),
+                name='archived_client_modified_idx',
+            ),
+        ]
+
+
+class OrderStats(models.Model):
+    """Number of the orders per creation day, status and process status.
+
+    Maintained on every order change by `order.stats`, so the managers get
+    the totals without counting the `Order` table.
+    """
+
+    day = models.DateField(_('day'))
+    status = models.CharField(
+        _('status'),
+        max_length=15,
+        choices=Order.StatusChoice.choices,
+    )
+    process = models.CharField(
+        _('process status'),
+        max_length=15,
+        choices=Order.ProcessStatusChoice.choices,
+    )
+    count = models.IntegerField(_('count'), default=0)
+
+    class Meta:
+        verbose_name = _('order statistics')
+        verbose_name_plural = _('order statistics')
+        constraints = [
+            models.UniqueConstraint(
+                fields=('day', 'status', 'process'),
+                name='order_stats_bucket_unique',
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return '%s %s/%s: %d' % (
+            self.day, self.status, self.process, self.count,
+        )
+
 
 def validate_order_is_returned(order: Order):
     """Validate the order has `RETURNED` status.
@@ -270,3 +446,48 @@ class OrderReturn(TimeStampedModel):
     class Meta:
         verbose_name = _('return order solution')
         verbose_name_plural = _('return order solutions')
+        indexes = [
+            # The admin changelist ordering and filters
+            models.Index(
+                fields=('created', 'id'),
+                name='order_return_created_id_idx',
+            ),
+            models.Index(
+                fields=('solution', 'created'),
+                name='order_return_solution_idx',
+            ),
+        ]
+
+
+class ArchivedOrderReturn(models.Model):
+    """Return of an archived order, check `ArchivedOrder`.
+
+    Keeps the id and the timestamps of the original `OrderReturn`. The
+    replacement order may be active or archived, so it is referenced by the
+    code.
+    """
+
+    created = models.DateTimeField(_('created'))
+    modified = models.DateTimeField(_('modified'))
+
+    order = models.OneToOneField(
+        ArchivedOrder,
+        on_delete=models.CASCADE,
+        verbose_name=_('order'),
+    )
+    solution = models.CharField(
+        _('solution'),
+        max_length=15,
+        choices=OrderReturn.SolutionChoice.choices,
+        default=OrderReturn.SolutionChoice.PENDING,
+    )
+    new_order_code = models.CharField(
+        _('new order code'),
+        max_length=CODE_LENGTH,
+        null=True,
+        blank=True,
+    )
+
+    class Meta:
+        verbose_name = _('archived return order solution')
+        verbose_name_plural = _('archived return order solutions')
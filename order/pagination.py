@@ -0,0 +1,385 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class OrderCursorPagination(BasePagination):
+    """Keyset pagination over the `(created, code)` pair.
+
+    Orders are returned newest first. The cursor is an opaque token with the
+    `created` and `code` values of the page boundary, so every page is fetched
+    with the same index range scan no matter how deep it is.
+
+    The pagination is enabled only if the request contains the `cursor` or
+    the `page_size` query parameter, otherwise the whole list is returned as
+    before.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 100
+    max_page_size = 1000
+    invalid_cursor_message = _('Invalid cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.page_queryset(queryset, request)
+        if queryset is None:
+            return None
+
+        return self.set_page(list(queryset))
+
+    def paginate_querysets(self, querysets, request):
+        """Paginate the orders of several tables, e.g. the archived ones.
+
+        Every queryset is filtered by the same page boundary, the fetched
+        pages are merged with `merge_pages`.
+        """
+        if not self.prepare(request):
+            return None
+
+        return self.set_page(self.merge_pages([
+            list(self.filter_page(queryset)) for queryset in querysets
+        ]))
+
+    def page_queryset(self, queryset, request):
+        """Get the queryset of the requested page with one extra item.
+
+        Returns `None` if the request is not paginated.
+        """
+        if not self.prepare(request):
+            return None
+
+        return self.filter_page(queryset)
+
+    def prepare(self, request) -> bool:
+        """Read the page parameters from the request.
+
+        Split from `paginate_queryset` with `filter_page`, so the async views
+        can fetch the page themselves and pass it to `set_page`.
+
+        Returns:
+            Whether the request is paginated.
+        """
+        params = request.query_params
+        if (
+            self.cursor_query_param not in params
+            and self.page_size_query_param not in params
+        ):
+            return False
+
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.position, self.reverse = self.decode_cursor(request)
+        return True
+
+    def filter_page(self, queryset):
+        """Get the queryset of the prepared page with one extra item."""
+        if self.position is not None:
+            created, code = self.position
+            if self.reverse:
+                queryset = queryset.filter(created__gte=created).exclude(
+                    created=created, code__lte=code,
+                )
+            else:
+                queryset = queryset.filter(created__lte=created).exclude(
+                    created=created, code__gte=code,
+                )
+
+        if self.reverse:
+            queryset = queryset.order_by('created', 'code')
+        else:
+            queryset = queryset.order_by('-created', '-code')
+
+        return queryset[:self.page_size + 1]
+
+    @property
+    def descending(self) -> bool:
+        """Whether the page is fetched in the descending keyset order."""
+        return not self.reverse
+
+    def get_position(self, order) -> tuple:
+        """Get the keyset position of the order."""
+        return order.created, order.code
+
+    def merge_pages(self, pages) -> list:
+        """Merge the pages fetched from several tables in the page order.
+
+        An order moved between the tables while fetched is taken once.
+        """
+        orders = {}
+        for page in pages:
+            for order in page:
+                orders.setdefault(order.code, order)
+        return sorted(
+            orders.values(),
+            key=self.get_position,
+            reverse=self.descending,
+        )[:self.page_size + 1]
+
+    def set_page(self, results):
+        """Get the page from the fetched `page_queryset` results."""
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if self.reverse:
+            self.page.reverse()
+            self.has_next = self.position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.position is not None
+
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size,
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def decode_cursor(self, request):
+        """Get the `((created, code), reverse)` pair from the request.
+
+        Raises:
+            NotFound: if the cursor is malformed.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+
+        try:
+            data = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            created = parse_datetime(data['c'])
+            code = str(data['k'])
+            reverse = bool(data.get('r', False))
+        except (
+            BinasciiError, KeyError, TypeError, UnicodeError, ValueError,
+        ) as exc:
+            raise NotFound(self.invalid_cursor_message) from exc
+
+        if created is None:
+            raise NotFound(self.invalid_cursor_message)
+
+        return (created, code), reverse
+
+    @staticmethod
+    def encode_token(moment, code: str, reverse: bool = False) -> str:
+        """Encode the page boundary as an opaque cursor token."""
+        data = {'c': moment.isoformat(), 'k': code}
+        if reverse:
+            data['r'] = True
+
+        return urlsafe_b64encode(
+            json.dumps(data, separators=(',', ':')).encode(),
+        ).decode('ascii')
+
+    def encode_cursor(self, order, reverse: bool = False) -> str:
+        """Build the link to the page next to the given boundary order."""
+        token = self.encode_token(order.created, order.code, reverse)
+        url = remove_query_param(self.base_url, self.cursor_query_param)
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_data(self, data) -> OrderedDict:
+        """Get the response data with the page results."""
+        return OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ])
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+
+class OrderSyncPagination(OrderCursorPagination):
+    """Delta sync over the `(modified, code)` pair.
+
+    Enabled by the `since` query parameter. Returns the orders changed after
+    the cursor in the order of the changes with the cursor to pass in the
+    next request, an empty `since` starts the sync from the beginning.
+    Deleted orders are not reported.
+
+    Only the changes older than `ORDER_SYNC_SETTLE_SECONDS` are returned, so
+    a change committed a bit later than its `modified` time is not skipped
+    by a cursor that has already passed it.
+    """
+
+    cursor_query_param = 'since'
+    page_size = 1000
+    descending = False
+
+    def prepare(self, request) -> bool:
+        self.page_size = self.get_page_size(request)
+        self.position, _ = self.decode_cursor(request)
+        self.settled = timezone.now() - timedelta(
+            seconds=getattr(settings, 'ORDER_SYNC_SETTLE_SECONDS', 2),
+        )
+        return True
+
+    def filter_page(self, queryset):
+        queryset = queryset.filter(modified__lt=self.settled)
+        if self.position is not None:
+            modified, code = self.position
+            queryset = queryset.filter(modified__gte=modified).exclude(
+                modified=modified, code__lte=code,
+            )
+
+        return queryset.order_by('modified', 'code')[:self.page_size + 1]
+
+    def get_position(self, order) -> tuple:
+        return order.modified, order.code
+
+    def set_page(self, results):
+        self.has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_cursor(self) -> str:
+        """Get the cursor of the next sync request."""
+        if self.has_more:
+            last = self.page[-1]
+            return self.encode_token(last.modified, last.code)
+
+        # All the settled changes are returned
+        return self.encode_token(self.settled, '')
+
+    def get_paginated_data(self, data) -> OrderedDict:
+        return OrderedDict([
+            ('cursor', self.get_cursor()),
+            ('has_more', self.has_more),
+            ('results', data),
+        ])
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'cursor': {'type': 'string'},
+                'has_more': {'type': 'boolean'},
+                'results': schema,
+            },
+        }
+
+
+class SearchPagination(BasePagination):
+    """Page number pagination of the ranked search results.
+
+    The page is fetched with one extra item to know whether there is the
+    next page, the results are not counted.
+    """
+
+    page_query_param = 'page'
+    page_size_query_param = 'page_size'
+    page_size = 20
+    max_page_size = 100
+    invalid_page_message = _('Invalid page.')
+
+    def prepare(self, request):
+        """Read the page parameters from the request.
+
+        Raises:
+            NotFound: if the page number is invalid.
+        """
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        try:
+            self.page_number = _positive_int(
+                request.query_params.get(self.page_query_param, 1),
+                strict=True,
+            )
+        except ValueError as exc:
+            raise NotFound(self.invalid_page_message) from exc
+
+    @property
+    def offset(self) -> int:
+        return (self.page_number - 1) * self.page_size
+
+    @property
+    def limit(self) -> int:
+        """Number of the results to fetch, one more than the page size."""
+        return self.page_size + 1
+
+    def set_page(self, results):
+        """Get the page from the results fetched with `offset` and `limit`."""
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size,
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_page_link(self, number: int):
+        if number == 1:
+            return remove_query_param(self.base_url, self.page_query_param)
+        return replace_query_param(
+            self.base_url, self.page_query_param, number,
+        )
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.get_page_link(self.page_number + 1)
+
+    def get_previous_link(self):
+        if self.page_number == 1:
+            return None
+        return self.get_page_link(self.page_number - 1)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
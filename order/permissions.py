@@ -7,13 +7,20 @@ from order.models import Order
 class ClientOnlyPermission(BasePermission):
     """Allows access for service clients.
 
-    Checks that user have related `order.Client` model.
+    Checks that user have related `order.Client` model. Uses the `is_client`
+    flag set by the authentication if it is present.
     """
 
     message = _('The action is allowed only for service clients.')
 
     def has_permission(self, request, view):
-        return bool(request.user and hasattr(request.user, 'client'))
+        if not request.user:
+            return False
+
+        is_client = getattr(request.user, 'is_client', None)
+        if is_client is None:
+            is_client = hasattr(request.user, 'client')
+        return is_client
 
 
 class UpdateDeliveredOrderOnly(BasePermission):
@@ -0,0 +1,74 @@
+from hashlib import sha1
+from threading import Lock
+from typing import Callable, Optional
+
+from utils.cache import VersionStamp
+
+
+class RenderedPropertiesCache:
+    """Process-local cache of the rendered `Order` properties response.
+
+    Keeps the JSON bytes and their strong ETag until a `Color`, `Size` or
+    `Form` change in any process bumps the shared `version` stamp (see
+    `order.signals`).
+
+    Attributes:
+        hits: requests served by the already rendered payload.
+        misses: requests that had to render the payload.
+    """
+
+    version = VersionStamp('order-properties')
+
+    def __init__(self):
+        self._lock = Lock()
+        self._payload: Optional[tuple[str, bytes]] = None
+        self._loaded_version: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+
+    def cached(self) -> tuple[Optional[str], Optional[bytes]]:
+        """Get the `(etag, content)` pair if it is fresh.
+
+        Returns `(None, None)` if the payload should be rendered.
+        """
+        return self.fresh_payload(self.version.get())
+
+    async def acached(self) -> tuple[Optional[str], Optional[bytes]]:
+        """Async version of `cached`."""
+        return self.fresh_payload(await self.version.aget())
+
+    def fresh_payload(
+        self,
+        version: int,
+    ) -> tuple[Optional[str], Optional[bytes]]:
+        """Get the `(etag, content)` pair if it is rendered for the version."""
+        if version == self._loaded_version and self._payload:
+            self.hits += 1
+            return self._payload
+        return None, None
+
+    def get(self, render: Callable[[], bytes]) -> tuple[str, bytes]:
+        """Get the `(etag, content)` pair, rendering it if it is stale."""
+        etag, content = self.cached()
+        if content is not None:
+            return etag, content
+
+        with self._lock:
+            version = self.version.get()
+            if version != self._loaded_version or not self._payload:
+                self.misses += 1
+                content = render()
+                self._payload = ('"%s"' % sha1(content).hexdigest(), content)
+                self._loaded_version = version
+            return self._payload
+
+    def invalidate(self):
+        """Mark the rendered properties as changed for all the processes."""
+        self.version.bump()
+
+    def stats(self) -> dict[str, int]:
+        """Get the lookup counters."""
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+order_properties = RenderedPropertiesCache()
@@ -0,0 +1,438 @@
+import json
+import re
+from pathlib import Path
+from typing import Any, Callable, NamedTuple, Optional
+
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.test import Client as TestClient
+from django.test.utils import override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from config.authentication import token_cache
+from config.shards import client_queryset
+from order import models
+from order.properties import order_properties
+from order.returns import RETURNABLE
+from order.standard import standard_orders
+from order.stats import update_orders
+
+BASELINE_PATH = Path(__file__).resolve().parent / 'queryplans.json'
+EXPLAINED_STATEMENTS = ('SELECT', 'UPDATE', 'DELETE')
+
+SQLITE_SCAN_RE = re.compile(
+    r'^SCAN (?:TABLE )?(?P<table>\w+)(?: AS \w+)?'
+    r'(?: USING (?P<covering>COVERING )?(?P<index>INDEX))?',
+)
+SORT_MARKERS = ('USE TEMP B-TREE FOR', 'Sort')
+
+
+class Fixtures(NamedTuple):
+    """Objects the hot paths are run with, check `prepare_fixtures`.
+
+    Attributes:
+        api: API client authenticated with the client token.
+        token: the client token key.
+        session: test client logged in as the client.
+        admin: test client logged in as a superuser.
+        standard: standard order properties.
+        returned: returnable order of the client.
+    """
+
+    api: APIClient
+    token: str
+    session: TestClient
+    admin: TestClient
+    standard: models.StandardOrder
+    returned: models.Order
+
+
+class HotPath(NamedTuple):
+    """ORM hot path run by the query plan checker.
+
+    Attributes:
+        name: path name used in the baseline.
+        description: human readable description.
+        run: function sending the request, gets the `Fixtures` and returns
+            the response.
+    """
+
+    name: str
+    description: str
+    run: Callable[[Fixtures], Any]
+
+
+def list_orders(fixtures: Fixtures):
+    """Get the first page of the client orders."""
+    return fixtures.api.get(reverse('order-list'))
+
+
+def list_orders_page(fixtures: Fixtures):
+    """Get the first page of the client orders of the custom size."""
+    return fixtures.api.get(reverse('order-list'), {'page_size': 50})
+
+
+def create_order(fixtures: Fixtures):
+    """Create the client order of the standard properties."""
+    return fixtures.api.post(reverse('order-list'), {
+        'color': fixtures.standard.color_id,
+        'size': fixtures.standard.size_id,
+        'form': fixtures.standard.form_id,
+    }, format='json')
+
+
+def return_order(fixtures: Fixtures):
+    """Return the delivered client order."""
+    return fixtures.api.post(
+        reverse('order-return', kwargs={'pk': fixtures.returned.pk}),
+    )
+
+
+def get_properties(fixtures: Fixtures):
+    """Get the order properties anonymously."""
+    # pylint: disable=unused-argument
+    return APIClient().get(reverse('order-properties'))
+
+
+def get_personal(fixtures: Fixtures):
+    """Get the client personal data with the session."""
+    # The session user, checked by `ClientOnlyPermission`
+    return fixtures.session.get(reverse('client-personal'))
+
+
+def search_orders(fixtures: Fixtures):
+    """Search the orders by the code suffix as the manager."""
+    return fixtures.admin.get(reverse('search'), {
+        'q': fixtures.returned.code[-8:],
+    })
+
+
+def claim_orders(fixtures: Fixtures):
+    """Claim the orders in assembly as the manager."""
+    return fixtures.admin.post(reverse('order-claims'), {
+        'process': models.Order.ProcessStatusChoice.IN_ASSEMBLY,
+    }, content_type='application/json')
+
+
+def admin_changelist(fixtures: Fixtures):
+    """Get the order admin changelist."""
+    return fixtures.admin.get(reverse('admin:order_order_changelist'))
+
+
+def admin_changelist_large(fixtures: Fixtures):
+    """Get the order admin changelist in the large-table mode."""
+    with override_settings(ADMIN_LARGE_TABLE_MODE=True):
+        return admin_changelist(fixtures)
+
+
+HOT_PATHS = [
+    HotPath('order-list', 'Client order list', list_orders),
+    HotPath('order-list-page', 'Client order list page', list_orders_page),
+    HotPath('order-create', 'Client order creation', create_order),
+    HotPath('order-return', 'Client order return', return_order),
+    HotPath('order-properties', 'Order properties', get_properties),
+    HotPath('client-permission', 'Client only permission', get_personal),
+    HotPath('order-search', 'Manager order search', search_orders),
+    HotPath('order-claim', 'Worker order claim', claim_orders),
+    HotPath('admin-changelist', 'Order admin changelist', admin_changelist),
+    HotPath(
+        'admin-changelist-large',
+        'Order admin changelist in the large-table mode',
+        admin_changelist_large,
+    ),
+]
+
+
+def prepare_fixtures() -> Fixtures:
+    """Get the hot path objects from the database seeded by `seed_orders`.
+
+    The test clients are logged in beforehand, so the paths do not count
+    the login queries.
+    """
+    client = models.Client.objects.order_by('pk').first()
+    if client is None:
+        raise ValueError('The database is not seeded.')
+
+    manager = get_user_model().objects.filter(
+        username='queryplans-manager',
+    ).first() or get_user_model().objects.create_superuser(
+        'queryplans-manager',
+    )
+
+    orders = client_queryset(models.Order.objects.all(), client.pk)
+    returned = orders.filter(
+        RETURNABLE,
+        client=client,
+    ).order_by('pk').first()
+    if returned is None:
+        returned = orders.filter(client=client).first()
+        update_orders(
+            orders.filter(pk=returned.pk),
+            status=models.Order.StatusChoice.COMPLETED,
+            process=models.Order.ProcessStatusChoice.DELIVERED,
+        )
+
+    token, _created = Token.objects.get_or_create(user=client)
+    api = APIClient()
+    api.credentials(HTTP_AUTHORIZATION='Bearer %s' % token.key)
+    session = TestClient()
+    session.force_login(client)
+    admin = TestClient()
+    admin.force_login(manager)
+
+    return Fixtures(
+        api=api,
+        token=token.key,
+        session=session,
+        admin=admin,
+        standard=models.StandardOrder.objects.order_by('pk').first(),
+        returned=returned,
+    )
+
+
+def explain(alias: str, sql: str, params) -> list[str]:
+    """Get the query plan lines of the statement."""
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return [row[-1] for row in cursor.fetchall()]
+
+        if connection.vendor == 'postgresql':
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return list(iter_postgresql_nodes(plan[0]['Plan']))
+
+        cursor.execute('EXPLAIN ' + sql, params)
+        columns = [column[0] for column in cursor.description]
+        return [
+            ' '.join(
+                '%s=%s' % (column, value)
+                for column, value in zip(columns, row)
+                if column in ('table', 'type', 'key')
+            )
+            for row in cursor.fetchall()
+        ]
+
+
+def iter_postgresql_nodes(node: dict, depth: int = 0):
+    """Iterate the JSON plan nodes as `<node type> on <relation>` lines."""
+    line = node['Node Type']
+    if 'Relation Name' in node:
+        line += ' on %s' % node['Relation Name']
+    if 'Index Name' in node:
+        line += ' using %s' % node['Index Name']
+    yield '  ' * depth + line
+    for child in node.get('Plans', ()):
+        yield from iter_postgresql_nodes(child, depth + 1)
+
+
+def is_sorting(plan: list[str]) -> bool:
+    """Check that the plan sorts the rows instead of reading an index."""
+    return any(line.strip().startswith(SORT_MARKERS) for line in plan)
+
+
+def find_scans(vendor: str, plan: list[str]) -> set[str]:
+    """Get the tables and the indexes the plan reads in full.
+
+    A full SQLite index scan is reported as `<table> using [covering ]index`,
+    it still reads every row of the table. The index name is left out, the
+    planner picks any of the equal indexes, e.g. to count the rows.
+    """
+    scans = set()
+    for line in plan:
+        line = line.strip()
+        if vendor == 'sqlite':
+            scan = get_sqlite_scan(line)
+            if scan:
+                scans.add(scan)
+        elif vendor == 'postgresql':
+            if line.startswith('Seq Scan on '):
+                scans.add(line.split()[3])
+        elif 'type=ALL' in line.split():
+            scans.add(line.split()[0].split('=', 1)[1])
+    return scans
+
+
+def get_sqlite_scan(line: str) -> Optional[str]:
+    """Get the table or the index the SQLite plan line reads in full."""
+    match = SQLITE_SCAN_RE.match(line)
+    # The internal tables, e.g. `sqlite_stat1` read by the estimates, and
+    # the full-text indexes, which are searched by their own index
+    if (
+        match is None
+        or match['table'].startswith('sqlite_')
+        or 'VIRTUAL TABLE' in line
+    ):
+        return None
+
+    if match['index']:
+        return '%s using %sindex' % (
+            match['table'], 'covering ' if match['covering'] else '',
+        )
+    return match['table']
+
+
+class QueryPlanRecorder:
+    """Records the statements executed on all the databases.
+
+    Usage:
+        with QueryPlanRecorder() as recorder:
+            ...
+        recorder.get_result()
+    """
+
+    def __init__(self):
+        self.statements: list[tuple[str, str, Any]] = []
+        self.queries = 0
+        self._wrappers: list[tuple[Any, Callable]] = []
+
+    def __enter__(self):
+        for alias in connections:
+            connection = connections[alias]
+            wrapper = self.wrapper(alias)
+            connection.execute_wrappers.append(wrapper)
+            self._wrappers.append((connection, wrapper))
+        return self
+
+    def __exit__(self, *exc_info):
+        # Removed by the identity: `utils.timing` adds its wrappers to the
+        # connections during the request, `execute_wrapper()` would pop them
+        for connection, wrapper in self._wrappers:
+            connection.execute_wrappers.remove(wrapper)
+        self._wrappers.clear()
+
+    def wrapper(self, alias: str):
+        def execute(execute, sql, params, many, context):
+            self.queries += 1
+            statement = sql.lstrip().split(None, 1)[0].upper()
+            if not many and statement in EXPLAINED_STATEMENTS:
+                self.statements.append((alias, sql, params))
+            return execute(sql, params, many, context)
+        return execute
+
+    def get_result(self) -> dict[str, Any]:
+        """Explain the recorded statements.
+
+        Returns:
+            The number of the queries, the tables read in full, the number
+            of the statements sorting the rows and the plan of every
+            explained statement.
+        """
+        plans = []
+        scans = set()
+        sorts = 0
+        for alias, sql, params in self.statements:
+            plan = explain(alias, sql, params)
+            scans |= find_scans(connections[alias].vendor, plan)
+            sorts += is_sorting(plan)
+            plans.append({'sql': sql, 'plan': plan})
+
+        return {
+            'queries': self.queries,
+            'scans': sorted(scans),
+            'sorts': sorts,
+            'plans': plans,
+        }
+
+
+def run_hot_paths(paths: Optional[list[HotPath]] = None) -> dict[str, dict]:
+    """Run the hot paths and explain their queries.
+
+    Should be run against a seeded test database: the paths create and
+    return orders. The process-local caches are dropped before every path,
+    so the queries do not depend on the paths order.
+
+    Returns:
+        The `QueryPlanRecorder` result of every path by the path name.
+
+    Raises:
+        AssertionError: if a path request fails.
+    """
+    fixtures = prepare_fixtures()
+    results = {}
+    for path in paths or HOT_PATHS:
+        token_cache.invalidate(fixtures.token)
+        standard_orders.invalidate()
+        order_properties.invalidate()
+
+        with QueryPlanRecorder() as recorder:
+            response = path.run(fixtures)
+        if response.status_code >= 400:
+            raise AssertionError('%s failed with status %d.' % (
+                path.name, response.status_code,
+            ))
+        results[path.name] = recorder.get_result()
+    return results
+
+
+def load_baseline(path: Path = BASELINE_PATH) -> dict:
+    """Load the committed baseline, empty if it is missing."""
+    try:
+        return json.loads(Path(path).read_text())
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(results: dict, path: Path = BASELINE_PATH):
+    """Store the results as the baseline of the default database vendor."""
+    baseline = load_baseline(path)
+    baseline[connections['default'].vendor] = results
+    Path(path).write_text(
+        json.dumps(baseline, indent=2, sort_keys=True) + '\n',
+    )
+
+
+def compare_with_baseline(results: dict, baseline: dict) -> list[str]:
+    """Get the regressions of the results compared with the baseline.
+
+    A path regresses if it runs more queries, reads a table or an index in
+    full that it did not read in full before or sorts the rows in more
+    statements.
+    """
+    vendor = connections['default'].vendor
+    if vendor not in baseline:
+        return ['There is no %s baseline.' % vendor]
+
+    problems = []
+    for name, result in results.items():
+        expected = baseline[vendor].get(name)
+        if expected is None:
+            problems.append('%s: there is no baseline.' % name)
+            continue
+
+        if result['queries'] > expected['queries']:
+            problems.append('%s: %d queries, %d expected.' % (
+                name, result['queries'], expected['queries'],
+            ))
+        if result['sorts'] > expected['sorts']:
+            problems.append('%s: %d sorting statements, %d expected.' % (
+                name, result['sorts'], expected['sorts'],
+            ))
+        new_scans = set(result['scans']) - set(expected['scans'])
+        if new_scans:
+            problems.append('%s: new scans of %s.' % (
+                name, ', '.join(sorted(new_scans)),
+            ))
+    return problems
+
+
+def assert_query_plans(
+    paths: Optional[list[HotPath]] = None,
+    baseline_path: Path = BASELINE_PATH,
+):
+    """Test helper: check the hot paths against the baseline.
+
+    Raises:
+        AssertionError: with the regressions if there are any.
+    """
+    problems = compare_with_baseline(
+        run_hot_paths(paths),
+        load_baseline(baseline_path),
+    )
+    if problems:
+        raise AssertionError('\n'.join(problems))
@@ -0,0 +1,106 @@
+from typing import Iterable, Optional, Union
+
+from django.db import router, transaction
+from django.db.models import Q, QuerySet
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import ValidationError
+
+from order.archive import restore_orders
+from order.models import ArchivedOrder, Order, OrderReturn
+from order.stats import update_orders
+
+# Orders the client may return, check `UpdateDeliveredOrderOnly`
+RETURNABLE = Q(
+    process=Order.ProcessStatusChoice.DELIVERED,
+    status__in=(Order.StatusChoice.IN_PROCESS, Order.StatusChoice.COMPLETED),
+)
+
+
+def create_return(order: Union[Order, ArchivedOrder]) -> OrderReturn:
+    """Mark the order as returned and create the related `OrderReturn`.
+
+    Shared by the sync and the async order views. The order row is locked
+    and updated only if it is still returnable, so of the concurrent
+    requests to return the same order only the first one succeeds. The
+    `status` and `modified` columns are written only, the statistics and
+    the event are updated by `order.stats.update_orders`. An archived order
+    is moved back to the `Order` table first.
+
+    Raises:
+        ValidationError: if the order is already returned or is not
+            returnable anymore.
+
+    Returns:
+        The created `OrderReturn`.
+    """
+    using = router.db_for_write(Order, instance=order)
+    with transaction.atomic(using=using):
+        if isinstance(order, ArchivedOrder):
+            restore_orders(ArchivedOrder.objects.using(using).filter(
+                RETURNABLE,
+                pk=order.pk,
+            ))
+
+        updated = update_orders(
+            Order.objects.using(using).filter(RETURNABLE, pk=order.pk),
+            status=Order.StatusChoice.RETURNED,
+        )
+        if not updated:
+            raise ValidationError({'order': [_(
+                'The order [%(order)s] is already returned or can not be '
+                'returned.',
+            ) % {'order': order.code}]})
+
+        order_return = OrderReturn.objects.using(using).create(
+            order_id=order.pk,
+        )
+
+    order.status = Order.StatusChoice.RETURNED
+    order._stats_key = order.get_stats_key()
+    return order_return
+
+
+def create_returns(
+    queryset,
+    codes: Iterable[str],
+    archived_queryset: Optional[QuerySet] = None,
+) -> tuple[list[OrderReturn], list[str]]:
+    """Return the orders with the given codes (or legacy codes) at once.
+
+    The returnable orders of the queryset are locked, updated and get their
+    `OrderReturn` with a single `bulk_create` in one transaction, so the
+    number of the queries does not depend on the number of the orders. The
+    returnable orders of the `archived_queryset` are moved back to the
+    `Order` table first.
+
+    Returns:
+        The created `OrderReturn` instances and the codes of the orders that
+        are not found or are not returnable.
+    """
+    codes = list(dict.fromkeys(codes))
+    using = queryset.db
+    lookup = Q(code__in=codes) | Q(legacy_code__in=codes)
+    with transaction.atomic(using=using):
+        if archived_queryset is not None:
+            restore_orders(archived_queryset.filter(RETURNABLE, lookup))
+
+        rows = list(queryset.filter(
+            RETURNABLE,
+            lookup,
+        ).select_for_update().order_by('pk').values_list(
+            'pk', 'legacy_code',
+        ))
+        if not rows:
+            return [], codes
+
+        pks = [pk for pk, _legacy_code in rows]
+        update_orders(
+            Order.objects.using(using).filter(RETURNABLE, pk__in=pks),
+            status=Order.StatusChoice.RETURNED,
+        )
+        order_returns = OrderReturn.objects.using(using).bulk_create([
+            OrderReturn(order_id=pk) for pk in pks
+        ])
+
+    returned = {code for row in rows for code in row if code}
+    return order_returns, [code for code in codes if code not in returned]
@@ -0,0 +1,191 @@
+from functools import reduce
+from itertools import chain
+from operator import and_, or_
+from typing import Optional
+
+from django.db import migrations
+from django.db.models import Q, QuerySet
+
+from config.shards import is_sharded, scatter_queryset
+from utils.search import (
+    SearchIndex,
+    SearchSource,
+    create_search_index,
+    drop_search_index,
+    parse_search_terms,
+    ranked_search,
+)
+
+CLIENT_SEARCH_INDEX = SearchIndex(
+    table='order_client_search',
+    columns=('username', 'email', 'first_name', 'last_name', 'address'),
+    select=(
+        'SELECT c.user_ptr_id, u.username, u.email, u.first_name, '
+        'u.last_name, c.address FROM order_client c '
+        'JOIN auth_user u ON u.id = c.user_ptr_id'
+    ),
+    key='c.user_ptr_id',
+    sources=(
+        SearchSource(
+            'auth_user',
+            ('username', 'email', 'first_name', 'last_name'),
+            'SELECT {row}.id',
+        ),
+        SearchSource('order_client', ('address',), 'SELECT {row}.user_ptr_id'),
+    ),
+)
+
+# The orders are found by the client address too, the address change
+# reindexes the client orders
+ORDER_SEARCH_INDEX = SearchIndex(
+    table='order_order_search',
+    columns=('code', 'legacy_code', 'comment', 'address'),
+    select=(
+        'SELECT o.rowid, o.code, o.legacy_code, o.comment, c.address '
+        'FROM order_order o '
+        'LEFT JOIN order_client c ON c.user_ptr_id = o.client_id'
+    ),
+    key='o.rowid',
+    sources=(
+        SearchSource(
+            'order_order',
+            ('code', 'legacy_code', 'comment', 'client_id'),
+            'SELECT {row}.rowid',
+        ),
+        SearchSource(
+            'order_client',
+            ('address',),
+            'SELECT rowid FROM order_order '
+            'WHERE client_id = {row}.user_ptr_id',
+        ),
+    ),
+)
+
+
+def name_search_index(table: str) -> SearchIndex:
+    """Get the index of the `name` column of the table."""
+    return SearchIndex(
+        table='%s_search' % table,
+        columns=('name',),
+        select='SELECT t.id, t.name FROM %s t' % table,
+        key='t.id',
+        sources=(SearchSource(table, ('name',), 'SELECT {row}.id'),),
+    )
+
+
+COLOR_SEARCH_INDEX = name_search_index('order_color')
+SIZE_SEARCH_INDEX = name_search_index('order_size')
+FORM_SEARCH_INDEX = name_search_index('order_form')
+STANDARD_ORDER_SEARCH_INDEX = name_search_index('order_standardorder')
+
+SEARCH_INDEXES = (
+    CLIENT_SEARCH_INDEX,
+    ORDER_SEARCH_INDEX,
+    COLOR_SEARCH_INDEX,
+    SIZE_SEARCH_INDEX,
+    FORM_SEARCH_INDEX,
+    STANDARD_ORDER_SEARCH_INDEX,
+)
+
+
+def create_search_indexes(apps, schema_editor):
+    """Migration function creating all the `SEARCH_INDEXES`."""
+    # pylint: disable=unused-argument
+    for index in SEARCH_INDEXES:
+        create_search_index(schema_editor.connection, index)
+
+
+def drop_search_indexes(apps, schema_editor):
+    """Migration function dropping all the `SEARCH_INDEXES`."""
+    # pylint: disable=unused-argument
+    for index in SEARCH_INDEXES:
+        drop_search_index(schema_editor.connection, index)
+
+
+def without_search_indexes(*operations) -> list:
+    """Wrap the migration operations rebuilding the indexed tables.
+
+    SQLite rebuilds a table for most of the column changes. The triggers of
+    the other tables refer to the indexed ones and fail the rebuild, the
+    index would keep the rowids of the dropped table anyway. The indexes are
+    dropped before the operations and created with the rows indexed again
+    after them, in both directions.
+
+    Usage:
+        operations = without_search_indexes(
+            migrations.AlterField(...),
+        )
+    """
+    return [
+        migrations.RunPython(drop_search_indexes, create_search_indexes),
+        *operations,
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
+
+
+# Lookups of the databases without the search index
+CLIENT_SEARCH_FIELDS = (
+    'username', 'email', 'first_name', 'last_name', 'address',
+)
+ORDER_SEARCH_FIELDS = ('code', 'legacy_code', 'comment', 'client__address')
+
+
+def search(
+    queryset: QuerySet,
+    index: SearchIndex,
+    fields: tuple[str, ...],
+    query: str,
+    limit: int,
+    offset: int = 0,
+) -> Optional[list]:
+    """Get the page of the objects matching all the query terms.
+
+    The objects are ranked by the search index, check
+    `utils.search.ranked_search`. Without the index the `fields` are
+    searched with `icontains` and the objects are ordered by the primary
+    key, which scans the table.
+
+    Returns:
+        The page objects, `None` if the query has no terms.
+    """
+    terms, short_terms = parse_search_terms(query)
+    if not terms and not short_terms:
+        return None
+
+    found = ranked_search(queryset, index, query, limit, offset)
+    if found is not None:
+        return found
+
+    return list(queryset.filter(reduce(and_, (
+        reduce(or_, (Q(**{'%s__icontains' % field: term}) for field in fields))
+        for term in terms + short_terms
+    ))).order_by('pk')[offset:offset + limit])
+
+
+def search_shards(
+    queryset: QuerySet,
+    index: SearchIndex,
+    fields: tuple[str, ...],
+    query: str,
+    limit: int,
+    offset: int = 0,
+) -> Optional[list]:
+    """Get the page of the matching objects of all the shards.
+
+    Every shard returns its first `offset + limit` objects, check `search`,
+    the page is cut from them merged by the rank.
+    """
+    if not is_sharded():
+        return search(queryset, index, fields, query, limit, offset)
+
+    pages = scatter_queryset(queryset, lambda shard_queryset: search(
+        shard_queryset, index, fields, query, limit=offset + limit,
+    ))
+    if pages[0] is None:
+        return None
+
+    found = sorted(
+        chain.from_iterable(pages),
+        key=lambda obj: (getattr(obj, 'search_rank', 0), obj.pk),
+    )
+    return found[offset:offset + limit]
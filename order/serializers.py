@@ -1,9 +1,38 @@
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 
+from order.claims import CLAIM_STAGES, MAX_CLAIM_SIZE
 from order.models import Client, Order, OrderReturn
+from order.transitions import TRANSITIONS
+from utils.search import MIN_TERM_LENGTH, parse_search_terms
+from utils.timing import current_timings
 
 
-class LoginSerializer(serializers.Serializer):
+class TimedSerializerMixin:
+    """Adds the validation and representation time to the request timings.
+
+    Check `config.middleware.RequestTimingMiddleware`.
+    """
+
+    def is_valid(self, *args, **kwargs):
+        timings = current_timings()
+        if timings is None:
+            return super().is_valid(*args, **kwargs)
+
+        with timings.measure('serializer'):
+            return super().is_valid(*args, **kwargs)
+
+    def to_representation(self, instance):
+        timings = current_timings()
+        if timings is None:
+            return super().to_representation(instance)
+
+        with timings.measure('serializer'):
+            return super().to_representation(instance)
+
+
+class LoginSerializer(TimedSerializerMixin, serializers.Serializer):
     """Login serializers model.
 
     Contains required `username` and `password` fields.
@@ -13,7 +42,10 @@ class LoginSerializer(serializers.Serializer):
     password = serializers.CharField(max_length=128)
 
 
-class ClientPersonalSerializer(serializers.ModelSerializer):
+class ClientPersonalSerializer(
+    TimedSerializerMixin,
+    serializers.ModelSerializer,
+):
     class Meta:
         model = Client
         fields = (
@@ -22,7 +54,7 @@ class ClientPersonalSerializer(serializers.ModelSerializer):
         )
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """`Order` model serializer."""
 
     class Meta:
@@ -34,8 +66,50 @@ class OrderSerializer(serializers.ModelSerializer):
             'created', 'modified',
         )
 
+    def create(self, validated_data):
+        """Create the order in the database the routers pick for it.
+
+        The default `create` saves to the database of the manager, not to
+        the shard of the order client.
+        """
+        order = Order(**validated_data)
+        order.save(force_insert=True)
+        return order
 
-class OrderReturnSerializer(serializers.ModelSerializer):
+
+class BulkOrderItemSerializer(
+    TimedSerializerMixin,
+    serializers.Serializer,
+):
+    """Single item of the bulk `Order` creation.
+
+    The property ids are checked against the `properties` context mapping of
+    the property field name to the set of existing ids, so a batch is
+    validated without a query per item.
+    """
+
+    color = serializers.IntegerField()
+    size = serializers.IntegerField()
+    form = serializers.IntegerField()
+
+    def validate(self, attrs):
+        properties = self.context['properties']
+        errors = {
+            name: _('Invalid pk "%(pk)s" - object does not exist.') % {
+                'pk': attrs[name],
+            }
+            for name in ('color', 'size', 'form')
+            if attrs[name] not in properties[name]
+        }
+        if errors:
+            raise serializers.ValidationError(errors)
+        return attrs
+
+
+class OrderReturnSerializer(
+    TimedSerializerMixin,
+    serializers.ModelSerializer,
+):
     """`OrderReturn` model serializer."""
 
     class Meta:
@@ -43,7 +117,99 @@ class OrderReturnSerializer(serializers.ModelSerializer):
         fields = ('id', 'order', 'solution', 'new_order')
 
 
-class OrderPropertySerializer(serializers.Serializer):
+class OrderTransitionSerializer(
+    TimedSerializerMixin,
+    serializers.Serializer,
+):
+    """Order state transition request, check `order.transitions`."""
+
+    transition = serializers.ChoiceField(choices=sorted(TRANSITIONS))
+    codes = serializers.ListField(
+        child=serializers.CharField(max_length=40),
+        allow_empty=False,
+        max_length=1000,
+    )
+
+
+class OrderClaimSerializer(
+    TimedSerializerMixin,
+    serializers.Serializer,
+):
+    """Worker request to claim the orders, check `order.claims`."""
+
+    process = serializers.ChoiceField(choices=sorted(CLAIM_STAGES))
+    limit = serializers.IntegerField(
+        min_value=1,
+        max_value=MAX_CLAIM_SIZE,
+        default=10,
+    )
+    lease = serializers.IntegerField(
+        min_value=1,
+        max_value=settings.ORDER_CLAIM_MAX_LEASE_SECONDS,
+        required=False,
+    )
+
+
+class OrderClaimActionSerializer(
+    TimedSerializerMixin,
+    serializers.Serializer,
+):
+    """Worker request to release or finish the claim or some of its orders.
+
+    The `lease` is used by the heartbeat only.
+    """
+
+    codes = serializers.ListField(
+        child=serializers.CharField(max_length=40),
+        allow_empty=False,
+        max_length=MAX_CLAIM_SIZE,
+        required=False,
+    )
+    lease = serializers.IntegerField(
+        min_value=1,
+        max_value=settings.ORDER_CLAIM_MAX_LEASE_SECONDS,
+        required=False,
+    )
+
+
+class OrderBulkReturnSerializer(
+    TimedSerializerMixin,
+    serializers.Serializer,
+):
+    """Request to return the orders with the given codes at once."""
+
+    codes = serializers.ListField(
+        child=serializers.CharField(max_length=40),
+        allow_empty=False,
+        max_length=1000,
+    )
+
+
+class OrderPropertySerializer(
+    TimedSerializerMixin,
+    serializers.Serializer,
+):
     id = serializers.IntegerField()
     name = serializers.CharField(max_length=25)
     description = serializers.CharField(max_length=250, default='')
+
+
+class SearchQuerySerializer(
+    TimedSerializerMixin,
+    serializers.Serializer,
+):
+    """Manager search query, check `order.views.SearchView`."""
+
+    q = serializers.CharField(max_length=200)
+    type = serializers.ChoiceField(
+        choices=('orders', 'clients'),
+        default='orders',
+    )
+
+    def validate_q(self, value):
+        terms, _short_terms = parse_search_terms(value)
+        if not terms:
+            raise serializers.ValidationError(_(
+                'Expected a search term of at least %(length)d characters.',
+            ) % {'length': MIN_TERM_LENGTH})
+        return value
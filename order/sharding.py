@@ -0,0 +1,263 @@
+from collections import Counter, defaultdict
+from typing import Iterable, Optional
+
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from config.shards import get_shards, shard_for_client
+from order.archive import copy_fields, restore_timestamps
+from order.models import (
+    ArchivedOrder,
+    ArchivedOrderReturn,
+    Client,
+    Color,
+    Form,
+    Order,
+    OrderReturn,
+    Size,
+)
+from order.stats import apply_stats_deltas, record_created_orders
+
+# The tables the sharded ones refer to, copied to every shard
+REFERENCE_MODELS = (Client, Color, Size, Form)
+
+# Every shard allocates the return ids from its own range, so the returns
+# keep their ids when they are moved between the shards or archived
+ID_RANGE_SIZE = 2 ** 40
+ID_RANGE_MODELS = (OrderReturn,)
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def reserve_id_range(alias: str, model, index: int):
+    """Make the shard allocate the model ids from its range."""
+    connection = connections[alias]
+    table = model._meta.db_table
+    start = index * ID_RANGE_SIZE
+    if not start:
+        return
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(
+                'UPDATE sqlite_sequence SET seq = %s '
+                'WHERE name = %s AND seq < %s',
+                [start, table, start],
+            )
+            cursor.execute(
+                'INSERT INTO sqlite_sequence (name, seq) SELECT %s, %s '
+                'WHERE NOT EXISTS '
+                '(SELECT 1 FROM sqlite_sequence WHERE name = %s)',
+                [table, start, table],
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT setval(pg_get_serial_sequence(%%s, %%s), '
+                'GREATEST(%%s, (SELECT COALESCE(MAX(%s), 0) FROM %s)))' % (
+                    connection.ops.quote_name(model._meta.pk.column),
+                    connection.ops.quote_name(table),
+                ),
+                [table, model._meta.pk.column, start],
+            )
+
+
+def copy_reference_rows(model, rows: list, using: str):
+    """Insert or update the reference rows in the shard.
+
+    The `Client` rows are copied with their parent user rows.
+    """
+    if model is Client:
+        copy_reference_rows(get_user_model(), rows, using)
+
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    fields = model._meta.local_concrete_fields
+    pk = model._meta.pk
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            'INSERT INTO %s (%s) VALUES (%s) ON CONFLICT (%s) DO UPDATE '
+            'SET %s' % (
+                quote(model._meta.db_table),
+                ', '.join(quote(field.column) for field in fields),
+                ', '.join(['%s'] * len(fields)),
+                quote(pk.column),
+                ', '.join(
+                    '%s = excluded.%s' % (
+                        quote(field.column), quote(field.column),
+                    )
+                    for field in fields if field is not pk
+                ),
+            ),
+            [
+                [
+                    field.get_db_prep_save(
+                        getattr(row, field.attname), connection,
+                    )
+                    for field in fields
+                ]
+                for row in rows
+            ],
+        )
+
+
+def replicate_reference_rows(model, rows: list, using: str = DEFAULT_DB_ALIAS):
+    """Copy the rows saved in the `default` database to the other shards."""
+    if using != DEFAULT_DB_ALIAS:
+        return
+    for alias in get_shards()[1:]:
+        copy_reference_rows(model, rows, alias)
+
+
+def replicate_reference_delete(model, pk, using: str = DEFAULT_DB_ALIAS):
+    """Delete the row deleted in the `default` database from the shards.
+
+    The orders of a deleted client lose the client in every shard.
+    """
+    if using != DEFAULT_DB_ALIAS:
+        return
+    for alias in get_shards()[1:]:
+        model.objects.using(alias).filter(pk=pk).delete()
+
+
+def sync_reference_data(
+    aliases: Optional[Iterable[str]] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> int:
+    """Copy the reference tables to the shards and reserve their id ranges.
+
+    Used to set up a new shard and after the bulk inserts, which do not
+    send the signals replicating the rows. The rows missing in the
+    `default` database are deleted from the shards.
+
+    Returns:
+        The number of the copied rows.
+    """
+    shards = get_shards()
+    aliases = [
+        alias for alias in (aliases or shards) if alias != DEFAULT_DB_ALIAS
+    ]
+    copied = 0
+    for alias in aliases:
+        with transaction.atomic(using=alias):
+            for model in ID_RANGE_MODELS:
+                reserve_id_range(alias, model, shards.index(alias))
+
+            for model in REFERENCE_MODELS:
+                queryset = model.objects.using(DEFAULT_DB_ALIAS).order_by('pk')
+                last_pk = None
+                while True:
+                    batch = queryset
+                    if last_pk is not None:
+                        batch = batch.filter(pk__gt=last_pk)
+                    rows = list(batch[:batch_size])
+                    if not rows:
+                        break
+                    copy_reference_rows(model, rows, alias)
+                    copied += len(rows)
+                    last_pk = rows[-1].pk
+
+                stale = set(model.objects.using(alias).values_list(
+                    'pk', flat=True,
+                )) - set(queryset.values_list('pk', flat=True))
+                if stale:
+                    model.objects.using(alias).filter(pk__in=stale).delete()
+    return copied
+
+
+def bulk_create_orders(orders: list[Order]) -> list[Order]:
+    """Insert the orders into the shards of their clients.
+
+    The orders of every shard are inserted with one `bulk_create` and
+    counted by `record_created_orders` in a transaction of the shard.
+    """
+    shard_orders = defaultdict(list)
+    for order in orders:
+        shard_orders[shard_for_client(order.client_id)].append(order)
+
+    for alias, batch in shard_orders.items():
+        with transaction.atomic(using=alias):
+            Order.objects.using(alias).bulk_create(batch)
+            record_created_orders(batch, alias)
+    return orders
+
+
+def misplaced_clients(alias: str) -> list[int]:
+    """Get the clients with the orders stored in another shard."""
+    client_ids = set()
+    for model in (Order, ArchivedOrder):
+        client_ids.update(model.objects.using(alias).exclude(
+            client=None,
+        ).order_by().values_list('client_id', flat=True).distinct())
+    return sorted(
+        client_id for client_id in client_ids
+        if shard_for_client(client_id) != alias
+    )
+
+
+def move_client_orders(client_id: int, source: str, target: str) -> int:
+    """Move the client orders, returns and archived ones between shards.
+
+    The rows are copied to the target, counted in its statistics and only
+    then deleted from the source with the statistics, in the nested
+    transactions. A move interrupted between the commits leaves copies in
+    both shards, they are skipped by the next move.
+
+    Returns:
+        The number of the moved orders.
+    """
+    moved = 0
+    with transaction.atomic(using=source), transaction.atomic(using=target):
+        deltas = Counter()
+        for order_model, return_model in (
+            (Order, OrderReturn),
+            (ArchivedOrder, ArchivedOrderReturn),
+        ):
+            orders = list(order_model.objects.using(source).filter(
+                client_id=client_id,
+            ).select_for_update().order_by('pk'))
+            if not orders:
+                continue
+
+            codes = [order.pk for order in orders]
+            order_returns = list(return_model.objects.using(source).filter(
+                order__in=codes,
+            ))
+            existing = set(order_model.objects.using(target).filter(
+                pk__in=codes,
+            ).values_list('pk', flat=True))
+
+            copied = [order for order in orders if order.pk not in existing]
+            copied_returns = [
+                order_return for order_return in order_returns
+                if order_return.order_id not in existing
+            ]
+            order_model.objects.using(target).bulk_create([
+                copy_fields(order, order_model) for order in copied
+            ])
+            return_model.objects.using(target).bulk_create([
+                copy_fields(order_return, return_model)
+                for order_return in copied_returns
+            ])
+            if order_model is Order:
+                restore_timestamps(Order.objects.using(target), copied)
+                restore_timestamps(
+                    OrderReturn.objects.using(target), copied_returns,
+                )
+
+            apply_stats_deltas(Counter(
+                order.get_stats_key() for order in copied
+            ), target)
+            deltas.update(order.get_stats_key() for order in orders)
+
+            return_model.objects.using(source).filter(
+                pk__in=[order_return.pk for order_return in order_returns],
+            )._raw_delete(source)
+            order_model.objects.using(source).filter(
+                pk__in=codes,
+            )._raw_delete(source)
+            moved += len(orders)
+
+        apply_stats_deltas(Counter({
+            key: -count for key, count in deltas.items()
+        }), source)
+    return moved
@@ -0,0 +1,133 @@
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import transaction
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from config.authentication import token_cache
+from order.events import publish_order_change
+from order.models import (
+    ArchivedOrder,
+    Client,
+    Color,
+    Form,
+    Order,
+    Size,
+    StandardOrder,
+)
+from order.properties import order_properties
+from order.sharding import replicate_reference_delete, replicate_reference_rows
+from order.standard import standard_orders
+from order.stats import record_deleted_order, record_saved_order
+
+
+@receiver(post_migrate)
+def create_cache_table(app_config, using, **kwargs):
+    """Create the database cache table along with the `order` tables.
+
+    The default cache keeps the version stamps, check the `CACHES` setting.
+    The command skips the existing table and the other cache backends.
+    """
+    if app_config.name == 'order':
+        call_command('createcachetable', database=using, verbosity=0)
+
+
+@receiver(post_save, sender=StandardOrder)
+@receiver(post_delete, sender=StandardOrder)
+def invalidate_standard_orders(**kwargs):
+    """Drop the cached standard triples on any `StandardOrder` change."""
+    standard_orders.invalidate()
+
+
+@receiver(post_save, sender=Color)
+@receiver(post_save, sender=Size)
+@receiver(post_save, sender=Form)
+@receiver(post_delete, sender=Color)
+@receiver(post_delete, sender=Size)
+@receiver(post_delete, sender=Form)
+def invalidate_order_properties(**kwargs):
+    """Drop the rendered order properties on any property change."""
+    order_properties.invalidate()
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(instance, using, **kwargs):
+    """Drop the cached token once it is deleted or rotated.
+
+    The token is dropped after the commit, so it is not cached again by a
+    request reading the token before the commit.
+    """
+    transaction.on_commit(
+        partial(token_cache.invalidate, instance.key),
+        using=using,
+    )
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_save, sender=Client)
+def invalidate_changed_user_tokens(
+    instance,
+    created,
+    using,
+    update_fields=None,
+    **kwargs,
+):
+    """Drop the cached token of the user once the user may lose the access.
+
+    Any user save may deactivate the user or change the password, except the
+    `last_login` update on login. The cached tokens of the other users stay.
+    """
+    if created or update_fields and set(update_fields) <= {'last_login'}:
+        return
+
+    for key in Token.objects.using(using).filter(
+        user_id=instance.pk,
+    ).values_list('key', flat=True):
+        transaction.on_commit(
+            partial(token_cache.invalidate, key),
+            using=using,
+        )
+
+
+@receiver(post_save, sender=Order)
+def track_saved_order(instance, created, using, **kwargs):
+    """Update the order statistics and publish the status change.
+
+    `Order.save` wraps the receiver in a transaction.
+    """
+    if record_saved_order(instance, created, using):
+        publish_order_change(instance, using)
+
+
+@receiver(post_delete, sender=Order)
+@receiver(post_delete, sender=ArchivedOrder)
+def count_deleted_order(instance, using, **kwargs):
+    """Update the order statistics in the deletion transaction.
+
+    Moving the order to the archive and back does not send the signal.
+    """
+    record_deleted_order(instance, using)
+
+
+@receiver(post_save, sender=Client)
+@receiver(post_save, sender=Color)
+@receiver(post_save, sender=Size)
+@receiver(post_save, sender=Form)
+def replicate_saved_reference(sender, instance, using, **kwargs):
+    """Copy the saved client or property to the other shards.
+
+    The sharded orders refer to them, check `order.sharding`.
+    """
+    replicate_reference_rows(sender, [instance], using)
+
+
+@receiver(post_delete, sender=Client)
+@receiver(post_delete, sender=Color)
+@receiver(post_delete, sender=Size)
+@receiver(post_delete, sender=Form)
+def replicate_deleted_reference(sender, instance, using, **kwargs):
+    """Delete the deleted client or property from the other shards."""
+    replicate_reference_delete(sender, instance.pk, using)
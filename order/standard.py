@@ -0,0 +1,70 @@
+from threading import Lock
+from typing import Any, Optional
+
+from order.models import StandardOrder
+from utils.cache import VersionStamp
+
+PropertyTriple = tuple[int, int, int]
+
+
+class StandardOrderMatcher:
+    """Process-local set of the standard `(color, size, form)` triples.
+
+    The set is loaded from the `StandardOrder` table on the first lookup and
+    reused until any process bumps the shared `version` stamp (see
+    `order.signals`).
+
+    Attributes:
+        hits: lookups served by the already loaded set.
+        misses: lookups that had to (re)load the set from the database.
+    """
+
+    version = VersionStamp('standard-orders')
+
+    def __init__(self):
+        self._lock = Lock()
+        self._triples: frozenset[PropertyTriple] = frozenset()
+        self._loaded_version: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+
+    def get_triples(self) -> frozenset[PropertyTriple]:
+        """Get the actual set of standard triples."""
+        version = self.version.get()
+        if version == self._loaded_version:
+            self.hits += 1
+            return self._triples
+
+        with self._lock:
+            if version != self._loaded_version:
+                self.misses += 1
+                self._triples = frozenset(
+                    StandardOrder.objects.values_list(
+                        'color_id', 'size_id', 'form_id',
+                    ),
+                )
+                self._loaded_version = version
+            return self._triples
+
+    def is_standard(self, color: Any, size: Any, form: Any) -> bool:
+        """Check that the given properties are one of the standard sets.
+
+        Properties may be passed as raw request values, invalid ones are
+        never standard.
+        """
+        try:
+            triple = (int(color), int(size), int(form))
+        except (TypeError, ValueError):
+            return False
+        return triple in self.get_triples()
+
+    def invalidate(self):
+        """Mark the standard triples as changed for all the processes."""
+        self.version.bump()
+
+    def stats(self) -> dict[str, int]:
+        """Get the lookup counters."""
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+standard_orders = StandardOrderMatcher()
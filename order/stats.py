@@ -0,0 +1,182 @@
+from collections import Counter
+from itertools import chain
+from typing import Iterable, Optional
+
+from django.db import IntegrityError, router, transaction
+from django.db.models import Count, F, QuerySet
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from config.shards import scatter_queryset
+from order.events import order_event_data, publish_order_changes
+from order.models import Order, OrderStats
+
+
+def apply_stats_deltas(deltas: Counter, using: Optional[str] = None):
+    """Add the deltas to the `OrderStats` buckets.
+
+    Should be called in the transaction that changes the orders. Buckets are
+    updated in the key order, so concurrent transactions lock them in the
+    same order.
+    """
+    using = using or router.db_for_write(OrderStats)
+    manager = OrderStats.objects.using(using)
+
+    with transaction.atomic(using=using):
+        for (day, status, process), delta in sorted(deltas.items()):
+            if not delta:
+                continue
+
+            bucket = manager.filter(day=day, status=status, process=process)
+            if bucket.update(count=F('count') + delta):
+                continue
+
+            try:
+                with transaction.atomic(using=using):
+                    manager.create(
+                        day=day, status=status, process=process,
+                        count=delta,
+                    )
+            except IntegrityError:
+                # Created by a concurrent transaction
+                bucket.update(count=F('count') + delta)
+
+
+def record_saved_order(order: Order, created: bool, using: str) -> bool:
+    """Count the created order or move the changed one to its new bucket.
+
+    The stored bucket of the order is kept by `Order.from_db` and by this
+    function, the change of an order that was neither loaded nor saved
+    before is ignored.
+
+    Returns:
+        Whether the order is created or its status is changed.
+    """
+    key = order.get_stats_key()
+    previous = getattr(order, '_stats_key', None)
+
+    deltas = Counter()
+    if created:
+        deltas[key] += 1
+    elif previous is not None and previous != key:
+        deltas[previous] -= 1
+        deltas[key] += 1
+
+    apply_stats_deltas(deltas, using)
+    order._stats_key = key
+    return bool(deltas)
+
+
+def record_deleted_order(order: Order, using: str):
+    """Uncount the deleted order."""
+    key = getattr(order, '_stats_key', None) or order.get_stats_key()
+    apply_stats_deltas(Counter({key: -1}), using)
+
+
+def record_created_orders(
+    orders: Iterable[Order],
+    using: Optional[str] = None,
+):
+    """Count the orders inserted with `bulk_create`.
+
+    `bulk_create` does not send `post_save`, so the callers should record
+    the orders in the inserting transaction.
+    """
+    deltas = Counter()
+    for order in orders:
+        order._stats_key = order.get_stats_key()
+        deltas[order._stats_key] += 1
+    apply_stats_deltas(deltas, using)
+
+
+def update_orders(queryset: QuerySet, **values) -> int:
+    """Update the orders status or process with the statistics.
+
+    Replaces `queryset.update(...)` for the transitions: the matching rows
+    are locked, updated and counted in the new buckets in one transaction.
+    The queryset filter is repeated in the `UPDATE` and the `modified` time
+    is set unless it is passed. The changes are published to
+    `order.events` once committed.
+
+    Returns:
+        The number of the updated orders.
+    """
+    using = queryset.db
+    values.setdefault('modified', timezone.now())
+    with transaction.atomic(using=using):
+        rows = list(queryset.select_for_update().values_list(
+            'pk', 'client_id', 'created', 'status', 'process',
+        ))
+        if not rows:
+            return 0
+
+        deltas = Counter()
+        changes = []
+        for code, client_id, created, status, process in rows:
+            new_status = values.get('status', status)
+            new_process = values.get('process', process)
+            deltas[Order.stats_key(created, status, process)] -= 1
+            deltas[Order.stats_key(created, new_status, new_process)] += 1
+            changes.append((client_id, order_event_data(
+                code, new_status, new_process, values['modified'],
+            )))
+
+        updated = queryset.filter(
+            pk__in=[row[0] for row in rows],
+        ).update(**values)
+        apply_stats_deltas(deltas, using)
+        publish_order_changes(changes, using)
+    return updated
+
+
+def count_orders(queryset: Optional[QuerySet] = None) -> Counter:
+    """Count the orders by the `OrderStats` buckets with a `GROUP BY`."""
+    if queryset is None:
+        queryset = Order.objects.all()
+
+    return Counter({
+        (row['day'], row['status'], row['process']): row['count']
+        for row in queryset.order_by().values(
+            'status', 'process', day=TruncDate('created'),
+        ).annotate(count=Count('pk'))
+    })
+
+
+def summarize_stats(queryset: Optional[QuerySet] = None) -> dict:
+    """Get the order totals from the `OrderStats` buckets of all the shards.
+
+    Returns:
+        The total number of the orders, the numbers by status, by process,
+        by both of them and by the creation day.
+    """
+    if queryset is None:
+        queryset = OrderStats.objects.all()
+
+    by_status = Counter()
+    by_process = Counter()
+    by_pair = Counter()
+    by_day = Counter()
+    rows = scatter_queryset(queryset, lambda shard_queryset: list(
+        shard_queryset.filter(count__gt=0).values_list(
+            'day', 'status', 'process', 'count',
+        ),
+    ))
+    for day, status, process, count in chain.from_iterable(rows):
+        by_status[status] += count
+        by_process[process] += count
+        by_pair[status, process] += count
+        by_day[day] += count
+
+    return {
+        'total': sum(by_status.values()),
+        'status': dict(by_status),
+        'process': dict(by_process),
+        'status_process': [
+            {'status': status, 'process': process, 'count': count}
+            for (status, process), count in sorted(by_pair.items())
+        ],
+        'days': [
+            {'day': day, 'count': count}
+            for day, count in sorted(by_day.items())
+        ],
+    }
@@ -0,0 +1,1828 @@
+import csv
+import json
+import subprocess
+import sys
+from collections import Counter
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Any
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import connection, migrations
+from django.db.migrations.executor import MigrationExecutor
+from django.db.migrations.loader import MigrationLoader
+from django.db.models import CharField, F
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from config.authentication import (
+    BearerTokenAuthentication,
+    TokenCache,
+    token_cache,
+)
+from config.metrics import metrics
+from config.routers import choose_replica, stick_to_primary
+from config.shards import ShardRouter, jump_hash, shard_for_client
+from order import models
+from order.admin import OrderAdmin
+from order.archive import archive_orders
+from order.async_views import AsyncOrderEventsView
+from order.claims import (
+    claim_orders,
+    extend_claim,
+    finish_claim,
+    release_claim,
+)
+from order.events import OrderEventBus
+from order.export import EXPORT_FIELDS
+from order.properties import RenderedPropertiesCache, order_properties
+from order.queryplans import assert_query_plans, find_scans
+from order.returns import create_return, create_returns
+from order.search import ORDER_SEARCH_INDEX, without_search_indexes
+from order.standard import StandardOrderMatcher, standard_orders
+from order.stats import count_orders, summarize_stats, update_orders
+from order.transitions import TRANSITIONS, apply_transition
+from order.views import OrderViewSet, render_properties
+from utils.cache import VersionStamp
+from utils.code import (
+    CODE_LENGTH,
+    LEGACY_CODE_LENGTH,
+    encode_code,
+    generate_code,
+    generate_legacy_code,
+    is_legacy_code,
+)
+from utils.metrics import MetricsRegistry
+from utils.search import ranked_search
+
+
+def create_client(username: str = 'client') -> models.Client:
+    """Create a client with an address."""
+    return models.Client.objects.create_user(
+        username=username,
+        password='password',
+        address='Baker Street 221b',
+    )
+
+
+def create_properties() -> tuple[models.Color, models.Size, models.Form]:
+    """Create a property of every kind."""
+    return (
+        models.Color.objects.create(name='red'),
+        models.Size.objects.create(name='small'),
+        models.Form.objects.create(name='round'),
+    )
+
+
+def create_orders(client, properties, count: int) -> list[models.Order]:
+    """Create the client orders one by one."""
+    color, size, form = properties
+    return [
+        models.Order.objects.create(
+            client=client, color=color, size=size, form=form,
+        )
+        for _ in range(count)
+    ]
+
+
+class VersionStampsMixin:
+    """Forget the version stamps read by the previous tests.
+
+    The cache table is rolled back with the test, while the process trusts
+    the read stamps for `VERSION_STAMP_TTL` seconds.
+    """
+
+    def setUp(self):
+        super().setUp()
+        for stamp in (
+            token_cache.versions,
+            standard_orders.version,
+            order_properties.version,
+        ):
+            stamp.forget()
+
+
+def api_client(client: models.Client) -> APIClient:
+    """Get an API client authenticated with the client token."""
+    token, _created = Token.objects.get_or_create(user=client)
+    api = APIClient()
+    api.credentials(HTTP_AUTHORIZATION='Bearer %s' % token.key)
+    return api
+
+
+class OrderCursorPaginationTests(TestCase):
+    """`order.pagination.OrderCursorPagination` of the client order list."""
+
+    def setUp(self):
+        self.client_user = create_client()
+        self.properties = create_properties()
+        self.orders = create_orders(self.client_user, self.properties, 7)
+        self.api = api_client(self.client_user)
+        self.expected = [
+            order.code for order in sorted(
+                self.orders,
+                key=lambda order: (order.created, order.code),
+                reverse=True,
+            )
+        ]
+
+    def test_list_is_not_paginated_by_default(self):
+        response = self.api.get(reverse('order-list'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response.data, list)
+        self.assertEqual(
+            {order['code'] for order in response.data}, set(self.expected),
+        )
+
+    def test_page_size_enables_pagination(self):
+        response = self.api.get(reverse('order-list'), {'page_size': 100})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [order['code'] for order in response.data['results']],
+            self.expected,
+        )
+        self.assertIsNone(response.data['next'])
+        self.assertIsNone(response.data['previous'])
+
+    def test_async_list_is_not_paginated_by_default(self):
+        response = self.api.get(reverse('async-order-list'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), len(self.orders))
+
+    def test_cursor_round_trip(self):
+        codes = []
+        pages = []
+        url = reverse('order-list') + '?page_size=3'
+        while url:
+            response = self.api.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.data)
+            codes += [order['code'] for order in response.data['results']]
+            url = response.data['next']
+
+        self.assertEqual(codes, self.expected)
+        self.assertEqual(
+            [len(page['results']) for page in pages], [3, 3, 1],
+        )
+
+        # Back from the last page to the first one
+        response = self.api.get(pages[-1]['previous'])
+        self.assertEqual(
+            [order['code'] for order in response.data['results']],
+            self.expected[3:6],
+        )
+        response = self.api.get(response.data['previous'])
+        self.assertEqual(
+            [order['code'] for order in response.data['results']],
+            self.expected[:3],
+        )
+        self.assertIsNone(response.data['previous'])
+
+    def test_invalid_cursor(self):
+        response = self.api.get(reverse('order-list'), {'cursor': 'bad'})
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_other_client_orders_are_not_listed(self):
+        create_orders(create_client('other'), self.properties, 2)
+
+        response = self.api.get(reverse('order-list'), {'page_size': 100})
+
+        self.assertEqual(len(response.data['results']), len(self.orders))
+
+
+class TokenCacheTests(VersionStampsMixin, TestCase):
+    """`config.authentication.TokenCache` of the bearer tokens."""
+
+    def setUp(self):
+        super().setUp()
+        self.client_user = create_client()
+        self.token = Token.objects.create(user=self.client_user)
+        self.authentication = BearerTokenAuthentication()
+
+    def test_requests_get_own_user_copies(self):
+        first, _token = self.authentication.authenticate_credentials(
+            self.token.key,
+        )
+        with self.assertNumQueries(0):
+            second, _token = self.authentication.authenticate_credentials(
+                self.token.key,
+            )
+
+        self.assertTrue(first.is_client)
+        self.assertIsNot(first, second)
+        self.assertIsNot(first.client, second.client)
+        first.client.address = 'changed'
+        self.assertEqual(second.client.address, 'Baker Street 221b')
+
+    def test_miss_queries_token_only(self):
+        self.authentication.authenticate_credentials(self.token.key)
+        token_cache.entries.clear()
+
+        # The token version is still trusted
+        with self.assertNumQueries(1):
+            self.authentication.authenticate_credentials(self.token.key)
+
+    def test_deactivated_user_is_rejected(self):
+        api = api_client(self.client_user)
+        self.assertEqual(api.get(reverse('order-list')).status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client_user.is_active = False
+            self.client_user.save()
+
+        response = api.get(reverse('order-list'))
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.data['detail'], 'User inactive or deleted.')
+
+    def test_deleted_token_is_rejected(self):
+        api = api_client(self.client_user)
+        self.assertEqual(api.get(reverse('order-list')).status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+
+        response = api.get(reverse('order-list'))
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.data['detail'], 'Invalid token.')
+
+    def test_other_users_tokens_stay_cached(self):
+        other = create_client('other')
+        other_token = Token.objects.create(user=other)
+        for key in (self.token.key, other_token.key):
+            self.authentication.authenticate_credentials(key)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client_user.client.address = 'Downing Street 10'
+            self.client_user.client.save()
+
+        with self.assertNumQueries(0):
+            self.authentication.authenticate_credentials(other_token.key)
+        user, _token = self.authentication.authenticate_credentials(
+            self.token.key,
+        )
+        self.assertEqual(user.client.address, 'Downing Street 10')
+
+    def test_async_authentication(self):
+        api = api_client(self.client_user)
+
+        for _ in range(2):
+            response = api.get(reverse('async-order-list'))
+            self.assertEqual(response.status_code, 200)
+
+    def test_invalidation_is_shared_by_processes(self):
+        # Another process has its own cache, its stamps are not trusted
+        other = TokenCache(max_size=10, ttl=60)
+        other.versions = VersionStamp('auth-tokens', max_items=10, ttl=0)
+        _credentials, version = other.get(self.token.key)
+        other.set(self.token.key, ('user', 'token'), version)
+        self.assertEqual(other.get(self.token.key)[0], ('user', 'token'))
+
+        token_cache.invalidate(self.token.key)
+
+        self.assertIsNone(other.get(self.token.key)[0])
+
+
+class StandardOrderMatcherTests(VersionStampsMixin, TestCase):
+    """`order.standard.StandardOrderMatcher` invalidation."""
+
+    def setUp(self):
+        super().setUp()
+        self.properties = create_properties()
+        self.triple = tuple(prop.pk for prop in self.properties)
+
+    def test_change_is_seen_by_other_processes(self):
+        # Another process has its own matcher, its stamp is not trusted
+        other = StandardOrderMatcher()
+        other.version = VersionStamp('standard-orders', ttl=0)
+        self.assertFalse(other.is_standard(*self.triple))
+
+        color, size, form = self.properties
+        standard = models.StandardOrder.objects.create(
+            name='standard', color=color, size=size, form=form,
+        )
+        self.assertTrue(other.is_standard(*self.triple))
+
+        standard.delete()
+        self.assertFalse(other.is_standard(*self.triple))
+
+    def test_loaded_triples_are_reused(self):
+        matcher = StandardOrderMatcher()
+        matcher.get_triples()
+
+        with self.assertNumQueries(0):
+            self.assertFalse(matcher.is_standard(*self.triple))
+
+    def test_create_does_not_query_standard_orders(self):
+        color, size, form = self.properties
+        models.StandardOrder.objects.create(
+            name='standard', color=color, size=size, form=form,
+        )
+        api = api_client(create_client())
+        data = {'color': color.pk, 'size': size.pk, 'form': form.pk}
+        api.post(reverse('order-list'), data)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = api.post(reverse('order-list'), data)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            response.data['process'],
+            models.Order.ProcessStatusChoice.IN_ASSEMBLY,
+        )
+        for query in queries:
+            self.assertNotIn('order_standardorder', query['sql'])
+            self.assertNotIn('django_cache', query['sql'])
+
+
+class RenderedPropertiesCacheTests(VersionStampsMixin, TestCase):
+    """`order.properties.RenderedPropertiesCache` invalidation."""
+
+    def setUp(self):
+        super().setUp()
+        self.properties = create_properties()
+
+    def test_change_is_seen_by_other_processes(self):
+        # Another process has its own cache, its stamp is not trusted
+        other = RenderedPropertiesCache()
+        other.version = VersionStamp('order-properties', ttl=0)
+        etag, content = other.get(render_properties)
+        self.assertEqual(other.cached(), (etag, content))
+
+        models.Color.objects.create(name='blue')
+
+        self.assertEqual(other.cached(), (None, None))
+        new_etag, new_content = other.get(render_properties)
+        self.assertNotEqual(new_etag, etag)
+        self.assertIn(b'blue', new_content)
+
+    def test_not_modified(self):
+        for name in ('order-properties', 'async-order-properties'):
+            response = self.client.get(reverse(name))
+            self.assertEqual(response.status_code, 200)
+
+            with self.assertNumQueries(0):
+                response = self.client.get(
+                    reverse(name),
+                    HTTP_IF_NONE_MATCH=response['ETag'],
+                )
+            self.assertEqual(response.status_code, 304)
+
+    def test_rendered_properties_are_reused(self):
+        response = self.client.get(reverse('order-properties'))
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(reverse('order-properties'))
+        self.assertEqual(cached.content, response.content)
+        self.assertEqual(cached['ETag'], response['ETag'])
+
+
+class BulkOrderCreateTests(VersionStampsMixin, TestCase):
+    """`OrderViewSet.bulk_create` of the client orders."""
+
+    def setUp(self):
+        super().setUp()
+        self.client_user = create_client()
+        self.api = api_client(self.client_user)
+        color, size, form = self.properties = create_properties()
+        self.other_color = models.Color.objects.create(name='blue')
+        models.StandardOrder.objects.create(
+            name='standard', color=color, size=size, form=form,
+        )
+        self.standard = {'color': color.pk, 'size': size.pk, 'form': form.pk}
+        self.pending = {**self.standard, 'color': self.other_color.pk}
+
+    def post(self, data):
+        """Send the bulk creation request."""
+        return self.api.post(
+            reverse('order-bulk'), data, format='json',
+        )
+
+    def test_orders_are_created(self):
+        response = self.post([self.standard, self.pending])
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(
+            [order['process'] for order in response.data['results']],
+            [
+                models.Order.ProcessStatusChoice.IN_ASSEMBLY,
+                models.Order.ProcessStatusChoice.PENDING,
+            ],
+        )
+        self.assertEqual(
+            models.Order.objects.filter(client=self.client_user).count(), 2,
+        )
+
+    def test_invalid_items_are_skipped(self):
+        response = self.post([
+            {**self.standard, 'size': 0},
+            self.pending,
+            {'color': self.standard['color']},
+        ])
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 1)
+        first, second, third = response.data['results']
+        self.assertIn('size', first['errors'])
+        self.assertEqual(second['color'], self.other_color.pk)
+        self.assertEqual(set(third['errors']), {'size', 'form'})
+        self.assertEqual(models.Order.objects.count(), 1)
+
+    def test_invalid_batches_are_rejected(self):
+        self.assertEqual(self.post([{'color': 0}]).status_code, 400)
+        self.assertEqual(self.post(self.standard).status_code, 400)
+
+        with mock.patch.object(OrderViewSet, 'bulk_max_size', 2):
+            response = self.post([self.standard] * 3)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(models.Order.objects.count(), 0)
+
+    def test_queries_do_not_depend_on_batch_size(self):
+        # The statistics buckets of both processes exist after the first one
+        self.post([self.standard, self.pending])
+
+        with CaptureQueriesContext(connection) as small:
+            self.post([self.standard, self.pending])
+        with CaptureQueriesContext(connection) as large:
+            self.post([self.standard, self.pending] * 20)
+
+        self.assertEqual(len(large), len(small))
+        self.assertEqual(models.Order.objects.count(), 44)
+
+
+class OrderCodeTests(VersionStampsMixin, TestCase):
+    """`utils.code` ULID codes and the legacy code lookups."""
+
+    def test_codes_are_time_ordered(self):
+        codes = [generate_code() for _ in range(1000)]
+
+        self.assertEqual(codes, sorted(codes))
+        self.assertEqual(len(set(codes)), len(codes))
+        self.assertTrue(all(len(code) == CODE_LENGTH for code in codes))
+        self.assertFalse(any(is_legacy_code(code) for code in codes))
+
+    def test_code_of_timestamp(self):
+        code = generate_code(timestamp_ms=1700000000000)
+
+        self.assertEqual(code[:10], encode_code(1700000000000 << 80)[:10])
+        self.assertLess(
+            generate_code(timestamp_ms=1700000000000),
+            generate_code(timestamp_ms=1700000000001),
+        )
+
+    def test_legacy_codes(self):
+        self.assertTrue(is_legacy_code(generate_legacy_code()))
+        self.assertFalse(is_legacy_code('z' * LEGACY_CODE_LENGTH))
+
+    def test_order_is_found_by_legacy_code(self):
+        client_user = create_client()
+        order = create_orders(client_user, create_properties(), 1)[0]
+        legacy_code = generate_legacy_code()
+        models.Order.objects.filter(pk=order.pk).update(
+            legacy_code=legacy_code,
+        )
+        api = api_client(client_user)
+
+        for name in ('order-detail', 'async-order-detail'):
+            response = api.get(reverse(name, args=[legacy_code]))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['code'], order.code)
+
+        response = api.get(reverse('order-detail', args=[
+            generate_legacy_code(),
+        ]))
+        self.assertEqual(response.status_code, 404)
+
+
+class OrderCodeMigrationTests(TransactionTestCase):
+    """`0005_order_ulid_code` conversion of the legacy codes."""
+
+    legacy = ('order', '0004_order_client_created_idx')
+    converted = ('order', '0005_order_ulid_code')
+
+    def migrate(self, *targets):
+        """Migrate the database, get the models of the targets state."""
+        executor = MigrationExecutor(connection)
+        executor.migrate(list(targets))
+        executor.loader.build_graph()
+        return executor.loader.project_state(list(targets)).apps
+
+    def tearDown(self):
+        self.migrate(*MigrationLoader(connection).graph.leaf_nodes())
+
+    def test_codes_are_converted_and_restored(self):
+        apps = self.migrate(self.legacy)
+        client_user = apps.get_model('order', 'Client').objects.create(
+            username='client', address='Baker Street 221b',
+        )
+        properties = {
+            name: apps.get_model('order', name.title()).objects.create(
+                name=name,
+            )
+            for name in ('color', 'size', 'form')
+        }
+        codes = [generate_legacy_code() for _ in range(2)]
+        orders = [
+            apps.get_model('order', 'Order').objects.create(
+                code=code, client=client_user, **properties,
+            )
+            for code in codes
+        ]
+        apps.get_model('order', 'OrderReturn').objects.create(
+            order=orders[0], new_order=orders[1],
+        )
+
+        apps = self.migrate(self.converted)
+        converted = {
+            order.legacy_code: order
+            for order in apps.get_model('order', 'Order').objects.all()
+        }
+        self.assertEqual(set(converted), set(codes))
+        for order in converted.values():
+            self.assertEqual(len(order.code), CODE_LENGTH)
+            # The timestamp part of the code is the creation time
+            self.assertEqual(order.code[:10], generate_code(
+                timestamp_ms=int(order.created.timestamp() * 1000),
+            )[:10])
+        order_return = apps.get_model('order', 'OrderReturn').objects.get()
+        self.assertEqual(order_return.order_id, converted[codes[0]].code)
+        self.assertEqual(order_return.new_order_id, converted[codes[1]].code)
+
+        apps = self.migrate(self.legacy)
+        self.assertEqual(
+            set(apps.get_model('order', 'Order').objects.values_list(
+                'code', flat=True,
+            )),
+            set(codes),
+        )
+        order_return = apps.get_model('order', 'OrderReturn').objects.get()
+        self.assertEqual(
+            (order_return.order_id, order_return.new_order_id),
+            tuple(codes),
+        )
+
+
+class OrderExportTests(VersionStampsMixin, TestCase):
+    """`OrderViewSet.export` of the client orders."""
+
+    def setUp(self):
+        super().setUp()
+        self.client_user = create_client()
+        properties = create_properties()
+        self.orders = create_orders(self.client_user, properties, 3)
+        self.orders[0].status = models.Order.StatusChoice.COMPLETED
+        self.orders[0].save()
+        create_orders(create_client('other'), properties, 1)
+        self.api = api_client(self.client_user)
+
+    def export(self, **params) -> tuple[Any, str]:
+        """Get the export response and its streamed content."""
+        response = self.api.get(reverse('order-export'), params)
+        content = b''.join(response.streaming_content).decode()
+        return response, content
+
+    def test_ndjson(self):
+        response, content = self.export()
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(
+            {row['code'] for row in rows},
+            {order.code for order in self.orders},
+        )
+        self.assertEqual(set(rows[0]), set(EXPORT_FIELDS))
+        # The properties and the client are exported by name
+        self.assertEqual(
+            {(row['color'], row['size'], row['form']) for row in rows},
+            {('red', 'small', 'round')},
+        )
+        self.assertEqual({row['client'] for row in rows}, {'client'})
+
+    def test_csv(self):
+        response, content = self.export(output='csv')
+
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(StringIO(content)))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0]['color'], 'red')
+
+    def test_filters(self):
+        _response, content = self.export(
+            status=models.Order.StatusChoice.COMPLETED,
+        )
+        self.assertEqual(
+            [json.loads(line)['code'] for line in content.splitlines()],
+            [self.orders[0].code],
+        )
+
+        _response, content = self.export(
+            created_after=self.orders[2].created.isoformat(),
+        )
+        self.assertEqual(
+            [json.loads(line)['code'] for line in content.splitlines()],
+            [self.orders[2].code],
+        )
+
+    def test_invalid_filters(self):
+        for params, field in (
+            ({'status': 'lost'}, 'status'),
+            ({'process': 'lost'}, 'process'),
+            ({'created_before': 'yesterday'}, 'created_before'),
+            ({'output': 'xml'}, 'output'),
+        ):
+            response = self.api.get(reverse('order-export'), params)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(field, response.data)
+
+
+class ImportOrdersTests(VersionStampsMixin, TestCase):
+    """`import_orders` command."""
+
+    def setUp(self):
+        super().setUp()
+        create_properties()
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        self.records = [
+            {'username': 'first', 'address': 'Baker Street 221b'},
+            {
+                'username': 'first',
+                'color': 'red', 'size': 'small', 'form': 'round',
+            },
+            {
+                'username': 'second',
+                'color': 'red', 'size': 'small', 'form': 'round',
+                'status': models.Order.StatusChoice.COMPLETED,
+                'process': models.Order.ProcessStatusChoice.DELIVERED,
+            },
+        ]
+
+    def write(self, lines: list[str], name: str = 'orders.ndjson') -> str:
+        """Write the input file, get its path."""
+        path = self.directory / name
+        path.write_text(''.join(line + '\n' for line in lines))
+        return str(path)
+
+    def call(self, *args, **options) -> tuple[str, str]:
+        """Run the command, get its output and its errors output."""
+        stdout, stderr = StringIO(), StringIO()
+        call_command(
+            'import_orders', *args, stdout=stdout, stderr=stderr, **options,
+        )
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_import(self):
+        path = self.write([json.dumps(record) for record in self.records])
+
+        stdout, _stderr = self.call(path)
+
+        self.assertIn('Done: 2 clients, 2 orders, 0 skipped', stdout)
+        first = models.Client.objects.get(username='first')
+        self.assertEqual(first.address, 'Baker Street 221b')
+        self.assertEqual(
+            models.Order.objects.get(client=first).process,
+            models.Order.ProcessStatusChoice.PENDING,
+        )
+        self.assertEqual(
+            models.Order.objects.get(client__username='second').status,
+            models.Order.StatusChoice.COMPLETED,
+        )
+
+    def test_csv_import(self):
+        path = self.directory / 'orders.csv'
+        with path.open('w', newline='') as stream:
+            writer = csv.DictWriter(stream, fieldnames=[
+                'username', 'color', 'size', 'form', 'comment',
+            ])
+            writer.writeheader()
+            writer.writerow({
+                'username': 'first', 'color': 'red', 'size': 'small',
+                'form': 'round', 'comment': 'fragile',
+            })
+
+        self.call(str(path))
+
+        self.assertEqual(models.Order.objects.get().comment, 'fragile')
+
+    def test_invalid_records_are_reported(self):
+        path = self.write([
+            json.dumps(self.records[1]),
+            '{"username": ',
+            '[1]',
+            json.dumps({**self.records[1], 'color': 'blue'}),
+            json.dumps({'color': 'red'}),
+        ])
+
+        stdout, stderr = self.call(path)
+
+        self.assertIn('Done: 1 clients, 1 orders, 4 skipped', stdout)
+        self.assertEqual(stderr.splitlines(), [
+            'Record 2: not a JSON object, skipped.',
+            'Record 3: not a JSON object, skipped.',
+            'Record 4: invalid order fields, skipped.',
+            'Record 5: not a client username, skipped.',
+        ])
+
+    def test_resume_from_checkpoint(self):
+        path = self.write([json.dumps(record) for record in self.records])
+        checkpoint = self.directory / 'checkpoint.json'
+        checkpoint.write_text(json.dumps({'path': path, 'position': 2}))
+
+        stdout, _stderr = self.call(path, checkpoint=str(checkpoint))
+
+        self.assertIn('Resuming after 2 records.', stdout)
+        self.assertEqual(
+            list(models.Order.objects.values_list(
+                'client__username', flat=True,
+            )),
+            ['second'],
+        )
+        self.assertEqual(
+            json.loads(checkpoint.read_text()),
+            {'path': path, 'position': 3},
+        )
+
+        # The finished input is not imported again
+        stdout, _stderr = self.call(path, checkpoint=str(checkpoint))
+        self.assertIn('Done: 0 clients, 0 orders', stdout)
+        self.assertEqual(models.Order.objects.count(), 1)
+
+    def test_checkpoint_of_another_input(self):
+        path = self.write([json.dumps(record) for record in self.records])
+        checkpoint = self.directory / 'checkpoint.json'
+        checkpoint.write_text(json.dumps({'path': 'other', 'position': 2}))
+
+        with self.assertRaisesMessage(CommandError, 'another input: other'):
+            self.call(path, checkpoint=str(checkpoint))
+        self.assertEqual(models.Order.objects.count(), 0)
+
+
+class ClientRoleTests(VersionStampsMixin, TestCase):
+    """`is_client` flag resolved by the authentication query."""
+
+    def setUp(self):
+        super().setUp()
+        self.client_user = create_client()
+
+    def get_client_queries(self, url: str) -> tuple[Any, list[str]]:
+        """Get the response and the queries of `order_client` alone."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response, [
+            query['sql'] for query in queries
+            if 'FROM "order_client"' in query['sql']
+        ]
+
+    def test_token_client_is_resolved_without_queries(self):
+        api = api_client(self.client_user)
+        url = reverse('client-personal')
+        api.get(url)
+
+        with self.assertNumQueries(0):
+            response = api.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['address'], 'Baker Street 221b')
+
+    def test_session_client_is_selected_with_user(self):
+        self.client.force_login(self.client_user)
+
+        response, client_queries = self.get_client_queries(
+            reverse('client-personal'),
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(client_queries, [])
+
+    def test_other_users_are_not_clients(self):
+        user = get_user_model().objects.create_user(
+            username='manager', password='password',
+        )
+        self.client.force_login(user)
+
+        response, client_queries = self.get_client_queries(
+            reverse('order-list'),
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(client_queries, [])
+        self.assertFalse(response.wsgi_request.user.is_client)
+
+
+class AsyncOrderViewsTests(VersionStampsMixin, TestCase):
+    """`order.async_views` list, create and return views."""
+
+    def setUp(self):
+        super().setUp()
+        self.client_user = create_client()
+        self.properties = create_properties()
+        self.orders = create_orders(self.client_user, self.properties, 3)
+        create_orders(create_client('other'), self.properties, 1)
+        # Older than the delta sync settle window
+        models.Order.objects.update(
+            modified=timezone.now() - timedelta(minutes=1),
+        )
+        self.api = api_client(self.client_user)
+
+    def test_list_matches_sync_view(self):
+        for params in ({}, {'page_size': 2}, {'since': ''}):
+            response = self.api.get(reverse('async-order-list'), params)
+            expected = self.api.get(reverse('order-list'), params)
+
+            self.assertEqual(response.status_code, 200)
+            data, expected = response.json(), json.loads(expected.content)
+            # The page links and the sync cursors differ
+            if isinstance(expected, dict):
+                self.assertEqual(set(data), set(expected))
+                data, expected = data['results'], expected['results']
+            self.assertEqual(data, expected)
+
+    def test_create(self):
+        color, size, form = self.properties
+        models.StandardOrder.objects.create(
+            name='standard', color=color, size=size, form=form,
+        )
+        url = reverse('async-order-list')
+
+        response = self.api.post(url, {
+            'color': color.pk, 'size': size.pk, 'form': form.pk,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        order = models.Order.objects.get(pk=response.json()['code'])
+        self.assertEqual(order.client_id, self.client_user.pk)
+        self.assertEqual(
+            order.process, models.Order.ProcessStatusChoice.IN_ASSEMBLY,
+        )
+
+        response = self.api.post(url, {'color': color.pk}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('size', response.json())
+
+    def test_return(self):
+        delivered, active = self.orders[:2]
+        update_orders(
+            models.Order.objects.filter(pk=delivered.pk),
+            process=models.Order.ProcessStatusChoice.DELIVERED,
+        )
+
+        response = self.api.post(
+            reverse('async-order-return', args=[delivered.pk]),
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['order'], delivered.pk)
+        self.assertEqual(
+            models.Order.objects.get(pk=delivered.pk).status,
+            models.Order.StatusChoice.RETURNED,
+        )
+
+        response = self.api.post(
+            reverse('async-order-return', args=[active.pk]),
+        )
+        self.assertEqual(response.status_code, 403)
+
+    def test_token_is_required(self):
+        response = APIClient().get(reverse('async-order-list'))
+
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer')
+
+
+class OrderStatsTests(TestCase):
+    """`order.stats` buckets against the counted orders."""
+
+    def setUp(self):
+        self.client_user = create_client()
+        self.orders = create_orders(self.client_user, create_properties(), 3)
+
+    def assertStatsMatch(self):
+        """Check the non-empty buckets against `COUNT(*)` of the orders."""
+        stored = Counter({
+            (day, status, process): count
+            for day, status, process, count in (
+                models.OrderStats.objects.filter(count__gt=0).values_list(
+                    'day', 'status', 'process', 'count',
+                )
+            )
+        })
+        self.assertEqual(
+            stored,
+            count_orders() + count_orders(models.ArchivedOrder.objects.all()),
+        )
+
+    def test_created_orders_are_counted(self):
+        self.assertStatsMatch()
+        self.assertEqual(summarize_stats()['total'], 3)
+
+    def test_changed_orders_move_to_new_buckets(self):
+        order = self.orders[0]
+        order.process = models.Order.ProcessStatusChoice.IN_DELIVERY
+        order.save()
+        self.assertStatsMatch()
+
+        updated = update_orders(
+            models.Order.objects.filter(pk=self.orders[1].pk),
+            status=models.Order.StatusChoice.COMPLETED,
+            process=models.Order.ProcessStatusChoice.DELIVERED,
+        )
+        self.assertEqual(updated, 1)
+        self.assertStatsMatch()
+        self.assertEqual(summarize_stats()['status'], {
+            models.Order.StatusChoice.IN_PROCESS: 2,
+            models.Order.StatusChoice.COMPLETED: 1,
+        })
+
+    def test_deleted_orders_are_uncounted(self):
+        self.orders[0].delete()
+        models.Order.objects.filter(pk=self.orders[1].pk).get().delete()
+        self.assertStatsMatch()
+        self.assertEqual(summarize_stats()['total'], 1)
+
+    def test_reconcile(self):
+        models.OrderStats.objects.update(count=F('count') + 5)
+        with self.assertRaisesMessage(CommandError, '1 buckets'):
+            call_command('reconcile_order_stats', '--check', stdout=StringIO())
+
+        stdout = StringIO()
+        call_command('reconcile_order_stats', stdout=stdout)
+        self.assertIn(
+            'Rebuilt 1 buckets, 1 were mismatched.', stdout.getvalue(),
+        )
+        self.assertStatsMatch()
+        call_command('reconcile_order_stats', '--check', stdout=StringIO())
+
+
+@override_settings(ADMIN_LARGE_TABLE_MODE=True)
+@mock.patch.object(OrderAdmin, 'list_per_page', 2)
+class LargeTableAdminTests(TestCase):
+    """`utils.admin.LargeTableAdminMixin` keyset changelist of the orders."""
+
+    def setUp(self):
+        self.properties = create_properties()
+        self.client_user = create_client()
+        self.orders = create_orders(self.client_user, self.properties, 5)
+        admin = get_user_model().objects.create_superuser(
+            username='admin', password='password',
+        )
+        self.client.force_login(admin)
+        self.url = reverse('admin:order_order_changelist')
+
+    def get_page(self, url: str) -> tuple[Any, int]:
+        """Get the changelist of the page and the number of its queries."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.context['cl'], len(queries)
+
+    def test_pages_follow_keyset(self):
+        codes = []
+        query_counts = set()
+        url = self.url
+        while url:
+            changelist, query_count = self.get_page(url)
+            codes += [order.code for order in changelist.result_list]
+            query_counts.add(query_count)
+            url = changelist.keyset_next_url and (
+                self.url + changelist.keyset_next_url
+            )
+
+        self.assertEqual(codes, [
+            order.code for order in sorted(
+                self.orders,
+                key=lambda order: (order.created, order.code),
+                reverse=True,
+            )
+        ])
+        # Every page costs the same
+        self.assertEqual(len(query_counts), 1)
+
+    def test_queries_do_not_depend_on_table_size(self):
+        _changelist, query_count = self.get_page(self.url)
+        create_orders(self.client_user, self.properties, 20)
+
+        self.assertEqual(self.get_page(self.url)[1], query_count)
+
+    @mock.patch.object(OrderAdmin, 'large_table_count_limit', 3)
+    def test_filtered_count_is_capped(self):
+        changelist, _query_count = self.get_page(
+            self.url + '?status__exact=in_process',
+        )
+
+        self.assertEqual(changelist.result_count, 3)
+        self.assertTrue(changelist.result_count_capped)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {'after': 'bad'})
+
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('e=1', response['Location'])
+
+
+class OrderTransitionTests(TestCase):
+    """`order.transitions.apply_transition` and its API and command."""
+
+    def setUp(self):
+        self.client_user = create_client()
+        self.orders = create_orders(self.client_user, create_properties(), 5)
+        self.pending = [order.pk for order in self.orders[:4]]
+        models.Order.objects.filter(pk__in=self.pending).update(
+            process=models.Order.ProcessStatusChoice.PENDING,
+        )
+
+    def get_processes(self) -> dict[str, str]:
+        """Get the process statuses of the orders by the code."""
+        return dict(models.Order.objects.values_list('pk', 'process'))
+
+    def test_orders_are_updated_in_chunks(self):
+        chunks = []
+        updated = apply_transition(
+            models.Order.objects.all(),
+            TRANSITIONS['to_assembly'],
+            chunk_size=3,
+            progress=chunks.append,
+        )
+
+        self.assertEqual(updated, 4)
+        self.assertEqual(chunks, [(1, 3, 3), (2, 1, 4)])
+        self.assertEqual(
+            set(self.get_processes().values()),
+            {models.Order.ProcessStatusChoice.IN_ASSEMBLY},
+        )
+
+    def test_other_states_are_skipped(self):
+        processes = self.get_processes()
+        updated = apply_transition(
+            models.Order.objects.all(), TRANSITIONS['complete'],
+        )
+
+        self.assertEqual(updated, 0)
+        self.assertEqual(self.get_processes(), processes)
+
+    def test_source_state_is_checked_by_update(self):
+        # The order leaves the source state after it is selected
+        transition = TRANSITIONS['to_assembly']
+        queryset = models.Order.objects.filter(
+            transition.source, pk__in=self.pending,
+        )
+        models.Order.objects.filter(pk=self.pending[0]).update(
+            process=models.Order.ProcessStatusChoice.IN_DELIVERY,
+        )
+
+        self.assertEqual(update_orders(queryset, **transition.values), 3)
+        self.assertEqual(
+            self.get_processes()[self.pending[0]],
+            models.Order.ProcessStatusChoice.IN_DELIVERY,
+        )
+
+    def test_view_counts_updated_orders(self):
+        admin = get_user_model().objects.create_superuser(
+            username='admin', password='password',
+        )
+        api = APIClient()
+        api.force_authenticate(admin)
+
+        response = api.post(reverse('order-transition'), {
+            'transition': 'to_assembly',
+            'codes': [self.pending[0], self.orders[4].pk],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.data, {'transition': 'to_assembly', 'updated': 1},
+        )
+
+    def test_command(self):
+        stdout = StringIO()
+        call_command(
+            'transition_orders', 'to_assembly', '--dry-run', stdout=stdout,
+        )
+        self.assertIn('4 orders would be updated.', stdout.getvalue())
+
+        stdout = StringIO()
+        call_command(
+            'transition_orders', 'to_assembly', '--chunk-size', '2',
+            stdout=stdout,
+        )
+        self.assertIn('Chunk 2: 2 updated, 4 in total.', stdout.getvalue())
+        self.assertIn('4 orders updated', stdout.getvalue())
+
+
+class OrderSyncPaginationTests(TestCase):
+    """`order.pagination.OrderSyncPagination` delta sync of the orders."""
+
+    def setUp(self):
+        self.client_user = create_client()
+        self.orders = create_orders(self.client_user, create_properties(), 3)
+        models.Order.objects.update(
+            modified=timezone.now() - timedelta(minutes=1),
+        )
+        self.api = api_client(self.client_user)
+
+    def sync(self, since: str = '', **params) -> dict:
+        """Get the orders changed after the `since` cursor."""
+        response = self.api.get(
+            reverse('order-list'), {'since': since, **params},
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def get_codes(self, data: dict) -> list[str]:
+        """Get the codes of the synced orders."""
+        return [order['code'] for order in data['results']]
+
+    def test_since_round_trip(self):
+        first = self.sync(page_size=2)
+        self.assertTrue(first['has_more'])
+        second = self.sync(first['cursor'], page_size=2)
+        self.assertFalse(second['has_more'])
+
+        self.assertEqual(
+            sorted(self.get_codes(first) + self.get_codes(second)),
+            sorted(order.code for order in self.orders),
+        )
+        self.assertEqual(self.get_codes(self.sync(second['cursor'])), [])
+
+    def test_recent_changes_wait_for_settle_window(self):
+        cursor = self.sync()['cursor']
+        self.orders[0].comment = 'changed'
+        self.orders[0].save()
+
+        self.assertEqual(self.get_codes(self.sync(cursor)), [])
+
+        later = timezone.now() + timedelta(seconds=5)
+        with mock.patch('order.pagination.timezone.now', return_value=later):
+            self.assertEqual(
+                self.get_codes(self.sync(cursor)), [self.orders[0].code],
+            )
+
+    @override_settings(ORDER_SYNC_SETTLE_SECONDS=0)
+    def test_admin_and_transition_updates_are_synced(self):
+        pending, assembled = self.orders[:2]
+        models.Order.objects.filter(pk=pending.pk).update(
+            process=models.Order.ProcessStatusChoice.PENDING,
+        )
+        cursor = self.sync()['cursor']
+
+        admin = get_user_model().objects.create_superuser(
+            username='admin', password='password',
+        )
+        self.client.force_login(admin)
+        response = self.client.post(
+            reverse('admin:order_order_changelist'), {
+                'action': 'update_order_to_in_assembly_status',
+                '_selected_action': [pending.pk],
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+
+        api = APIClient()
+        api.force_authenticate(admin)
+        response = api.post(reverse('order-transition'), {
+            'transition': 'to_delivery', 'codes': [assembled.pk],
+        }, format='json')
+        self.assertEqual(response.data['updated'], 1)
+
+        data = self.sync(cursor)
+        self.assertEqual(
+            self.get_codes(data), [pending.code, assembled.code],
+        )
+        self.assertEqual(
+            [order['process'] for order in data['results']],
+            [
+                models.Order.ProcessStatusChoice.IN_ASSEMBLY,
+                models.Order.ProcessStatusChoice.IN_DELIVERY,
+            ],
+        )
+
+
+class OrderReturnTests(TestCase):
+    """`order.returns` single and bulk returns."""
+
+    def setUp(self):
+        self.client_user = create_client()
+        self.orders = create_orders(self.client_user, create_properties(), 4)
+        delivered = models.Order.objects.filter(
+            pk__in=[order.pk for order in self.orders[:3]],
+        ).order_by('pk')
+        delivered.update(process=models.Order.ProcessStatusChoice.DELIVERED)
+        self.delivered = list(delivered)
+
+    def get_status(self, order: models.Order) -> str:
+        """Get the stored status of the order."""
+        return models.Order.objects.get(pk=order.pk).status
+
+    def test_order_is_returned_once(self):
+        order = self.delivered[0]
+        stale = models.Order.objects.get(pk=order.pk)
+
+        order_return = create_return(order)
+        self.assertEqual(order_return.order_id, order.pk)
+        self.assertEqual(
+            self.get_status(order), models.Order.StatusChoice.RETURNED,
+        )
+
+        # A concurrent request loaded the order before it was returned
+        with self.assertRaisesMessage(ValidationError, 'already returned'):
+            create_return(stale)
+        self.assertEqual(
+            models.OrderReturn.objects.filter(order=order).count(), 1,
+        )
+
+    def test_not_returnable_order_is_rejected(self):
+        order = self.orders[3]
+
+        with self.assertRaises(ValidationError):
+            create_return(order)
+        self.assertEqual(
+            self.get_status(order), models.Order.StatusChoice.IN_PROCESS,
+        )
+        self.assertFalse(models.OrderReturn.objects.exists())
+
+    def test_partial_bulk_return(self):
+        create_return(self.delivered[0])
+        legacy_code = generate_legacy_code()
+        models.Order.objects.filter(pk=self.delivered[1].pk).update(
+            legacy_code=legacy_code,
+        )
+        codes = [
+            self.delivered[0].code,
+            legacy_code,
+            self.delivered[2].code,
+            self.orders[3].code,
+            'missing',
+        ]
+
+        order_returns, skipped = create_returns(
+            models.Order.objects.all(), codes,
+        )
+
+        self.assertEqual(
+            [order_return.order_id for order_return in order_returns],
+            [self.delivered[1].pk, self.delivered[2].pk],
+        )
+        self.assertEqual(
+            skipped, [self.delivered[0].code, self.orders[3].code, 'missing'],
+        )
+        self.assertEqual(models.OrderReturn.objects.count(), 3)
+
+    def test_bulk_return_view(self):
+        api = api_client(self.client_user)
+        url = reverse('order-bulk-return')
+
+        response = api.post(url, {
+            'codes': [self.delivered[0].code, self.orders[3].code],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['returned'], 1)
+        self.assertEqual(response.data['skipped'], [self.orders[3].code])
+
+        response = api.post(url, {
+            'codes': [self.delivered[0].code],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['returned'], 0)
+
+
+class OrderArchiveTests(TestCase):
+    """`order.archive` moves of the finished orders."""
+
+    def setUp(self):
+        self.client_user = create_client()
+        self.orders = create_orders(self.client_user, create_properties(), 4)
+        completed, returned, recent, active = self.orders
+        update_orders(
+            models.Order.objects.filter(pk__in=[completed.pk, recent.pk]),
+            status=models.Order.StatusChoice.COMPLETED,
+        )
+        update_orders(
+            models.Order.objects.filter(pk=returned.pk),
+            status=models.Order.StatusChoice.RETURNED,
+        )
+        self.order_return = models.OrderReturn.objects.create(
+            order=returned, solution=models.OrderReturn.SolutionChoice.MONEY,
+        )
+        models.Order.objects.exclude(pk=recent.pk).update(
+            modified=timezone.now() - timedelta(days=100),
+        )
+        self.archived = sorted([completed.pk, returned.pk])
+
+    def test_finished_orders_are_moved(self):
+        batches = []
+        archived = archive_orders(batch_size=1, progress=batches.append)
+
+        self.assertEqual(archived, 2)
+        self.assertEqual(batches, [(1, 1, 1), (2, 1, 2)])
+        self.assertEqual(
+            sorted(models.ArchivedOrder.objects.values_list('pk', flat=True)),
+            self.archived,
+        )
+        self.assertEqual(
+            sorted(models.Order.objects.values_list('pk', flat=True)),
+            sorted([self.orders[2].pk, self.orders[3].pk]),
+        )
+        archived_return = models.ArchivedOrderReturn.objects.get()
+        self.assertEqual(archived_return.pk, self.order_return.pk)
+        self.assertEqual(archived_return.order_id, self.orders[1].pk)
+        self.assertFalse(models.OrderReturn.objects.exists())
+        # The archived orders stay counted
+        self.assertEqual(summarize_stats()['total'], 4)
+
+    def test_export_includes_archived_orders(self):
+        archive_orders()
+        api = api_client(self.client_user)
+
+        for params, expected in (
+            ({}, self.orders[2:]),
+            ({'include_archived': 'true'}, self.orders),
+        ):
+            response = api.get(reverse('order-export'), params)
+            content = b''.join(response.streaming_content).decode()
+            self.assertEqual(
+                sorted(json.loads(line)['code'] for line in (
+                    content.splitlines()
+                )),
+                sorted(order.code for order in expected),
+            )
+
+    def test_deleted_archived_order_is_uncounted(self):
+        archive_orders()
+        models.ArchivedOrder.objects.get(pk=self.archived[0]).delete()
+
+        self.assertEqual(summarize_stats()['total'], 3)
+        self.assertEqual(
+            summarize_stats()['status'][models.Order.StatusChoice.COMPLETED],
+            1,
+        )
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaStickinessTests(TestCase):
+    """`config.routers.choose_replica` after the client writes."""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def get(self, token: str):
+        """Get the order list request of the token."""
+        return self.factory.get(
+            reverse('order-list'),
+            HTTP_AUTHORIZATION='Bearer %s' % token,
+        )
+
+    def test_client_sticks_to_primary_after_write(self):
+        self.assertEqual(choose_replica(self.get('first')), 'replica')
+
+        stick_to_primary(self.factory.post(
+            reverse('order-list'),
+            HTTP_AUTHORIZATION='Bearer first',
+        ))
+
+        self.assertIsNone(choose_replica(self.get('first')))
+        self.assertEqual(choose_replica(self.get('second')), 'replica')
+
+    def test_write_requests_use_primary(self):
+        request = self.factory.post(
+            reverse('order-list'),
+            HTTP_AUTHORIZATION='Bearer first',
+        )
+
+        self.assertIsNone(choose_replica(request))
+
+
+@override_settings(DATABASE_SHARDS=['shard1', 'shard2'])
+class ShardRoutingTests(SimpleTestCase):
+    """`config.shards` client-hash routing."""
+
+    def test_jump_hash_moves_keys_to_new_bucket_only(self):
+        for key in range(1000):
+            before, after = jump_hash(key, 3), jump_hash(key, 4)
+            self.assertIn(before, range(3))
+            self.assertIn(after, (before, 3))
+
+    def test_client_is_mapped_to_one_shard(self):
+        shards = {shard_for_client(client_id) for client_id in range(100)}
+
+        self.assertEqual(shards, {'default', 'shard1', 'shard2'})
+        self.assertEqual(shard_for_client(7), shard_for_client(7))
+        self.assertEqual(shard_for_client(None), 'default')
+
+    @override_settings(DATABASE_SHARDS=[])
+    def test_without_shards_everything_is_default(self):
+        self.assertEqual(shard_for_client(7), 'default')
+        self.assertIsNone(ShardRouter().db_for_write(
+            models.Order, instance=models.Order(client_id=7),
+        ))
+
+    def test_router_routes_orders_to_client_shard(self):
+        router = ShardRouter()
+        for client_id in range(10):
+            shard = shard_for_client(client_id)
+            self.assertEqual(router.db_for_write(
+                models.Order, instance=models.Order(client_id=client_id),
+            ), shard)
+            # The related managers of the client pass it as the hint
+            self.assertEqual(router.db_for_read(
+                models.Order, instance=models.Client(pk=client_id),
+            ), shard)
+
+    def test_router_leaves_other_models(self):
+        self.assertIsNone(ShardRouter().db_for_write(
+            models.Client, instance=models.Client(pk=7),
+        ))
+        self.assertIsNone(ShardRouter().db_for_read(models.Color))
+
+
+@override_settings(REQUEST_TIMING_ENABLED=True, REQUEST_TIMING_SLOW_MS=10000)
+class RequestTimingMiddlewareTests(TestCase):
+    """`config.middleware.RequestTimingMiddleware` header and logs."""
+
+    def setUp(self):
+        self.api = api_client(create_client())
+
+    def test_timings_are_hidden_from_clients(self):
+        response = self.api.get(reverse('order-list'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Server-Timing', response)
+        self.assertIsNone(response.wsgi_request.timings.sql)
+
+    def test_staff_gets_timings(self):
+        staff = get_user_model().objects.create_user(
+            username='staff', password='password', is_staff=True,
+        )
+        token = Token.objects.create(user=staff)
+        api = APIClient()
+        api.credentials(HTTP_AUTHORIZATION='Bearer %s' % token.key)
+
+        response = api.get(reverse('order-properties'))
+
+        self.assertIn('queries;desc=', response['Server-Timing'])
+
+    @override_settings(DEBUG=True)
+    def test_debug_mode_gets_timings(self):
+        response = self.api.get(reverse('order-list'))
+
+        self.assertIn('total;dur=', response['Server-Timing'])
+
+    @override_settings(REQUEST_TIMING_SLOW_MS=0, REQUEST_TIMING_SLOW_SQL=True)
+    def test_slow_request_sql_is_logged(self):
+        with self.assertLogs('config.middleware', 'WARNING') as logs:
+            self.api.get(reverse('order-list'))
+
+        self.assertIn('"sql": [', logs.output[0])
+
+
+class OrderClaimTests(TestCase):
+    """`order.claims` leases of the orders to the workers."""
+
+    def setUp(self):
+        self.orders = create_orders(create_client(), create_properties(), 5)
+        self.queryset = models.Order.objects.all()
+        self.first = create_client('first')
+        self.second = create_client('second')
+
+    def claim(self, worker, limit: int = 3):
+        """Claim the orders in assembly for the worker."""
+        return claim_orders(
+            self.queryset, worker,
+            models.Order.ProcessStatusChoice.IN_ASSEMBLY, limit,
+        )
+
+    def test_claims_do_not_overlap(self):
+        first, second = self.claim(self.first), self.claim(self.second)
+
+        first_codes = {order.pk for order in first.orders}
+        second_codes = {order.pk for order in second.orders}
+        self.assertEqual(len(first_codes), 3)
+        self.assertEqual(len(second_codes), 2)
+        self.assertFalse(first_codes & second_codes)
+        self.assertEqual(
+            [order.pk for order in first.orders],
+            [order.pk for order in self.orders[:3]],
+        )
+        self.assertEqual(self.claim(self.first).orders, [])
+
+    def test_released_orders_are_claimed_again(self):
+        first = self.claim(self.first)
+        self.claim(self.second)
+
+        # Only the owner of the claim releases it
+        self.assertEqual(release_claim(
+            self.queryset, self.second, first.token,
+        ), 0)
+        self.assertEqual(release_claim(
+            self.queryset, self.first, first.token,
+        ), 3)
+        self.assertEqual(
+            [order.pk for order in self.claim(self.second).orders],
+            [order.pk for order in first.orders],
+        )
+
+    def test_expired_claim_is_claimed_by_another_worker(self):
+        first = self.claim(self.first, limit=5)
+        self.queryset.filter(claim_token=first.token).update(
+            claim_expires=timezone.now() - timedelta(seconds=1),
+        )
+
+        second = self.claim(self.second, limit=5)
+
+        self.assertEqual(len(second.orders), 5)
+        self.assertEqual(
+            extend_claim(self.queryset, self.first, first.token)[0], 0,
+        )
+        self.assertEqual(finish_claim(
+            self.queryset, self.first, first.token,
+        ), 0)
+
+    def test_finished_orders_move_to_next_stage(self):
+        first = self.claim(self.first)
+
+        self.assertEqual(finish_claim(
+            self.queryset, self.first, first.token,
+        ), 3)
+        for order in first.orders:
+            order.refresh_from_db()
+            self.assertEqual(
+                order.process, models.Order.ProcessStatusChoice.IN_DELIVERY,
+            )
+            self.assertIsNone(order.claim_token)
+
+
+class MetricsRegistryTests(TestCase):
+    """`utils.metrics.MetricsRegistry` snapshots of the processes."""
+
+    def setUp(self):
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        self.metrics = MetricsRegistry(self.directory)
+
+    def write_snapshot(self, pid: int, requests: int):
+        """Write the snapshot of the process with the given pid."""
+        other = MetricsRegistry(self.directory)
+        other.inc('requests_total', requests, view='list')
+        other.observe('duration_seconds', 0.2, view='list')
+        path = self.directory / ('metrics-%d-1.json' % pid)
+        path.write_text(json.dumps(other.snapshot()))
+        return path
+
+    def test_finished_process_snapshots_are_taken_over(self):
+        process = subprocess.Popen([sys.executable, '-c', ''])
+        process.wait()
+        dead = self.write_snapshot(process.pid, 3)
+        self.metrics.inc('requests_total', 1, view='list')
+
+        for _ in range(2):
+            counters, histograms = self.metrics.collect()
+            self.assertEqual(counters[
+                ('requests_total', (('view', 'list'),))
+            ], 4)
+            self.assertEqual(histograms[
+                ('duration_seconds', (('view', 'list'),))
+            ][-1], 0.2)
+
+        self.assertFalse(dead.exists())
+        self.assertEqual(len(list(self.directory.iterdir())), 1)
+
+    def test_running_process_snapshots_are_kept(self):
+        alive = self.write_snapshot(1, 3)
+
+        counters, _histograms = self.metrics.collect()
+
+        self.assertEqual(counters[('requests_total', (('view', 'list'),))], 3)
+        self.assertTrue(alive.exists())
+
+
+class MetricsMiddlewareTests(VersionStampsMixin, TestCase):
+    """`config.middleware.MetricsMiddleware` request metrics."""
+
+    def get_latency_labels(self) -> set:
+        """Get the label sets of the order list latency histogram."""
+        return {
+            tuple(map(tuple, labels))
+            for name, labels, _values in metrics.snapshot()['histograms']
+            if name == 'crm_request_duration_seconds'
+            and ('view', 'order-list') in labels
+        }
+
+    def test_latency_is_labeled_by_method(self):
+        api = api_client(create_client())
+        color, size, form = create_properties()
+
+        api.get(reverse('order-list'))
+        api.post(reverse('order-list'), {
+            'color': color.pk, 'size': size.pk, 'form': form.pk,
+        })
+
+        self.assertLessEqual({
+            (('method', 'GET'), ('view', 'order-list')),
+            (('method', 'POST'), ('view', 'order-list')),
+        }, self.get_latency_labels())
+
+
+@override_settings(ORDER_EVENTS_HEARTBEAT=0.01, ORDER_EVENTS_MAX_AGE=0.2)
+class AsyncOrderEventsStreamTests(SimpleTestCase):
+    """`order.async_views.AsyncOrderEventsView` stream of the bus events."""
+
+    def setUp(self):
+        self.bus = OrderEventBus(buffer_size=2, max_clients=1)
+        patcher = mock.patch('order.async_views.order_events', self.bus)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def read(self, client_id: int, last_id: int) -> list[str]:
+        """Read the stream until it is closed."""
+        async def read():
+            return [
+                chunk async for chunk
+                in AsyncOrderEventsView().stream(client_id, last_id)
+            ]
+        return async_to_sync(read)()
+
+    def test_evicted_client_gets_single_resync(self):
+        self.bus.publish(1, {'code': 'first'})
+        # Evicts the first client events
+        self.bus.publish(2, {'code': 'second'})
+
+        chunks = self.read(1, 0)
+
+        self.assertEqual(chunks.count('event: resync\ndata: {}\n\n'), 1)
+        self.assertIn(': ping\n\n', chunks)
+
+    def test_resumes_after_last_event(self):
+        self.bus.publish(1, {'code': 'first'})
+        last_id = self.bus.last_event_id()
+        self.bus.publish(1, {'code': 'second'})
+
+        chunks = self.read(1, last_id)
+
+        self.assertNotIn('event: resync\ndata: {}\n\n', chunks)
+        self.assertEqual(
+            [chunk for chunk in chunks if 'event: order' in chunk],
+            ['id: %d\nevent: order\ndata: {"code": "second"}\n\n' % (
+                self.bus.last_event_id()
+            )],
+        )
+
+
+@override_settings(ORDER_EVENTS_MAX_AGE=0)
+class AsyncOrderEventsAuthenticationTests(VersionStampsMixin, TestCase):
+    """`order.async_views.AsyncOrderEventsView` token of `EventSource`."""
+
+    def setUp(self):
+        super().setUp()
+        self.token = Token.objects.create(user=create_client())
+        self.url = reverse('async-order-events')
+
+    def test_token_query_param(self):
+        response = self.client.get(self.url, {'token': self.token.key})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        async def read():
+            return [chunk async for chunk in response.streaming_content]
+        self.assertEqual(async_to_sync(read)(), [b'retry: 3000\n\n'])
+
+    def test_invalid_token_query_param(self):
+        for params in ({}, {'token': ''}, {'token': 'invalid'}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 401)
+
+    def test_other_views_ignore_token_query_param(self):
+        response = self.client.get(
+            reverse('async-order-list'), {'token': self.token.key},
+        )
+
+        self.assertEqual(response.status_code, 401)
+
+
+class QueryPlansTests(TransactionTestCase):
+    """`order.queryplans` hot paths against the committed baseline.
+
+    The paths are not wrapped in the test transaction, so their savepoints
+    are counted the same way as by `check_query_plans`.
+    """
+
+    def test_query_plans_match_baseline(self):
+        # The same data as `check_query_plans` is run with
+        call_command(
+            'seed_orders', clients=20, orders=2000, seed=1, stdout=StringIO(),
+        )
+        if connection.vendor in ('sqlite', 'postgresql'):
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        assert_query_plans()
+
+
+class FindScansTests(SimpleTestCase):
+    """`order.queryplans.find_scans` of the SQLite plans."""
+
+    def test_sqlite_scans(self):
+        self.assertEqual(find_scans('sqlite', [
+            'SCAN order_order',
+            'SCAN TABLE order_color AS c',
+            'SCAN order_size USING INDEX order_size_name',
+            'SCAN order_form USING COVERING INDEX order_form_name',
+        ]), {
+            'order_order',
+            'order_color',
+            'order_size using index',
+            'order_form using covering index',
+        })
+
+    def test_sqlite_searches_are_not_scans(self):
+        self.assertEqual(find_scans('sqlite', [
+            'SEARCH order_order USING INDEX order_client_created_idx '
+            '(client_id=?)',
+            'SCAN sqlite_stat1',
+            'SCAN o VIRTUAL TABLE INDEX 0:M1',
+        ]), set())
+
+
+class OrderSearchIndexTests(TransactionTestCase):
+    """`order.search.ORDER_SEARCH_INDEX` triggers and table rebuilds.
+
+    Not wrapped in a transaction, the SQLite schema editor can not be used
+    inside one.
+    """
+
+    def setUp(self):
+        self.client_user = create_client()
+        self.properties = create_properties()
+        color, size, form = self.properties
+        self.order = models.Order.objects.create(
+            client=self.client_user, color=color, size=size, form=form,
+            comment='fragile glass',
+        )
+
+    def find(self, query: str) -> list[str]:
+        """Get the codes of the orders found with the index."""
+        found = ranked_search(
+            models.Order.objects.all(), ORDER_SEARCH_INDEX, query, limit=10,
+        )
+        self.assertIsNotNone(found, 'The index is not used.')
+        return [order.code for order in found]
+
+    def test_writes_are_indexed(self):
+        self.assertEqual(self.find('fragile'), [self.order.code])
+
+        self.order.comment = 'heavy box'
+        self.order.save()
+        self.assertEqual(self.find('fragile'), [])
+        self.assertEqual(self.find('heavy'), [self.order.code])
+
+        # The orders are indexed with the client address
+        self.client_user.address = 'Privet Drive 4'
+        self.client_user.save()
+        self.assertEqual(self.find('privet'), [self.order.code])
+
+        self.order.delete()
+        self.assertEqual(self.find('heavy'), [])
+
+    def test_order_table_rebuild(self):
+        # Changing the column type rebuilds the table in SQLite
+        migration = migrations.Migration('rebuild_order', 'order')
+        migration.operations = without_search_indexes(
+            migrations.AlterField(
+                model_name='order',
+                name='status',
+                field=CharField(max_length=20, default='in_process'),
+            ),
+        )
+        state = MigrationLoader(connection).project_state()
+        with connection.schema_editor() as schema_editor:
+            migration.apply(state.clone(), schema_editor)
+        try:
+            self.assertEqual(self.find('fragile'), [self.order.code])
+
+            self.client_user.address = 'Privet Drive 4'
+            self.client_user.save()
+            order = create_orders(self.client_user, self.properties, 1)[0]
+            self.assertEqual(
+                sorted(self.find('privet')),
+                sorted([self.order.code, order.code]),
+            )
+        finally:
+            with connection.schema_editor() as schema_editor:
+                migration.unapply(state.clone(), schema_editor)
+
+        self.assertEqual(self.find('fragile'), [self.order.code])
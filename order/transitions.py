@@ -0,0 +1,142 @@
+from typing import Any, Callable, NamedTuple, Optional
+
+from django.db.models import Q, QuerySet
+from django.utils.translation import gettext_lazy as _
+
+from order.models import Order
+from order.stats import update_orders
+
+DEFAULT_CHUNK_SIZE = 500
+
+# The order leaves the stage it was claimed for
+RELEASED_CLAIM = {
+    'claimed_by': None,
+    'claim_token': None,
+    'claim_expires': None,
+}
+
+
+class Transition(NamedTuple):
+    """Order state transition.
+
+    Attributes:
+        name: transition name used by the API and the commands.
+        description: human readable description.
+        source: condition of the orders the transition is allowed for.
+        values: new field values of the orders, the transitions release
+            the worker claims too, check `order.claims`.
+        permission: `order` app permission codename required to apply it.
+    """
+
+    name: str
+    description: Any
+    source: Q
+    values: dict[str, Any]
+    permission: str
+
+
+class TransitionProgress(NamedTuple):
+    """Progress of `apply_transition` reported after every chunk."""
+
+    chunk: int
+    updated: int
+    total: int
+
+
+TRANSITIONS = {
+    transition.name: transition
+    for transition in [
+        Transition(
+            name='to_assembly',
+            description=_('Set process status to `in assembly`'),
+            source=Q(
+                status=Order.StatusChoice.IN_PROCESS,
+                process=Order.ProcessStatusChoice.PENDING,
+            ),
+            values={
+                'process': Order.ProcessStatusChoice.IN_ASSEMBLY,
+                **RELEASED_CLAIM,
+            },
+            permission='change_order',
+        ),
+        Transition(
+            name='to_delivery',
+            description=_('Set process status to `in delivery`'),
+            source=Q(
+                status=Order.StatusChoice.IN_PROCESS,
+                process=Order.ProcessStatusChoice.IN_ASSEMBLY,
+            ),
+            values={
+                'process': Order.ProcessStatusChoice.IN_DELIVERY,
+                **RELEASED_CLAIM,
+            },
+            permission='manage_in_assembly_only',
+        ),
+        Transition(
+            name='complete',
+            description=_('Set process status to `delivered`'),
+            source=Q(
+                status=Order.StatusChoice.IN_PROCESS,
+                process=Order.ProcessStatusChoice.IN_DELIVERY,
+            ),
+            values={
+                'status': Order.StatusChoice.COMPLETED,
+                'process': Order.ProcessStatusChoice.DELIVERED,
+                **RELEASED_CLAIM,
+            },
+            permission='manage_in_delivery_only',
+        ),
+    ]
+}
+
+
+def apply_transition(
+    queryset: QuerySet,
+    transition: Transition,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    progress: Optional[Callable[[TransitionProgress], Any]] = None,
+) -> int:
+    """Apply the transition to the orders of the queryset.
+
+    The orders are walked in the primary key order in chunks of
+    `chunk_size`, every chunk is updated in its own short transaction (check
+    `order.stats.update_orders`), so a large selection never holds the write
+    lock for long. The transition `source` condition is a part of the
+    `UPDATE` filter, the orders in other states are skipped.
+
+    Args:
+        queryset: orders to apply the transition to.
+        transition: the transition.
+        chunk_size: number of the orders per transaction.
+        progress: function called after every chunk.
+
+    Returns:
+        The number of the updated orders.
+    """
+    candidates = queryset.filter(transition.source).order_by('pk')
+    total = 0
+    chunk = 0
+    last_pk = None
+
+    while True:
+        chunk_queryset = candidates
+        if last_pk is not None:
+            chunk_queryset = chunk_queryset.filter(pk__gt=last_pk)
+        pks = list(chunk_queryset.values_list('pk', flat=True)[:chunk_size])
+        if not pks:
+            break
+
+        last_pk = pks[-1]
+        chunk += 1
+        updated = update_orders(
+            Order.objects.using(queryset.db).filter(
+                transition.source,
+                pk__in=pks,
+            ),
+            **transition.values,
+        )
+        total += updated
+        if progress is not None:
+            progress(TransitionProgress(chunk, updated, total))
+
+    return total
@@ -1,7 +1,7 @@
 from django.urls import include, path, re_path
 from rest_framework.routers import SimpleRouter
 
-from order import views
+from order import async_views, views
 
 router = SimpleRouter()
 router.register('', views.OrderViewSet)
@@ -10,7 +10,73 @@ router.register('', views.OrderViewSet)
 urlpatterns = [
     re_path(r'^service/', views.service,),
     path('auth/login/', views.LoginUser.as_view(), name='login-user'),
-    path('auth/personal/', views.ClientPersonalView.as_view()),
-    path('orders/properties/', views.OrderPropertiesView.as_view()),
+    path(
+        'auth/personal/',
+        views.ClientPersonalView.as_view(),
+        name='client-personal',
+    ),
+    path(
+        'orders/properties/',
+        views.OrderPropertiesView.as_view(),
+        name='order-properties',
+    ),
+    path(
+        'orders/stats/',
+        views.OrderStatsView.as_view(),
+        name='order-stats',
+    ),
+    path(
+        'orders/transition/',
+        views.OrderTransitionView.as_view(),
+        name='order-transition',
+    ),
+    path(
+        'orders/claims/',
+        views.OrderClaimView.as_view(),
+        name='order-claims',
+    ),
+    path(
+        'orders/claims/<uuid:token>/heartbeat/',
+        views.OrderClaimActionView.as_view(action='heartbeat'),
+        name='order-claim-heartbeat',
+    ),
+    path(
+        'orders/claims/<uuid:token>/release/',
+        views.OrderClaimActionView.as_view(action='release'),
+        name='order-claim-release',
+    ),
+    path(
+        'orders/claims/<uuid:token>/finish/',
+        views.OrderClaimActionView.as_view(action='finish'),
+        name='order-claim-finish',
+    ),
     path('orders/', include(router.urls)),
+    path('search/', views.SearchView.as_view(), name='search'),
+
+    # Native async versions of the order endpoints for the ASGI server
+    path(
+        'async/orders/properties/',
+        async_views.AsyncOrderPropertiesView.as_view(),
+        name='async-order-properties',
+    ),
+    path(
+        'async/orders/events/',
+        async_views.AsyncOrderEventsView.as_view(),
+        name='async-order-events',
+    ),
+    path(
+        'async/orders/',
+        async_views.AsyncOrderListView.as_view(),
+        name='async-order-list',
+    ),
+    path(
+        'async/orders/<str:pk>/',
+        async_views.AsyncOrderDetailView.as_view(),
+        name='async-order-detail',
+    ),
+    path(
+        'async/orders/<str:pk>/return/',
+        async_views.AsyncOrderReturnView.as_view(),
+        name='async-order-return',
+    ),
 ]
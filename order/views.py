@@ -1,26 +1,95 @@
+from collections import Counter
 from typing import Union
 
 from django.contrib.auth import authenticate
-from django.http import QueryDict
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
 from django.db.models.query import QuerySet
-from django.shortcuts import render
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseNotModified,
+    QueryDict,
+)
+from django.shortcuts import get_object_or_404, render
+from django.utils.dateparse import parse_date
+from django.utils.http import parse_etags
 from django.utils.translation import gettext_lazy as _
-
 from rest_framework import mixins, permissions, status
 from rest_framework.authtoken.models import Token
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import GenericViewSet
 
+from config.metrics import metrics
+from config.shards import client_queryset, scatter_queryset
 from order import models, serializers
+from order.archive import include_archived
+from order.claims import (
+    CLAIM_STAGES,
+    claim_orders,
+    extend_claim,
+    finish_claim,
+    release_claim,
+)
+from order.export import export_response, filter_orders
+from order.pagination import (
+    OrderCursorPagination,
+    OrderSyncPagination,
+    SearchPagination,
+)
 from order.permissions import ClientOnlyPermission, UpdateDeliveredOrderOnly
+from order.properties import order_properties
+from order.returns import create_return, create_returns
+from order.search import (
+    CLIENT_SEARCH_FIELDS,
+    CLIENT_SEARCH_INDEX,
+    ORDER_SEARCH_FIELDS,
+    ORDER_SEARCH_INDEX,
+    search,
+    search_shards,
+)
+from order.sharding import bulk_create_orders
+from order.standard import standard_orders
+from order.stats import summarize_stats
+from order.transitions import TRANSITIONS, apply_transition
+from utils.code import is_legacy_code
 
 
 def service(request):
     return render(request, 'index.html')
 
 
+def render_properties() -> bytes:
+    """Serialize all the order properties to JSON."""
+    return JSONRenderer().render({
+        model._meta.model_name: serializers.OrderPropertySerializer(
+            model.objects.all(),
+            many=True,
+        ).data
+        for model in [models.Color, models.Size, models.Form]
+    })
+
+
+def properties_response(request, etag: str, content: bytes) -> HttpResponse:
+    """Get the rendered properties response or `304` if the ETag matches."""
+    if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+
+    if etag in if_none_match or '*' in if_none_match:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(
+            content,
+            content_type='application/json',
+        )
+
+    response['ETag'] = etag
+    return response
+
+
 class LoginUser(APIView):
     """Login user view.
 
@@ -71,19 +140,216 @@ class ClientPersonalView(APIView):
 
 
 class OrderPropertiesView(APIView):
-    serializers_class = serializers.OrderPropertySerializer
+    """Order properties view.
+
+    The rendered JSON is cached until any property changes and is served
+    with a strong `ETag`, so a matching `If-None-Match` request gets `304`
+    without touching the database.
+    """
+
     permission_classes = (permissions.AllowAny,)
 
     def get(self, request, **kwargs):
+        etag, content = order_properties.get(render_properties)
+        return properties_response(request, etag, content)
+
+
+class OrderStatsView(APIView):
+    """Order statistics view for the managers.
+
+    Served from the `OrderStats` buckets of all the shards, so the response
+    time depends on the number of the days, not the orders. The `day_from`
+    and `day_to` query params limit the creation days (inclusive).
+    """
+
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request, **kwargs):
+        queryset = models.OrderStats.objects.all()
+
+        errors = {}
+        for param, lookup in (
+            ('day_from', 'day__gte'),
+            ('day_to', 'day__lte'),
+        ):
+            if not request.query_params.get(param):
+                continue
+            try:
+                day = parse_date(request.query_params[param])
+            except ValueError:
+                day = None
+            if day is None:
+                errors[param] = [
+                    _('Expected a date in the YYYY-MM-DD format.'),
+                ]
+                continue
+            queryset = queryset.filter(**{lookup: day})
+
+        if errors:
+            raise ValidationError(errors)
+
+        return Response(summarize_stats(queryset))
+
+
+class OrderTransitionView(APIView):
+    """Order state transition view for the managers.
+
+    Applies the transition to the orders with the given codes (or legacy
+    codes) in every shard, the orders in the states the transition is not
+    allowed from are skipped. Check `order.transitions`.
+    """
+
+    serializer_class = serializers.OrderTransitionSerializer
+    permission_classes = (permissions.IsAdminUser,)
+
+    def post(self, request, **kwargs):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        transition = TRANSITIONS[serializer.validated_data['transition']]
+        if not request.user.has_perm('order.%s' % transition.permission):
+            self.permission_denied(
+                request,
+                message=_('The transition is not allowed for the user.'),
+            )
+
+        codes = serializer.validated_data['codes']
+        updated = sum(scatter_queryset(
+            models.Order.objects.filter(
+                Q(code__in=codes) | Q(legacy_code__in=codes),
+            ),
+            lambda queryset: apply_transition(queryset, transition),
+        ))
         return Response({
-            model._meta.model_name: self.serializers_class(
-                model.objects.all(),
-                many=True,
-            ).data
-            for model in [models.Color, models.Size, models.Form]
+            'transition': transition.name,
+            'updated': updated,
         })
 
 
+class OrderClaimView(APIView):
+    """Work queue view for the pickers and the couriers.
+
+    Claims up to `limit` oldest orders of the `process` stage for the user,
+    the orders are leased to the user for `lease` seconds
+    (`ORDER_CLAIM_LEASE_SECONDS` by default). The concurrent claims never
+    get the same orders and do not wait for each other, check
+    `order.claims`. The claim token is used with `OrderClaimActionView`.
+    """
+
+    serializer_class = serializers.OrderClaimSerializer
+    permission_classes = (permissions.IsAdminUser,)
+
+    def post(self, request, **kwargs):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        process = serializer.validated_data['process']
+        transition = CLAIM_STAGES[process]
+        if not request.user.has_perm('order.%s' % transition.permission):
+            self.permission_denied(
+                request,
+                message=_('The stage is not allowed for the user.'),
+            )
+
+        claim = claim_orders(
+            models.Order.objects.all(),
+            request.user,
+            process,
+            limit=serializer.validated_data['limit'],
+            lease=serializer.validated_data.get('lease'),
+        )
+        return Response({
+            'token': claim.token,
+            'expires': claim.expires,
+            'orders': serializers.OrderSerializer(
+                claim.orders,
+                many=True,
+            ).data,
+        }, status=(
+            status.HTTP_201_CREATED if claim.orders
+            else status.HTTP_200_OK
+        ))
+
+
+class OrderClaimActionView(APIView):
+    """Worker claim actions, check `OrderClaimView`.
+
+    The `heartbeat` action extends the claim lease, the `release` action
+    gives the orders back to the queue and the `finish` action moves them
+    to the next stage. The `codes` limit the released and the finished
+    orders. An expired claim can not be changed.
+    """
+
+    serializer_class = serializers.OrderClaimActionSerializer
+    permission_classes = (permissions.IsAdminUser,)
+    action = 'heartbeat'
+
+    def post(self, request, token, **kwargs):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        queryset = models.Order.objects.all()
+        codes = serializer.validated_data.get('codes')
+        if self.action == 'heartbeat':
+            count, expires = extend_claim(
+                queryset, request.user, token,
+                lease=serializer.validated_data.get('lease'),
+            )
+            data = {'token': token, 'expires': expires, 'extended': count}
+        elif self.action == 'release':
+            count = release_claim(queryset, request.user, token, codes)
+            data = {'token': token, 'released': count}
+        else:
+            count = finish_claim(queryset, request.user, token, codes)
+            data = {'token': token, 'finished': count}
+
+        if not count:
+            raise NotFound(_('The claim is expired or has no such orders.'))
+        return Response(data)
+
+
+class SearchView(APIView):
+    """Order and client search view for the managers.
+
+    All the `q` query terms should match, the orders are matched by the
+    code, the comment and the client address, the clients by the names, the
+    email and the address. The results are ranked by the trigram search
+    indexes, check `order.search`, and paged with `SearchPagination`. The
+    archived orders are not searched.
+    """
+
+    serializer_class = serializers.SearchQuerySerializer
+    pagination_class = SearchPagination
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request, **kwargs):
+        serializer = self.serializer_class(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+
+        if serializer.validated_data['type'] == 'clients':
+            queryset = models.Client.objects.all()
+            index, fields = CLIENT_SEARCH_INDEX, CLIENT_SEARCH_FIELDS
+            search_func = search
+            result_serializer_class = serializers.ClientPersonalSerializer
+        else:
+            queryset = models.Order.objects.all()
+            index, fields = ORDER_SEARCH_INDEX, ORDER_SEARCH_FIELDS
+            search_func = search_shards
+            result_serializer_class = serializers.OrderSerializer
+
+        paginator = self.pagination_class()
+        paginator.prepare(request)
+        page = paginator.set_page(search_func(
+            queryset, index, fields,
+            serializer.validated_data['q'],
+            limit=paginator.limit,
+            offset=paginator.offset,
+        ))
+        return paginator.get_paginated_response(
+            result_serializer_class(page, many=True).data,
+        )
+
+
 class OrderViewSet(
     mixins.ListModelMixin,
     mixins.CreateModelMixin,
@@ -92,11 +358,20 @@ class OrderViewSet(
 ):
     """Viewset for the client to manage orders.
 
-    Allows `list`, `create` and `retrieve` actions.
+    Allows `list`, `create`, `bulk_create`, `export`, `retrieve`,
+    `return_order` and `bulk_return` actions.
+    The `list` action is paginated with the keyset cursor if the `cursor` or
+    `page_size` query parameter is passed, the `since` query parameter lists
+    only the orders changed after the cursor. The `include_archived` query
+    parameter adds the archived orders to the `list`, `retrieve`, `export`
+    and return actions, check `order.archive`.
     """
 
     queryset = models.Order.objects.all()
     serializer_class = serializers.OrderSerializer
+    pagination_class = OrderCursorPagination
+    sync_pagination_class = OrderSyncPagination
+    bulk_max_size = 1000
     permission_classes = (
         permissions.IsAuthenticated,
         ClientOnlyPermission,
@@ -107,12 +382,68 @@ class OrderViewSet(
         """Get authenticated user orders.
 
         Returns empty orders list if the request is missing, otherwise - user
-        related orders.
+        related orders from the shard of the user.
         """
         if not self.request:
             return models.Order.objects.none()
 
-        return super().get_queryset().filter(client=self.request.user)
+        return client_queryset(
+            super().get_queryset(),
+            self.request.user.pk,
+        ).filter(client=self.request.user)
+
+    def get_archived_queryset(self) -> QuerySet:
+        """Get authenticated user archived orders."""
+        return client_queryset(
+            models.ArchivedOrder.objects.all(),
+            self.request.user.pk,
+        ).filter(client=self.request.user)
+
+    def list(self, request, *args, **kwargs):
+        """Extends default `list` behavior with the delta sync mode.
+
+        The `since` query param switches the pagination to
+        `OrderSyncPagination`, which returns only the changed orders.
+        """
+        if self.sync_pagination_class.cursor_query_param in (
+            request.query_params
+        ):
+            self.pagination_class = self.sync_pagination_class
+        if not include_archived(request):
+            return super().list(request, *args, **kwargs)
+
+        querysets = [self.get_queryset(), self.get_archived_queryset()]
+        page = self.paginator.paginate_querysets(querysets, request)
+        if page is not None:
+            return self.get_paginated_response(
+                self.get_serializer(page, many=True).data,
+            )
+
+        orders = [order for queryset in querysets for order in queryset]
+        return Response(self.get_serializer(orders, many=True).data)
+
+    def get_object(self) -> Union[models.Order, models.ArchivedOrder]:
+        """Get the order by its code or by the legacy random hex code.
+
+        Looks for the archived order too if it is asked for.
+        """
+        if is_legacy_code(self.kwargs.get(self.lookup_field, '')):
+            self.lookup_field = 'legacy_code'
+            self.lookup_url_kwarg = 'pk'
+
+        try:
+            return super().get_object()
+        except Http404:
+            if not include_archived(self.request):
+                raise
+
+        order = get_object_or_404(self.get_archived_queryset(), **{
+            self.lookup_field: self.kwargs[
+                self.lookup_url_kwarg or self.lookup_field
+            ],
+        })
+        self.check_object_permissions(self.request, order)
+        return order
 
     def create(self, request, *args, **kwargs):
         """Extends default `create` behavior.
@@ -124,17 +455,127 @@ class OrderViewSet(
             request.data._mutable = True
 
         # Set process to pending if the order is not standard
-        if not models.StandardOrder.objects.filter(
-            **{
-                prop: request.data.get(prop)
-                for prop in ['color', 'size', 'form']
-            },
-        ).exists():
+        if not standard_orders.is_standard(
+            *(request.data.get(prop) for prop in ['color', 'size', 'form']),
+        ):
             request.data['process'] = models.Order.ProcessStatusChoice.PENDING
 
         request.data['client'] = request.user.pk
 
-        return super().create(request, *args, **kwargs)
+        response = super().create(request, *args, **kwargs)
+        metrics.inc(
+            'crm_orders_created_total',
+            process=response.data['process'],
+        )
+        return response
+
+    @action(
+        methods=['POST'], detail=False,
+        url_path='bulk', url_name='bulk',
+    )
+    def bulk_create(self, request, **kwargs):
+        """Create a list of orders at once.
+
+        Valid items are inserted with a single `bulk_create` in one
+        transaction of the user shard, invalid ones are skipped. The
+        response contains the created order or the validation errors for
+        each item in the request order.
+        """
+        # pylint: disable=unused-argument
+        if not isinstance(request.data, list):
+            return Response({
+                'details': _('Expected a list of orders.'),
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if len(request.data) > self.bulk_max_size:
+            return Response({
+                'details': _(
+                    'Expected at most %(size)d orders per request.',
+                ) % {'size': self.bulk_max_size},
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        properties = {
+            model._meta.model_name: set(
+                model.objects.values_list('pk', flat=True),
+            )
+            for model in [models.Color, models.Size, models.Form]
+        }
+        standard = standard_orders.get_triples()
+
+        results = []
+        orders = []
+        for item in request.data:
+            serializer = serializers.BulkOrderItemSerializer(
+                data=item,
+                context={'properties': properties},
+            )
+            if not serializer.is_valid():
+                results.append({'errors': serializer.errors})
+                continue
+
+            triple = (
+                serializer.validated_data['color'],
+                serializer.validated_data['size'],
+                serializer.validated_data['form'],
+            )
+            order = models.Order(
+                client_id=request.user.pk,
+                color_id=triple[0],
+                size_id=triple[1],
+                form_id=triple[2],
+                process=(
+                    models.Order.ProcessStatusChoice.IN_ASSEMBLY
+                    if triple in standard
+                    else models.Order.ProcessStatusChoice.PENDING
+                ),
+            )
+            orders.append(order)
+            results.append(order)
+
+        bulk_create_orders(orders)
+
+        created = Counter(order.process for order in orders)
+        for process, count in created.items():
+            metrics.inc('crm_orders_created_total', count, process=process)
+
+        return Response({
+            'created': len(orders),
+            'results': [
+                self.get_serializer(result).data
+                if isinstance(result, models.Order) else result
+                for result in results
+            ],
+        }, status=(
+            status.HTTP_201_CREATED if orders
+            else status.HTTP_400_BAD_REQUEST
+        ))
+
+    @action(
+        methods=['GET'], detail=False,
+        url_path='export', url_name='export',
+    )
+    def export(self, request, **kwargs):
+        """Stream the user orders as NDJSON or CSV.
+
+        The `output` query param selects the format (`ndjson` by default or
+        `csv`), check `order.export.filter_orders` for the filters. The
+        archived orders follow the active ones if they are asked for.
+        """
+        # pylint: disable=unused-argument
+        querysets = [self.get_queryset()]
+        if include_archived(request):
+            querysets.append(self.get_archived_queryset())
+
+        try:
+            return export_response(
+                *(
+                    filter_orders(queryset, request.query_params)
+                    for queryset in querysets
+                ),
+                output=request.query_params.get('output', 'ndjson'),
+            )
+        except DjangoValidationError as error:
+            raise ValidationError(error.message_dict) from error
 
     @action(
         methods=['POST'], detail=True,
@@ -144,20 +585,45 @@ class OrderViewSet(
         """Apply a request to return the order."""
         # pylint: disable=unused-argument
         order: models.Order = self.get_object()
-
-        # Change order status to returned
-        order.status = models.Order.StatusChoice.RETURNED
-        order.save()
-
-        # Create related `OrderReturn` instance
-        serializer = serializers.OrderReturnSerializer(
-            data={'order': order.pk},
-        )
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
+        serializer = serializers.OrderReturnSerializer(create_return(order))
 
         return Response(
             serializer.data,
             status=status.HTTP_201_CREATED,
             headers=self.get_success_headers(serializer.data),
         )
+
+    @action(
+        methods=['POST'], detail=False,
+        url_path='bulk-return', url_name='bulk-return',
+    )
+    def bulk_return(self, request, **kwargs):
+        """Apply a request to return a list of orders at once.
+
+        The delivered orders with the given codes are returned in one
+        transaction, the response contains the created returns and the codes
+        of the orders that are not found or can not be returned.
+        """
+        # pylint: disable=unused-argument
+        serializer = serializers.OrderBulkReturnSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        order_returns, skipped = create_returns(
+            self.get_queryset(),
+            serializer.validated_data['codes'],
+            archived_queryset=(
+                self.get_archived_queryset()
+                if include_archived(request) else None
+            ),
+        )
+        return Response({
+            'returned': len(order_returns),
+            'results': serializers.OrderReturnSerializer(
+                order_returns,
+                many=True,
+            ).data,
+            'skipped': skipped,
+        }, status=(
+            status.HTTP_201_CREATED if order_returns
+            else status.HTTP_400_BAD_REQUEST
+        ))
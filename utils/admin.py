@@ -0,0 +1,337 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from typing import Any, Optional
+
+from django.conf import settings
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ChangeList
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from config.shards import is_sharded, scatter_shards, shard_querysets
+from utils.db import estimate_count
+from utils.search import SearchIndex, filter_search
+
+AFTER_VAR = 'after'
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that never counts the whole table.
+
+    The count is taken from the database stats for the unfiltered lists,
+    otherwise the rows are counted up to `count_limit`.
+
+    Attributes:
+        estimated: the count is taken from the database stats.
+        capped: the real count is greater than `count_limit`.
+    """
+
+    def __init__(self, *args, count_limit: int = 10000, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.count_limit = count_limit
+        self.estimated = False
+        self.capped = False
+
+    @cached_property
+    def count(self) -> int:
+        estimate = estimate_count(self.object_list)
+        if estimate is not None:
+            self.estimated = True
+            return estimate
+
+        count = self.object_list[:self.count_limit + 1].count()
+        self.capped = count > self.count_limit
+        return min(count, self.count_limit)
+
+
+def encode_keyset(values: tuple) -> str:
+    """Encode the keyset values of the last shown row as a cursor."""
+    data = [
+        value.isoformat() if hasattr(value, 'isoformat') else value
+        for value in values
+    ]
+    return urlsafe_b64encode(
+        json.dumps(data, separators=(',', ':')).encode(),
+    ).decode('ascii')
+
+
+class KeysetChangeList(ChangeList):
+    """Change list paged by the keyset of the admin `large_table_ordering`.
+
+    The next page is selected with the `after` cursor instead of `OFFSET`,
+    so every page costs the same. Only the next and the first page links
+    are available.
+    """
+
+    keyset_pagination = True
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(AFTER_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # Any other link starts from the first page
+        return super().get_query_string(
+            new_params,
+            [*(remove or ()), AFTER_VAR],
+        )
+
+    def get_results(self, request):
+        paginator = self.model_admin.get_paginator(
+            request, self.queryset, self.list_per_page,
+        )
+        ordering = self.model_admin.large_table_ordering
+        fields = [name.lstrip('-') for name in ordering]
+        queryset = self.queryset.order_by(*ordering)
+
+        after = request.GET.get(AFTER_VAR)
+        if after:
+            queryset = queryset.filter(
+                self.keyset_filter(ordering, self.decode_keyset(after)),
+            )
+
+        # The last shown row and the first row of the next page
+        boundary = list(queryset.values_list(*fields)[
+            max(self.list_per_page - 1, 0):self.list_per_page + 1
+        ])
+
+        self.result_count = paginator.count
+        self.result_count_estimated = paginator.estimated
+        self.result_count_capped = paginator.capped
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.full_result_count = None
+        self.result_list = queryset[:self.list_per_page]
+        self.can_show_all = False
+        self.multi_page = False
+        self.paginator = paginator
+
+        self.keyset_after = after
+        self.keyset_first_url = self.get_query_string()
+        self.keyset_next_url = None
+        if len(boundary) > 1:
+            self.keyset_next_url = self.get_query_string({
+                AFTER_VAR: encode_keyset(boundary[0]),
+            })
+
+    def decode_keyset(self, cursor: str) -> list[Any]:
+        """Get the keyset values from the cursor.
+
+        Raises:
+            IncorrectLookupParameters: if the cursor is malformed.
+        """
+        ordering = self.model_admin.large_table_ordering
+        try:
+            data = json.loads(urlsafe_b64decode(cursor.encode('ascii')))
+            if len(data) != len(ordering):
+                raise ValueError(cursor)
+
+            values = []
+            for name, value in zip(ordering, data):
+                name = name.lstrip('-')
+                field = (
+                    self.opts.pk if name == 'pk'
+                    else self.opts.get_field(name)
+                )
+                values.append(field.to_python(value))
+        except (
+            BinasciiError, TypeError, UnicodeError, ValueError,
+        ) as exc:
+            raise IncorrectLookupParameters(exc) from exc
+        return values
+
+    @staticmethod
+    def keyset_filter(ordering, values) -> Q:
+        """Get the condition of the rows following the keyset values."""
+        condition: Optional[Q] = None
+        equal: dict[str, Any] = {}
+        for name, value in zip(ordering, values):
+            field = name.lstrip('-')
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            step = Q(**equal, **{'%s__%s' % (field, lookup): value})
+            condition = step if condition is None else condition | step
+            equal[field] = value
+        return condition
+
+
+class ShardedChangeList(KeysetChangeList):
+    """Keyset change list of a model sharded across the databases.
+
+    Every shard selects its page after the cursor, the pages are merged by
+    the admin `large_table_ordering`, check `config.shards`. The count is
+    the sum of the shard counts.
+    """
+
+    def get_results(self, request):
+        ordering = self.model_admin.large_table_ordering
+        fields = [name.lstrip('-') for name in ordering]
+        queryset = self.queryset.order_by(*ordering)
+
+        after = request.GET.get(AFTER_VAR)
+        if after:
+            queryset = queryset.filter(
+                self.keyset_filter(ordering, self.decode_keyset(after)),
+            )
+
+        def select(alias: str) -> tuple[int, EstimatedCountPaginator, list]:
+            paginator = self.model_admin.get_paginator(
+                request, self.queryset.using(alias), self.list_per_page,
+            )
+            return paginator.count, paginator, list(
+                queryset.using(alias)[:self.list_per_page + 1],
+            )
+
+        shards = scatter_shards(select)
+        results = [obj for _count, _paginator, page in shards for obj in page]
+        for name in reversed(ordering):
+            results.sort(
+                key=lambda obj, field=name.lstrip('-'): getattr(obj, field),
+                reverse=name.startswith('-'),
+            )
+
+        paginators = [paginator for _count, paginator, _page in shards]
+        paginator = paginators[0]
+        self.result_count = sum(count for count, _paginator, _page in shards)
+        self.result_count_estimated = any(
+            paginator.estimated for paginator in paginators
+        )
+        self.result_count_capped = any(
+            paginator.capped for paginator in paginators
+        )
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.full_result_count = None
+        self.result_list = results[:self.list_per_page]
+        self.can_show_all = False
+        self.multi_page = False
+        self.paginator = paginator
+
+        self.keyset_after = after
+        self.keyset_first_url = self.get_query_string()
+        self.keyset_next_url = None
+        if len(results) > self.list_per_page:
+            last = results[self.list_per_page - 1]
+            self.keyset_next_url = self.get_query_string({
+                AFTER_VAR: encode_keyset(tuple(
+                    getattr(last, field) for field in fields
+                )),
+            })
+
+
+class LargeTableAdminMixin:
+    """Opt-in large-table mode of the model admin changelist.
+
+    Enabled by the `ADMIN_LARGE_TABLE_MODE` setting. The changelist is
+    ordered by `large_table_ordering` and paged with `KeysetChangeList`,
+    the counts are estimated by `EstimatedCountPaginator`, the columns are
+    not sortable and only `large_table_list_filter` filters are shown, so
+    every page takes a constant number of queries. The ordering and the
+    filters should be backed by the indexes.
+    """
+
+    large_table_ordering: tuple[str, ...] = ('-pk',)
+    large_table_list_filter: Optional[tuple] = None
+    large_table_count_limit = 10000
+
+    @property
+    def large_table_mode(self) -> bool:
+        return getattr(settings, 'ADMIN_LARGE_TABLE_MODE', False)
+
+    @property
+    def show_full_result_count(self) -> bool:
+        return not self.large_table_mode
+
+    def get_changelist(self, request, **kwargs):
+        if self.large_table_mode:
+            return KeysetChangeList
+        return super().get_changelist(request, **kwargs)
+
+    def get_paginator(self, request, queryset, per_page, *args, **kwargs):
+        if self.large_table_mode:
+            return EstimatedCountPaginator(
+                queryset,
+                per_page,
+                count_limit=self.large_table_count_limit,
+            )
+        return super().get_paginator(
+            request, queryset, per_page, *args, **kwargs,
+        )
+
+    def get_list_filter(self, request):
+        if self.large_table_mode and self.large_table_list_filter is not None:
+            return self.large_table_list_filter
+        return super().get_list_filter(request)
+
+    def get_sortable_by(self, request):
+        if self.large_table_mode:
+            return ()
+        return super().get_sortable_by(request)
+
+
+class SearchIndexAdminMixin:
+    """Model admin search backed by the `search_index`.
+
+    The search terms are matched with the trigram index, check
+    `utils.search.filter_search`. The `search_fields` lookups are used if
+    the database has no index or the terms are too short for it.
+    """
+
+    search_index: Optional[SearchIndex] = None
+
+    def get_search_results(self, request, queryset, search_term):
+        if self.search_index is not None and search_term:
+            found = filter_search(queryset, self.search_index, search_term)
+            if found is not None:
+                return found, False
+        return super().get_search_results(request, queryset, search_term)
+
+
+class ShardedAdminMixin:
+    """Model admin of a model sharded across the databases.
+
+    Should precede `LargeTableAdminMixin`, the large-table mode is always
+    on with the shards: the changelist is merged from the shards by
+    `ShardedChangeList`. The objects are looked up in every shard and the
+    saved ones stay in their shard. The bulk delete action is not available
+    with the shards, the actions get the queryset of the `default` database
+    only, they should be run with `config.shards.shard_querysets`.
+    """
+
+    @property
+    def large_table_mode(self) -> bool:
+        return is_sharded() or super().large_table_mode
+
+    def get_changelist(self, request, **kwargs):
+        if is_sharded():
+            return ShardedChangeList
+        return super().get_changelist(request, **kwargs)
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        if is_sharded():
+            actions.pop('delete_selected', None)
+        return actions
+
+    def get_object(self, request, object_id, from_field=None):
+        if not is_sharded():
+            return super().get_object(request, object_id, from_field)
+
+        queryset = self.get_queryset(request)
+        opts = queryset.model._meta
+        field = (
+            opts.pk if from_field is None else opts.get_field(from_field)
+        )
+        try:
+            object_id = field.to_python(object_id)
+        except (ValidationError, ValueError):
+            return None
+
+        for shard_queryset in shard_querysets(queryset):
+            obj = shard_queryset.filter(**{field.name: object_id}).first()
+            if obj is not None:
+                return obj
+        return None
@@ -0,0 +1,147 @@
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic, time_ns
+from typing import Any, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+class LRUCache:
+    """Bounded thread-safe LRU cache with per-entry time to live.
+
+    Attributes:
+        hits: lookups that found an alive entry.
+        misses: lookups of missing or expired entries.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = Lock()
+        self._entries: OrderedDict[Any, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        """Get the alive entry value and mark it as recently used."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Any, value: Any):
+        """Store the value, evicting the least recently used entries."""
+        with self._lock:
+            self._entries[key] = (monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: Any):
+        """Remove the entry if it exists."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Remove all the entries."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, Any]:
+        """Get the cache size and the lookup counters."""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+class VersionStamp:
+    """Version of some rarely changed data.
+
+    The version is stored in the default Django cache, which must be shared
+    by all the processes (check the `CACHES` setting). Process-local caches
+    compare their version with the stamp and rebuild themselves on mismatch.
+    The data may also be versioned item by item, e.g. by the token, with the
+    `item` argument.
+
+    A version read from the shared cache is trusted for `VERSION_STAMP_TTL`
+    seconds, so the hot paths do not query the shared cache on every call.
+    The other processes see a bump within that time, the bumping process
+    sees it at once.
+
+    Every bump sets a new time-based value instead of incrementing the
+    current one: the database cache increments are not atomic, a lost
+    increment could keep a stale cache alive. An evicted stamp is restarted
+    the same way, so it never gets a value some process has already seen.
+    """
+
+    def __init__(
+        self,
+        key: str,
+        max_items: int = 1,
+        ttl: Optional[float] = None,
+    ):
+        self.key = 'version-stamp:%s' % key
+        self.checked = LRUCache(
+            max_size=max_items,
+            ttl=getattr(settings, 'VERSION_STAMP_TTL', 1) if ttl is None
+            else ttl,
+        )
+
+    def get_key(self, item: Any = None) -> str:
+        """Get the shared cache key of the data or of its item stamp."""
+        if item is None:
+            return self.key
+        return '%s:%s' % (self.key, item)
+
+    def get(self, item: Any = None) -> int:
+        """Get the current version, initializing it if missing."""
+        version = self.checked.get(item)
+        if version is None:
+            key = self.get_key(item)
+            version = cache.get(key)
+            if version is None:
+                version = time_ns()
+                if not cache.add(key, version, timeout=None):
+                    version = cache.get(key, 0)
+            self.checked.set(item, version)
+        return version
+
+    async def aget(self, item: Any = None) -> int:
+        """Async version of `get`."""
+        version = self.checked.get(item)
+        if version is None:
+            key = self.get_key(item)
+            version = await cache.aget(key)
+            if version is None:
+                version = time_ns()
+                if not await cache.aadd(key, version, timeout=None):
+                    version = await cache.aget(key, 0)
+            self.checked.set(item, version)
+        return version
+
+    def bump(self, item: Any = None) -> int:
+        """Change the version, so all the dependent caches are stale."""
+        version = time_ns()
+        cache.set(self.get_key(item), version, timeout=None)
+        self.checked.set(item, version)
+        return version
+
+    def forget(self):
+        """Read the versions from the shared cache on the next calls."""
+        self.checked.clear()
@@ -1,6 +1,71 @@
 from binascii import hexlify
 from os import urandom
+from threading import Lock
+from time import time_ns
+from typing import Optional
 
+CROCKFORD_ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+CODE_LENGTH = 26
+LEGACY_CODE_LENGTH = 40
 
-def generate_code(length: int = 20):
+_RANDOM_BITS = 80
+_RANDOM_MASK = (1 << _RANDOM_BITS) - 1
+_last_generated = {'timestamp': -1, 'random': 0}
+_lock = Lock()
+
+
+def encode_code(value: int) -> str:
+    """Encode a 128-bit integer with the Crockford's base32 alphabet."""
+    chars = []
+    for _ in range(CODE_LENGTH):
+        value, index = divmod(value, 32)
+        chars.append(CROCKFORD_ALPHABET[index])
+    return ''.join(reversed(chars))
+
+
+def generate_code(timestamp_ms: Optional[int] = None) -> str:
+    """Generate a time-ordered ULID-like code.
+
+    The code is 26 chars long and consists of 48-bit millisecond timestamp
+    followed by 80 random bits. Codes generated by the process within the
+    same millisecond increment the random part, so they are sorted in the
+    order of the generation.
+
+    Args:
+        timestamp_ms: use the given Unix timestamp in milliseconds instead
+            of the current time, the code is not monotonic then.
+    """
+    if timestamp_ms is not None:
+        random = int.from_bytes(urandom(10), 'big')
+        return encode_code(timestamp_ms << _RANDOM_BITS | random)
+
+    with _lock:
+        timestamp = time_ns() // 1_000_000
+        if timestamp <= _last_generated['timestamp']:
+            timestamp = _last_generated['timestamp']
+            random = _last_generated['random'] + 1
+            if random > _RANDOM_MASK:
+                timestamp += 1
+                random = int.from_bytes(urandom(10), 'big')
+        else:
+            random = int.from_bytes(urandom(10), 'big')
+        _last_generated.update(timestamp=timestamp, random=random)
+
+    return encode_code(timestamp << _RANDOM_BITS | random)
+
+
+def generate_legacy_code(length: int = 20) -> str:
+    """Generate a random hex code, the format of codes before ULID."""
     return hexlify(urandom(length)).decode()
+
+
+def is_legacy_code(code: str) -> bool:
+    """Check that the code has the legacy random hex format."""
+    if len(code) != LEGACY_CODE_LENGTH:
+        return False
+
+    try:
+        int(code, 16)
+    except ValueError:
+        return False
+    return True
@@ -0,0 +1,81 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Optional, TypeVar
+
+from django.db import DatabaseError, connections
+from django.db.models import QuerySet
+
+T = TypeVar('T')
+
+
+def estimate_count(queryset: QuerySet) -> Optional[int]:
+    """Get the estimated number of the table rows from the database stats.
+
+    Works only for the unfiltered querysets: PostgreSQL and MySQL keep the
+    estimate in their catalogs, SQLite has it once `ANALYZE` has been run.
+
+    Returns:
+        The estimated number of rows or `None` if it is unknown.
+    """
+    if queryset.query.where or queryset.query.is_sliced:
+        return None
+
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    queries = {
+        'postgresql': (
+            'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass'
+        ),
+        'mysql': (
+            'SELECT table_rows FROM information_schema.tables '
+            'WHERE table_schema = DATABASE() AND table_name = %s'
+        ),
+        'sqlite': 'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1',
+    }
+    if connection.vendor not in queries:
+        return None
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(queries[connection.vendor], [table])
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+
+    if row is None or row[0] is None:
+        return None
+
+    # SQLite stat is the space separated rows count and index selectivity
+    estimate = int(str(row[0]).split()[0])
+    return estimate if estimate >= 0 else None
+
+
+def scatter(
+    func: Callable[[str], T],
+    aliases: Iterable[str],
+    parallel: bool = True,
+) -> list[T]:
+    """Call the function with every database alias, in parallel threads.
+
+    Every thread uses its own connections, they are closed once the call is
+    done. The calls run one by one in the current thread if any of the
+    databases is in a transaction here, so they see its changes.
+
+    Returns:
+        The results in the aliases order.
+    """
+    aliases = list(aliases)
+    if (
+        not parallel
+        or len(aliases) < 2
+        or any(connections[alias].in_atomic_block for alias in aliases)
+    ):
+        return [func(alias) for alias in aliases]
+
+    def call(alias: str) -> T:
+        try:
+            return func(alias)
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=len(aliases)) as executor:
+        return list(executor.map(call, aliases))
@@ -0,0 +1,299 @@
+import json
+import os
+from bisect import bisect_left
+from pathlib import Path
+from threading import Lock
+from time import monotonic, time_ns
+from typing import Callable, Iterable, Optional
+
+LabelSet = tuple[tuple[str, str], ...]
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+def escape_label(value: str) -> str:
+    """Escape the label value for the Prometheus text format."""
+    return value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def format_labels(labels: Iterable[tuple[str, str]]) -> str:
+    """Format the labels for the Prometheus text format."""
+    content = ','.join(
+        '%s="%s"' % (name, escape_label(str(value)))
+        for name, value in labels
+    )
+    return '{%s}' % content if content else ''
+
+
+def format_value(value: float) -> str:
+    """Format the sample value, integers are written without a fraction."""
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def is_process_alive(pid: int) -> bool:
+    """Check that the process of the host is running.
+
+    Always true on Windows, where `os.kill` terminates the process.
+    """
+    if os.name == 'nt':
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def finished_snapshots(directory: Path) -> Iterable[Path]:
+    """Get the snapshot files of the finished processes."""
+    for path in directory.glob('metrics-*.json'):
+        try:
+            pid = int(path.stem.split('-')[1])
+        except (IndexError, ValueError):
+            continue
+        if pid != os.getpid() and not is_process_alive(pid):
+            yield path
+
+
+class MetricsRegistry:
+    """Process-local counters and histograms shared across processes.
+
+    Every process writes its snapshot to its own file in `directory`, the
+    `collect` method sums the snapshots of all the processes. The snapshots
+    of the finished processes are taken over by the collecting process, so
+    the counters never go back and the files do not pile up, check `prune`.
+
+    Besides the directly updated metrics, `collectors` are called on every
+    snapshot and return `(name, labels, value)` counters that are tracked
+    elsewhere, e.g. cache statistics.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str],
+        flush_interval: float = 1.0,
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.directory = Path(directory) if directory else None
+        self.flush_interval = flush_interval
+        self.buckets = buckets
+        self.help: dict[str, str] = {}
+        self.collectors: list[Callable[[], Iterable]] = []
+        self._lock = Lock()
+        self._counters: dict[tuple[str, LabelSet], float] = {}
+        self._histograms: dict[tuple[str, LabelSet], list[float]] = {}
+        self._filename = 'metrics-%d-%d.json' % (os.getpid(), time_ns())
+        self._flushed = monotonic()
+
+    def describe(self, name: str, text: str):
+        """Set the metric help text."""
+        self.help[name] = text
+
+    def inc(self, name: str, value: float = 1, **labels: str):
+        """Increment the counter."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: str):
+        """Add the observation to the histogram.
+
+        The histogram is stored as the per-bucket counts with the `+Inf`
+        bucket followed by the sum of the observations.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = [0.0] * (len(self.buckets) + 2)
+                self._histograms[key] = histogram
+            histogram[index] += 1
+            histogram[-1] += value
+
+    def snapshot(self) -> dict:
+        """Get the process metrics with the collected ones."""
+        with self._lock:
+            counters = [
+                [name, list(labels), value]
+                for (name, labels), value in self._counters.items()
+            ]
+            histograms = [
+                [name, list(labels), list(values)]
+                for (name, labels), values in self._histograms.items()
+            ]
+
+        for collector in self.collectors:
+            counters.extend(
+                [name, sorted(labels.items()), value]
+                for name, labels, value in collector()
+            )
+        return {
+            'buckets': list(self.buckets),
+            'counters': counters,
+            'histograms': histograms,
+        }
+
+    def maybe_flush(self):
+        """Flush the snapshot if the flush interval has passed."""
+        if monotonic() - self._flushed >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Write the process snapshot to the shared directory."""
+        self._flushed = monotonic()
+        if self.directory is None:
+            return
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / self._filename
+        temporary = path.with_suffix('.tmp')
+        temporary.write_text(json.dumps(self.snapshot()))
+        temporary.replace(path)
+
+    def prune(self):
+        """Take over the snapshots of the finished processes.
+
+        A snapshot is claimed by renaming its file, so only one process
+        adds its metrics to the own ones. The claimed file is removed once
+        the metrics are flushed with the process snapshot.
+        """
+        if self.directory is None:
+            return
+
+        claimed = []
+        for path in finished_snapshots(self.directory):
+            claim = path.with_suffix('.claimed')
+            try:
+                path.rename(claim)
+                snapshot = json.loads(claim.read_text())
+            except FileNotFoundError:
+                continue
+            except (OSError, ValueError):
+                claim.unlink(missing_ok=True)
+                continue
+            self.absorb(snapshot)
+            claimed.append(claim)
+
+        if claimed:
+            self.flush()
+            for claim in claimed:
+                claim.unlink(missing_ok=True)
+
+    def absorb(self, snapshot: dict):
+        """Add the metrics of another process snapshot to the own ones."""
+        with self._lock:
+            for name, labels, value in snapshot['counters']:
+                key = (name, tuple(map(tuple, labels)))
+                self._counters[key] = self._counters.get(key, 0) + value
+
+            if snapshot['buckets'] != list(self.buckets):
+                return
+            for name, labels, values in snapshot['histograms']:
+                key = (name, tuple(map(tuple, labels)))
+                histogram = self._histograms.setdefault(
+                    key, [0.0] * len(values),
+                )
+                for index, value in enumerate(values):
+                    histogram[index] += value
+
+    def snapshots(self) -> Iterable[dict]:
+        """Get the snapshots of all the processes."""
+        if self.directory is None:
+            yield self.snapshot()
+            return
+
+        self.prune()
+        self.flush()
+        for path in self.directory.glob('metrics-*.json'):
+            try:
+                yield json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+
+    def collect(self):
+        """Sum the metrics of all the processes.
+
+        Returns:
+            The `(counters, histograms)` pair of dictionaries keyed by the
+            `(name, labels)` pairs.
+        """
+        counters: dict[tuple[str, LabelSet], float] = {}
+        histograms: dict[tuple[str, LabelSet], list[float]] = {}
+
+        for snapshot in self.snapshots():
+            for name, labels, value in snapshot['counters']:
+                key = (name, tuple(map(tuple, labels)))
+                counters[key] = counters.get(key, 0) + value
+
+            if snapshot['buckets'] != list(self.buckets):
+                continue
+            for name, labels, values in snapshot['histograms']:
+                key = (name, tuple(map(tuple, labels)))
+                total = histograms.setdefault(key, [0.0] * len(values))
+                for index, value in enumerate(values):
+                    total[index] += value
+
+        return counters, histograms
+
+    def render(
+        self,
+        extra: Optional[Callable[[dict], Iterable]] = None,
+    ) -> str:
+        """Render the aggregated metrics in the Prometheus text format.
+
+        Args:
+            extra: gauges computed from the aggregated counters, the
+                function gets the counters and returns `(name, labels,
+                value)` samples.
+        """
+        counters, histograms = self.collect()
+        lines = []
+        seen = set()
+
+        def header(name: str, metric_type: str):
+            if name in seen:
+                return
+            seen.add(name)
+            if name in self.help:
+                lines.append('# HELP %s %s' % (name, self.help[name]))
+            lines.append('# TYPE %s %s' % (name, metric_type))
+
+        for (name, labels), value in sorted(counters.items()):
+            header(name, 'counter')
+            lines.append('%s%s %s' % (
+                name, format_labels(labels), format_value(value),
+            ))
+
+        for (name, labels), values in sorted(histograms.items()):
+            header(name, 'histogram')
+            cumulative = 0.0
+            bounds = [*map(format_value, self.buckets), '+Inf']
+            for bound, count in zip(bounds, values[:-1]):
+                cumulative += count
+                lines.append('%s_bucket%s %s' % (
+                    name,
+                    format_labels((*labels, ('le', bound))),
+                    format_value(cumulative),
+                ))
+            lines.append('%s_sum%s %s' % (
+                name, format_labels(labels), format_value(values[-1]),
+            ))
+            lines.append('%s_count%s %s' % (
+                name, format_labels(labels), format_value(cumulative),
+            ))
+
+        for name, labels, value in (extra(counters) if extra else ()):
+            header(name, 'gauge')
+            lines.append('%s%s %s' % (
+                name, format_labels(sorted(labels.items())),
+                format_value(value),
+            ))
+
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,275 @@
+from typing import NamedTuple, Optional
+
+from django.db import connections
+from django.db.models import QuerySet
+from django.db.models.expressions import RawSQL
+from django.utils.text import smart_split, unescape_string_literal
+
+# The trigram tokenizer can not match the shorter terms with the index
+MIN_TERM_LENGTH = 3
+
+# `fts5` with the `trigram` tokenizer is available since SQLite 3.34
+MIN_SQLITE_VERSION = (3, 34, 0)
+
+TRIGGER_EVENTS = (
+    ('insert', 'INSERT', ('NEW',)),
+    ('update', 'UPDATE', ('OLD', 'NEW')),
+    ('delete', 'DELETE', ('OLD',)),
+)
+
+
+class SearchSource(NamedTuple):
+    """Table the search index is kept in sync with by the triggers.
+
+    Attributes:
+        table: source table name.
+        columns: indexed columns of the table, the updates of the other
+            columns do not touch the index.
+        rowids: `SELECT` of the index rowids the source row is indexed in,
+            `{row}` is replaced with `NEW` or `OLD`.
+    """
+
+    table: str
+    columns: tuple[str, ...]
+    rowids: str
+
+
+class SearchIndex(NamedTuple):
+    """SQLite FTS5 trigram index of a model.
+
+    The index rowid is the rowid of the model table. The index rows are
+    refreshed by the triggers on every source table write, so the index is
+    in sync with any write, including the raw SQL and bulk ones. The
+    migrations rebuilding a source table should drop the index and create it
+    again, check `order.search.without_search_indexes`.
+
+    Attributes:
+        table: FTS5 table name.
+        columns: indexed columns.
+        select: `SELECT` of the model table rowid and the indexed columns.
+        key: expression of the model table rowid in `select`.
+        sources: tables the indexed columns are read from.
+    """
+
+    table: str
+    columns: tuple[str, ...]
+    select: str
+    key: str
+    sources: tuple[SearchSource, ...]
+
+
+def supports_search(connection) -> bool:
+    """Check that the database supports the FTS5 trigram indexes."""
+    if connection.vendor != 'sqlite':
+        return False
+    if connection.Database.sqlite_version_info < MIN_SQLITE_VERSION:
+        return False
+
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return ('ENABLE_FTS5',) in cursor.fetchall()
+
+
+def has_search_index(connection, index: SearchIndex) -> bool:
+    """Check that the index is created, cached per connection."""
+    tables = getattr(connection, 'search_tables', None)
+    if tables is None:
+        tables = set()
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table' "
+                    'AND sql LIKE %s',
+                    ['CREATE VIRTUAL TABLE % USING fts5(%'],
+                )
+                tables = {row[0] for row in cursor.fetchall()}
+        connection.search_tables = tables
+    return index.table in tables
+
+
+def refresh_sql(index: SearchIndex, rowids: str) -> list[str]:
+    """Get the statements reindexing the rows with the selected rowids."""
+    return [
+        'DELETE FROM %s WHERE rowid IN (%s);' % (index.table, rowids),
+        'INSERT INTO %s (rowid, %s) %s WHERE %s IN (%s);' % (
+            index.table, ', '.join(index.columns),
+            index.select, index.key, rowids,
+        ),
+    ]
+
+
+def create_search_index(connection, index: SearchIndex) -> bool:
+    """Create the index with its triggers and index the existing rows.
+
+    Returns:
+        `False` if the database does not support the index.
+    """
+    if not supports_search(connection):
+        return False
+
+    statements = [
+        "CREATE VIRTUAL TABLE %s USING fts5(%s, tokenize='trigram')" % (
+            index.table, ', '.join(index.columns),
+        ),
+        'INSERT INTO %s (rowid, %s) %s' % (
+            index.table, ', '.join(index.columns), index.select,
+        ),
+    ]
+    for source in index.sources:
+        for suffix, event, rows in TRIGGER_EVENTS:
+            if event == 'UPDATE':
+                event = 'UPDATE OF %s' % ', '.join(source.columns)
+            body = [
+                statement
+                for row in rows
+                for statement in refresh_sql(
+                    index, source.rowids.format(row=row),
+                )
+            ]
+            statements.append(
+                'CREATE TRIGGER %s_%s_%s AFTER %s ON %s BEGIN %s END' % (
+                    index.table, source.table, suffix, event, source.table,
+                    ' '.join(body),
+                ),
+            )
+
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+    connection.search_tables = None
+    return True
+
+
+def drop_search_index(connection, index: SearchIndex):
+    """Drop the index with its triggers if it exists."""
+    if connection.vendor != 'sqlite':
+        return
+
+    with connection.cursor() as cursor:
+        for source in index.sources:
+            for suffix, _event, _rows in TRIGGER_EVENTS:
+                cursor.execute('DROP TRIGGER IF EXISTS %s_%s_%s' % (
+                    index.table, source.table, suffix,
+                ))
+        cursor.execute('DROP TABLE IF EXISTS %s' % index.table)
+    connection.search_tables = None
+
+
+def parse_search_terms(query: str) -> tuple[list[str], list[str]]:
+    """Split the search query into the terms like the admin search does.
+
+    Returns:
+        The terms the index can match and the shorter terms.
+    """
+    terms = []
+    for bit in smart_split(query):
+        if bit.startswith(('"', "'")) and bit[0] == bit[-1]:
+            bit = unescape_string_literal(bit)
+        if bit:
+            terms.append(bit)
+    return (
+        [term for term in terms if len(term) >= MIN_TERM_LENGTH],
+        [term for term in terms if len(term) < MIN_TERM_LENGTH],
+    )
+
+
+def escape_like(term: str) -> str:
+    """Escape the `LIKE` wildcards of the term with the backslash."""
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search_sql(
+    index: SearchIndex,
+    queryset: QuerySet,
+    query: str,
+    ranked: bool = False,
+) -> Optional[tuple[str, list]]:
+    """Get the `SELECT` of the primary keys of the matching rows.
+
+    The `ranked` select is ordered by the rank and selects it too.
+
+    All the terms should match, in any of the indexed columns. The terms are
+    matched with the index, the shorter terms filter the matched rows.
+
+    Returns:
+        The SQL and its params, `None` if the queryset database has no index
+        or the query has no term the index can match.
+    """
+    terms, short_terms = parse_search_terms(query)
+    connection = connections[queryset.db]
+    if not terms or not has_search_index(connection, index):
+        return None
+
+    opts = queryset.model._meta
+    sql = 'SELECT t.%s%s FROM %s JOIN %s t ON t.rowid = %s.rowid ' % (
+        connection.ops.quote_name(opts.pk.column),
+        ', %s.rank' % index.table if ranked else '',
+        index.table,
+        connection.ops.quote_name(opts.db_table),
+        index.table,
+    )
+    sql += 'WHERE %s MATCH %%s' % index.table
+    params = [' '.join('"%s"' % term.replace('"', '""') for term in terms)]
+
+    for term in short_terms:
+        sql += ' AND (%s)' % ' OR '.join(
+            "%s.%s LIKE %%s ESCAPE '\\'" % (index.table, column)
+            for column in index.columns
+        )
+        params += ['%%%s%%' % escape_like(term)] * len(index.columns)
+
+    if ranked:
+        sql += ' ORDER BY %s.rank' % index.table
+    return sql, params
+
+
+def filter_search(
+    queryset: QuerySet,
+    index: SearchIndex,
+    query: str,
+) -> Optional[QuerySet]:
+    """Filter the queryset by the index match, check `search_sql`.
+
+    Returns:
+        The filtered queryset, `None` if the index can not be used.
+    """
+    found = search_sql(index, queryset, query)
+    if found is None:
+        return None
+    return queryset.filter(pk__in=RawSQL(*found))
+
+
+def ranked_search(
+    queryset: QuerySet,
+    index: SearchIndex,
+    query: str,
+    limit: int,
+    offset: int = 0,
+) -> Optional[list]:
+    """Get the page of the best matching objects, check `search_sql`.
+
+    The page is selected from the ranked index matches with `LIMIT` and
+    `OFFSET`, then the objects are fetched from the queryset. The cost
+    depends on the number of the matches, not the table size.
+
+    Returns:
+        The objects in the rank order with their `search_rank`, `None` if
+        the index can not be used.
+    """
+    found = search_sql(index, queryset, query, ranked=True)
+    if found is None:
+        return None
+
+    sql, params = found
+    connection = connections[queryset.db]
+    with connection.cursor() as cursor:
+        cursor.execute(sql + ' LIMIT %s OFFSET %s', [*params, limit, offset])
+        ranks = dict(cursor.fetchall())
+
+    objects = queryset.in_bulk(list(ranks))
+    found = []
+    for pk, rank in ranks.items():
+        if pk in objects:
+            objects[pk].search_rank = rank
+            found.append(objects[pk])
+    return found
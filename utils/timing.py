@@ -0,0 +1,103 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Iterator, Optional
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+_current_timings: ContextVar[Optional['RequestTimings']] = ContextVar(
+    'request_timings',
+    default=None,
+)
+
+
+class RequestTimings:
+    """Timings of a single request.
+
+    Queries are counted by `execute_wrapper` while the timings are current
+    (check `activate`), the context is copied to the threads of the async
+    views, so their queries are counted too. Other named sections are
+    measured with `measure`.
+
+    Attributes:
+        queries: executed queries count.
+        sections: total seconds by the section name, `db` included.
+        sql: `(sql, seconds)` pairs of the queries if collected.
+    """
+
+    def __init__(self, collect_sql: bool = False):
+        self.queries = 0
+        self.sections: dict[str, float] = {'db': 0.0}
+        self.sql: Optional[list[tuple[str, float]]] = (
+            [] if collect_sql else None
+        )
+        self._active: set[str] = set()
+
+    def record_query(self, sql: str, elapsed: float):
+        """Add the executed query."""
+        self.queries += 1
+        self.sections['db'] += elapsed
+        if self.sql is not None:
+            self.sql.append((sql, elapsed))
+
+    @contextmanager
+    def measure(self, name: str) -> Iterator[None]:
+        """Add the block time to the section, nested blocks are ignored."""
+        if name in self._active:
+            yield
+            return
+
+        self._active.add(name)
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            self._active.discard(name)
+            self.sections[name] = (
+                self.sections.get(name, 0.0) + perf_counter() - started
+            )
+
+    def activate(self):
+        """Make the timings current for the running context."""
+        return _current_timings.set(self)
+
+    @staticmethod
+    def deactivate(token):
+        """Restore the timings that were current before `activate`."""
+        _current_timings.reset(token)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    """Get the timings of the current request if they are collected."""
+    return _current_timings.get()
+
+
+def execute_wrapper(execute, sql, params, many, context):
+    """Database execute wrapper recording the queries to current timings."""
+    timings = _current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.record_query(sql, perf_counter() - started)
+
+
+def add_execute_wrapper(connection, **kwargs):
+    """Add `execute_wrapper` to the connection if it is missing."""
+    # pylint: disable=unused-argument
+    if execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(execute_wrapper)
+
+
+def install_execute_wrapper():
+    """Add `execute_wrapper` to the current and future connections."""
+    connection_created.connect(
+        add_execute_wrapper,
+        dispatch_uid='utils.timing.add_execute_wrapper',
+    )
+    for connection in connections.all(initialized_only=True):
+        add_execute_wrapper(connection)